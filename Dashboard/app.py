@@ -1,10 +1,15 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 import httpx
 import pandas as pd
 import plotly.express as px
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # API base URL
 BASE_URL = "https://paper-trading-71hl.onrender.com/api"
+CACHE_TTL = 30
 
 # Function to handle API key input and persistence
 def handle_api_key():
@@ -17,54 +22,92 @@ def handle_team():
         st.session_state.team = ''
     return st.text_input("Enter Team Name", value=st.session_state.team)
 
+# One pooled client per server process, shared by every session, so repeat
+# loads reuse warm keep-alive connections instead of a new TCP+TLS handshake
+@st.cache_resource
+def get_client():
+    return httpx.Client(base_url=BASE_URL, timeout=httpx.Timeout(60.0, connect=10.0),
+                        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10))
+
+# Last ETag and body per request, so an expired cache entry is revalidated
+# with If-None-Match and an unchanged account costs a bodiless 304
+@st.cache_resource
+def get_etag_store():
+    return {}
+
+def get_json(path, headers, params=None, timeout=60.0):
+    key = (path, tuple(sorted(headers.items())), tuple(sorted((params or {}).items())))
+    store = get_etag_store()
+    cached = store.get(key)
+    if cached:
+        headers = {**headers, "If-None-Match": cached[0]}
+    response = get_client().get(path, headers=headers, params=params, timeout=timeout)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    response.raise_for_status()
+    data = response.json()
+    if "etag" in response.headers:
+        if len(store) >= 1000:
+            store.clear()
+        store[key] = (response.headers["etag"], data)
+    return data
+
+# Responses are cached per api key / team for CACHE_TTL seconds; failed requests raise and are not cached
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_overview(api_key, fields, trades_limit):
+    return get_json("/overview", {"api-key": api_key}, params={"fields": fields, "trades_limit": trades_limit})
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_equity_curve(api_key, resolution, max_points):
+    return get_json("/equity_curve", {"api-key": api_key}, params={"resolution": resolution, "max_points": max_points})
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def cached_dashboard(team):
+    return get_json("/dashboard", {"team": team})
+
 # Functions to call API endpoints with exception handling
-def fetch_portfolio():
+def safe_fetch(label, fetch, *args):
     try:
-        response = httpx.get(f"{BASE_URL}/portfolio", headers={"api-key": st.session_state.api_key}, timeout=20.0)
-        response.raise_for_status()
-        return response.json()
+        return fetch(*args)
     except httpx.HTTPStatusError as e:
-        st.error(f"Error fetching portfolio data: {e.response.text}")
+        st.error(f"Error fetching {label}: {e.response.text}")
         return None
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
         return None
 
-def fetch_transaction():
-    try:
-        response = httpx.get(f"{BASE_URL}/transaction", headers={"api-key": st.session_state.api_key}, timeout=60.0)
-        response.raise_for_status()
-        return response.json()
-    except httpx.HTTPStatusError as e:
-        st.error(f"Error fetching transaction data: {e.response.text}")
-        return None
-    except Exception as e:
-        st.error(f"An unexpected error occurred: {e}")
-        return None
+def fetch_overview(fields, trades_limit=20):
+    return safe_fetch("account overview", cached_overview, st.session_state.api_key, fields, trades_limit)
 
-def fetch_user():
-    try:
-        response = httpx.get(f"{BASE_URL}/user", headers={"api-key": st.session_state.api_key}, timeout=10.0)
-        response.raise_for_status()
-        return response.json()
-    except httpx.HTTPStatusError as e:
-        st.error(f"Error fetching user data: {e.response.text}")
-        return None
-    except Exception as e:
-        st.error(f"An unexpected error occurred: {e}")
-        return None
+def fetch_equity_curve(resolution="raw", max_points=300):
+    return safe_fetch("equity curve", cached_equity_curve, st.session_state.api_key, resolution, max_points)
 
 def fetch_dashboard():
-    try:
-        response = httpx.get(f"{BASE_URL}/dashboard", headers={"team": st.session_state.team}, timeout=60.0)
-        response.raise_for_status()
-        return response.json()
-    except httpx.HTTPStatusError as e:
-        st.error(f"Error fetching dashboard data: {e.response.text}")
-        return None
-    except Exception as e:
-        st.error(f"An unexpected error occurred: {e}")
-        return None
+    return safe_fetch("dashboard data", cached_dashboard, st.session_state.team)
+
+def fetch_concurrently(*fetches):
+    """Runs independent fetches in parallel, so a page waits for the slowest one rather than their sum."""
+    ctx = get_script_run_ctx()
+
+    def run(fetch):
+        # Lets the worker thread use st.cache_data and st.error
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fetch()
+
+    with ThreadPoolExecutor(max_workers=len(fetches)) as pool:
+        return list(pool.map(run, fetches))
+
+def show_user(user_data):
+    if user_data:
+        col1 = st.columns(3)
+        with col1[0]:
+            st.write(f"Name: {user_data['name']}")
+        with col1[1]:
+            st.write(f"Team: {user_data['team']}")
+        with col1[2]:
+            st.write(f"Balance: {user_data['balance']}")
+    else:
+        st.write("Failed to load user data.")
 
 # Function to display portfolio data
 def portfolio_page():
@@ -86,28 +129,11 @@ def portfolio_page():
         return
     
     if load_portfolio:
-        # Fetch user data
-        if 'user_data' not in st.session_state:
-            user_data = fetch_user()
-            if user_data:
-                st.session_state.user_data = user_data
-                
-        # Display user data
-        if 'user_data' in st.session_state:
-            user_data = st.session_state.user_data
-            col1 = st.columns(3)
-            
-            with col1[0]:
-                st.write(f"Name: {user_data['name']}")
-            with col1[1]:
-                st.write(f"Team: {user_data['team']}")
-            with col1[2]:
-                st.write(f"Balance: {user_data['balance']}")
-            
-        else:
-            st.write("Failed to load user data.")
-        
-        data = fetch_portfolio()
+        # Profile and holdings in one request
+        overview = fetch_overview("profile,holdings") or {}
+        show_user(overview.get("profile"))
+        data = overview.get("holdings")
+
         if data:
             df = pd.DataFrame(data)
             st.table(df)
@@ -135,44 +161,30 @@ def transaction_page():
         return
     
     if load_transaction:
-        if 'user_data' not in st.session_state:
-            user_data = fetch_user()
-            if user_data:
-                st.session_state.user_data = user_data
-                
-        # Display user data
-        if 'user_data' in st.session_state:
-            user_data = st.session_state.user_data
-            col1 = st.columns(3)
-            
-            with col1[0]:
-                st.write(f"Name: {user_data['name']}")
-            with col1[1]:
-                st.write(f"Team: {user_data['team']}")
-            with col1[2]:
-                st.write(f"Balance: {user_data['balance']}")
-            
-        else:
-            st.write("Failed to load user data.")
-            
-        data = fetch_transaction()
+        overview, curve = fetch_concurrently(lambda: fetch_overview("profile,trades", trades_limit=100), fetch_equity_curve)
+        overview = overview or {}
+        show_user(overview.get("profile"))
+        data = overview.get("trades")
+
         if data:
             df = pd.DataFrame(data)
             # Convert the time format from ISO 8601 to a more readable format
             if 'Time' in df.columns:
                 df['Time'] = pd.to_datetime(df['Time']).dt.strftime('%Y-%m-%d %H:%M:%S')
             
-            # Display table
+            # Display the latest transactions
             st.table(df)
-            
-            # Plot transaction data
-            if 'Time' in df.columns and 'After_balance' in df.columns:
-                fig = px.line(df, x='Time', y='After_balance', title='Transaction Balance Over Time')
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.write("Unable to plot transaction data: 'Time' or 'Balance' column is missing.")
         else:
             st.write("No transaction data found")
+
+        # The server downsamples the history to a few hundred points
+        if curve and curve.get("points"):
+            points = pd.DataFrame(curve["points"])
+            points['Time'] = pd.to_datetime(points['Time'])
+            fig = px.line(points, x='Time', y=['Balance', 'Net_worth'], title='Balance and Net Worth Over Time')
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.write("Unable to plot transaction data.")
         load_transaction = False
 
 # Function to display dashboard data
@@ -197,11 +209,8 @@ def dashboard_page():
     if load_dashboard:
         data = fetch_dashboard()
         if data:
-            df = pd.DataFrame(data)
-            # Sort the DataFrame by 'Balance' in decreasing order and add a 'Rank' column
-            if 'Balance' in df.columns:
-                df = df.sort_values(by='Balance', ascending=False)
-                df['Rank'] = df['Balance'].rank(ascending=False, method='min').astype(int)
+            # Rows arrive sorted and ranked by the server
+            df = pd.DataFrame(data).set_index('Rank')
             st.table(df)
         else:
             st.write("No dashboard data found")
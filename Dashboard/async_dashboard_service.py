@@ -0,0 +1,51 @@
+from typing import Any
+
+from Dashboard import dashboard_service, equity_curve as equity, overview as overview_service, pnl, valuation
+from DatabaseManagement import versions
+from DatabaseManagement.async_service import run_in_db_thread
+
+
+async def portfolio(db: Any, api_key, stock=None):
+    return await run_in_db_thread(dashboard_service.portfolio, db, api_key, stock)
+
+async def transaction(db: Any, api_key, stock=None, transaction_type=None, start_date=None, end_date=None, limit=None, cursor=None):
+    return await run_in_db_thread(dashboard_service.transaction, db, api_key, stock, transaction_type, start_date, end_date, limit, cursor)
+
+async def transaction_page(db: Any, api_key, stock=None, transaction_type=None, start_date=None, end_date=None, limit=None, cursor=None):
+    return await run_in_db_thread(dashboard_service.transaction_page, db, api_key, stock, transaction_type, start_date, end_date, limit, cursor)
+
+async def get_user(db: Any, api_key):
+    return await run_in_db_thread(dashboard_service.get_user, db, api_key)
+
+async def get_user_data(db: Any, team):
+    return await run_in_db_thread(dashboard_service.get_user_data, db, team)
+
+async def dashboard_result(db: Any, team, offset=0, limit=None):
+    return await run_in_db_thread(dashboard_service.dashboard_result, db, team, offset, limit)
+
+async def board_state(db: Any, team):
+    return await run_in_db_thread(dashboard_service.board_state, db, team)
+
+async def account_version(db: Any, api_key):
+    return await run_in_db_thread(versions.account_version, db, api_key)
+
+async def dashboard_rank(db: Any, api_key):
+    return await run_in_db_thread(dashboard_service.dashboard_rank, db, api_key)
+
+async def valued_portfolio(db: Any, api_key):
+    return await run_in_db_thread(valuation.valued_portfolio, db, api_key)
+
+async def networth_leaderboard(db: Any, team, offset=0, limit=None):
+    return await run_in_db_thread(valuation.networth_leaderboard, db, team, offset, limit)
+
+async def account_pnl(db: Any, api_key):
+    return await run_in_db_thread(pnl.account_pnl, db, api_key)
+
+async def team_pnl(db: Any, team):
+    return await run_in_db_thread(pnl.team_pnl, db, team)
+
+async def equity_curve(db: Any, api_key, resolution="raw", max_points=500):
+    return await run_in_db_thread(equity.equity_curve, db, api_key, resolution, max_points)
+
+async def overview(db: Any, api_key, fields, trades_limit=20):
+    return await run_in_db_thread(overview_service.overview, db, api_key, fields, trades_limit)
@@ -1,3 +1,12 @@
+import base64
+from datetime import datetime
+
+import orjson
+
+from Dashboard.leaderboard import leaderboards
+from Dashboard.models import PortfolioRow, TransactionRow
+from DatabaseManagement.cache import user_cache
+from DatabaseManagement.versions import team_version
 from utils.loggings import log_creator
 
 def fetch_data(db, query, params):
@@ -18,19 +27,25 @@ def portfolio(db, api_key, stock=None):
     result = fetch_data(db, query, params)
     if result and result not in [[]]:
         log_creator(api_key=api_key, name=result[0][2], log='Portfolio fetched', error=False)
-        portfolio = []
-        for row in result:
-            portfolio.append({
-                "Stock": row[3],
-                "Quantity": row[4]
-            })
-        return portfolio
+        return [PortfolioRow(row[3], row[4]) for row in result]
     else:
         log_creator(api_key=api_key, name='Unknown', log='Failed to fetch portfolio', error=True)
         return None
 
-def transaction(db, api_key, stock=None, transaction_type=None, start_date=None, end_date=None):
-    query = 'SELECT * FROM trades WHERE api_key = %s'
+def encode_cursor(time, trade_id):
+    """Opaque keyset cursor for the (time, id) position of the last row of a page."""
+    return base64.urlsafe_b64encode(f"{time.isoformat()}|{trade_id}".encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        time, trade_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(time), int(trade_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def _transaction_query(api_key, stock=None, transaction_type=None, start_date=None, end_date=None, cursor=None):
+    # Served by the (api_key, time, id) index, newest first, without a filesort
+    query = 'SELECT id, stock, stock_price, quantity, type, before_balance, after_balance, time FROM trades WHERE api_key = %s'
 
     params = (api_key,)
     if stock is not None:
@@ -45,33 +60,59 @@ def transaction(db, api_key, stock=None, transaction_type=None, start_date=None,
     if end_date is not None:
         query += ' AND time <= %s'
         params += (end_date,)
-    query += ' ORDER BY time DESC'
-    
+    if cursor is not None:
+        time, trade_id = decode_cursor(cursor)
+        query += ' AND (time < %s OR (time = %s AND id < %s))'
+        params += (time, time, trade_id)
+    query += ' ORDER BY time DESC, id DESC'
+    return query, params
+
+def _transaction_row(row):
+    # Columns after the id are in TransactionRow's field order
+    return TransactionRow(*row[1:])
+
+def transaction_page(db, api_key, stock=None, transaction_type=None, start_date=None, end_date=None, limit=None, cursor=None):
+    """
+    Returns ``(transactions, next_cursor)``. Without a limit every matching row
+    is returned and next_cursor is None.
+    """
+    query, params = _transaction_query(api_key, stock, transaction_type, start_date, end_date, cursor)
+    if limit is not None:
+        # One extra row tells us whether there is a next page
+        query += ' LIMIT %s'
+        params += (limit + 1,)
+
     result = fetch_data(db, query, params)
     if result and result not in [[]]:
         log_creator(api_key=api_key, name='Unknown', log='Transaction fetched', error=False)
-        transactions = []
-        for row in result:
-            transactions.append({
-                "Stock": row[3],
-                "Stock_price": row[4],
-                "Quantity": row[5],
-                "Type": row[6],
-                "before_balance": row[7],
-                "After_balance": row[8],
-                "Time": row[9]
-            })
-        return transactions
+        next_cursor = None
+        if limit is not None and len(result) > limit:
+            result = result[:limit]
+            next_cursor = encode_cursor(result[-1][7], result[-1][0])
+        return [_transaction_row(row) for row in result], next_cursor
     else:
         log_creator(api_key=api_key, name='Unknown', log='Failed to fetch transactions', error=True)
-        return None
+        return None, None
+
+def transaction(db, api_key, stock=None, transaction_type=None, start_date=None, end_date=None, limit=None, cursor=None):
+    return transaction_page(db, api_key, stock, transaction_type, start_date, end_date, limit, cursor)[0]
+
+def stream_transactions(db, api_key, stock=None, transaction_type=None, start_date=None, end_date=None, cursor=None, chunk_size=500):
+    """Yields the matching transactions as NDJSON, one fetchmany chunk at a time."""
+    query, params = _transaction_query(api_key, stock, transaction_type, start_date, end_date, cursor)
+    for rows in db.iter_fetch(query, params, chunk_size):
+        yield b"".join(orjson.dumps(_transaction_row(row)) + b"\n" for row in rows)
 
 def get_user(db, api_key):
+    cached = user_cache.get(api_key)
+    if cached is not None:
+        return dict(cached)
+    fill = user_cache.begin_fill(api_key)
     query = 'SELECT * FROM users WHERE api_key = %s'
     result = fetch_data(db, query, (api_key,))
     if result and result not in [[]]:
         log_creator(api_key=api_key, name=result[0][1], log='User data fetched', error=False)
-        return {
+        user = {
             "api_key": result[0][0],
             "name": result[0][1],
             "team": result[0][2],
@@ -79,6 +120,8 @@ def get_user(db, api_key):
             "token": result[0][4],
             "token_expiry": result[0][5]
         }
+        user_cache.set(api_key, user, fill)
+        return dict(user)
     else:
         log_creator(api_key=api_key, name='Unknown', log='Failed to fetch user data', error=True)
         return None
@@ -103,21 +146,32 @@ def get_user_data(db, team):
         log_creator(api_key="unknown", name='Unknown', log='Failed to fetch user data', error=True)
         return None
 
-def dashboard_result(db, team):
-    user_data = get_user_data(db, team)
-    if user_data and user_data not in [[]]:
+def dashboard_result(db, team, offset=0, limit=None):
+    try:
+        board = leaderboards.get(db, team)
+    except Exception as e:
+        log_creator(api_key="unknown", name=team, log=str(e), error=True)
+        return None
+    if len(board):
         log_creator(api_key="unknown", name=team, log='Dashboard data fetched', error=False)
-        dashboard = []
-        for user in user_data:
-            dashboard.append({
-                "Name": user["name"],
-                "Team": user["team"],
-                "Balance": user["balance"],
-            })
-        return dashboard
+        return board.page(offset, limit)
     else:
         log_creator(api_key="unknown", name=team, log='Failed to fetch dashboard data', error=True)
         return None
 
+def board_state(db, team):
+    """
+    Identifies the team's standings for ETags. The board is reloaded first if
+    it is behind the team's committed state, so the tag describes what this
+    process will serve; None for an unknown team.
+    """
+    version = team_version(db, team)
+    if version is None:
+        return None
+    return leaderboards.get(db, team, version).state
 
-    
\ No newline at end of file
+def dashboard_rank(db, api_key):
+    user = get_user(db, api_key)
+    if user is None:
+        return None
+    return leaderboards.get(db, user["team"]).rank_of(api_key)
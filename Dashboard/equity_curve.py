@@ -0,0 +1,103 @@
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from utils.loggings import log_creator
+
+EQUITY_QUERY = '''
+SELECT time, stock, type, quantity, stock_price, after_balance
+FROM trades WHERE api_key = %s
+ORDER BY time, id
+'''
+
+# Bucket widths in seconds; raw keeps one point per trade
+RESOLUTIONS = {"raw": 0, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling. Returns the indices of at most
+    ``threshold`` points that keep the visual shape of the series. The first
+    and last points are always kept; from each bucket in between, the point
+    forming the largest triangle with the previous pick and the next bucket's
+    average is chosen.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x = x[end:edges[bucket + 2]].mean()
+            next_y = y[end:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        ax, ay = x[previous], y[previous]
+        areas = np.abs((ax - next_x) * (y[start:end] - ay) - (ax - x[start:end]) * (next_y - ay))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def _net_worth(stocks, actions, quantities, prices, balances) -> np.ndarray:
+    """
+    Cash plus holdings, each marked at the latest price this account traded it
+    at. A trade only changes the value of its own symbol, so the holdings value
+    is the running sum of each trade's change to its symbol's value.
+    """
+    _, symbol_index = np.unique(np.asarray(stocks, dtype=object), return_inverse=True)
+    signed = np.where(np.asarray(actions, dtype=object) == "buy", quantities, -quantities)
+    order = np.argsort(symbol_index, kind="stable")
+    first = np.r_[True, symbol_index[order][1:] != symbol_index[order][:-1]]
+    cumulative = np.cumsum(signed[order])
+    # Position after each trade, restarting the running sum at every symbol
+    held = cumulative - np.maximum.accumulate(np.where(first, cumulative - signed[order], -np.inf))
+    value = held * prices[order]
+    change = np.empty_like(value)
+    change[order] = value - np.where(first, 0.0, np.r_[0.0, value[:-1]])
+    return balances + np.cumsum(change)
+
+
+def equity_curve(db: Any, api_key: str, resolution: str = "raw", max_points: int = 500) -> Optional[Dict[str, Any]]:
+    """
+    Balance and net worth after each trade, reduced to the last point of every
+    ``resolution`` bucket and then downsampled with LTTB to ``max_points``.
+    """
+    result = db.fetch(EQUITY_QUERY, (api_key,))
+    if isinstance(result, Exception):
+        log_creator(api_key=api_key, name='Unknown', log=str(result), error=True)
+        return None
+    if not result:
+        log_creator(api_key=api_key, name='Unknown', log='Failed to fetch equity curve', error=True)
+        return None
+
+    times, stocks, actions, quantities, prices, balances = zip(*result)
+    seconds = np.array(times, dtype="datetime64[s]").astype(np.int64)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    balances = np.asarray(balances, dtype=np.float64)
+    net_worth = _net_worth(stocks, actions, quantities, prices, balances)
+
+    step = RESOLUTIONS[resolution]
+    if step:
+        bucket = seconds // step
+        last = np.flatnonzero(np.r_[bucket[1:] != bucket[:-1], True])
+        seconds, balances, net_worth = bucket[last] * step, balances[last], net_worth[last]
+
+    keep = lttb(seconds.astype(np.float64), net_worth, max_points)
+    log_creator(api_key=api_key, name='Unknown', log='Equity curve fetched', error=False)
+    return {
+        "resolution": resolution,
+        "total_points": len(result),
+        "points": [
+            {"Time": time, "Balance": balance, "Net_worth": worth}
+            for time, balance, worth in zip(
+                seconds[keep].astype("datetime64[s]").astype(str).tolist(),
+                balances[keep].tolist(), net_worth[keep].tolist()
+            )
+        ]
+    }
@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+from sortedcontainers import SortedList
+
+from Dashboard.models import LeaderboardRow
+from DatabaseManagement.events import BALANCE_CHANGED, TRADE_COMMITTED, events
+
+
+class TeamLeaderboard:
+    """
+    Balances of one team kept in descending order. Updates and rank lookups
+    are O(log n); a page costs O(log n + limit). Ties share the best rank, the
+    same as ranking with method='min'.
+
+    Each member's users.version is kept alongside, so ``state`` is the same
+    ``"<members>.<sum of versions>"`` that ``team_version`` reads from the
+    database, and boards holding the same rows agree on it in every worker.
+    """
+    def __init__(self, team: str, rows=()):
+        self.team = team
+        self._entries = SortedList()  # (-balance, api_key)
+        self._by_key: Dict[str, tuple] = {}  # api_key -> (balance, name)
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._version_sum = 0
+        self.loaded_at = time.monotonic()
+        self.stale = False
+        for api_key, name, balance, version in rows:
+            self._insert(api_key, name, balance, version)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, api_key: str) -> bool:
+        return api_key in self._by_key
+
+    def _insert(self, api_key: str, name: str, balance: float, version: int) -> None:
+        balance = float(balance or 0.0)
+        self._by_key[api_key] = (balance, name)
+        self._entries.add((-balance, api_key))
+        self._versions[api_key] = version
+        self._version_sum += version
+
+    def _remove(self, api_key: str) -> None:
+        current = self._by_key.pop(api_key, None)
+        if current is not None:
+            self._entries.remove((-current[0], api_key))
+            self._version_sum -= self._versions.pop(api_key)
+
+    def _rank(self, balance: float) -> int:
+        # Number of strictly larger balances, plus one
+        return self._entries.bisect_left((-balance,)) + 1
+
+    def _row(self, rank: int, api_key: str) -> Dict[str, Any]:
+        balance, name = self._by_key[api_key]
+        return {"Rank": rank, "Name": name, "Team": self.team, "Balance": balance}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return f"{len(self._entries)}.{self._version_sum}"
+
+    def upsert(self, api_key: str, name: str, balance: float, version: int) -> None:
+        """Applies the member's balance at account ``version``, unless the board already has it or a later one."""
+        with self._lock:
+            if version <= self._versions.get(api_key, -1):
+                return
+            self._remove(api_key)
+            self._insert(api_key, name, balance, version)
+
+    def page(self, offset: int = 0, limit: Optional[int] = None) -> List[LeaderboardRow]:
+        with self._lock:
+            stop = None if limit is None else offset + limit
+            rows = []
+            rank = previous = None
+            for position, (negative_balance, api_key) in enumerate(islice(self._entries, offset, stop), start=offset):
+                if negative_balance != previous:
+                    rank = self._rank(-negative_balance) if previous is None else position + 1
+                    previous = negative_balance
+                balance, name = self._by_key[api_key]
+                rows.append(LeaderboardRow(rank, name, self.team, balance))
+            return rows
+
+    def rank_of(self, api_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            current = self._by_key.get(api_key)
+            if current is None:
+                return None
+            row = self._row(self._rank(current[0]), api_key)
+            row["Total"] = len(self._entries)
+            return row
+
+
+class LeaderboardRegistry:
+    """
+    One TeamLeaderboard per team, loaded from the users table on first use and
+    reloaded after ``ttl`` seconds so that balance changes made by other
+    workers show up. Balance changes made through this process' trade path are
+    applied incrementally in between.
+
+    Only one request reloads a team at a time; while it does, others keep
+    reading the previous board, or wait for the first load. Balance changes
+    recorded during a reload are replayed onto the new board before it is
+    swapped in, as the SELECT may have read the rows before they committed.
+    """
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self._boards: Dict[str, TeamLeaderboard] = {}
+        self._team_of: Dict[str, str] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        # Team -> changes recorded while it reloads; None marks an invalidation
+        self._pending: Dict[str, List[Optional[tuple]]] = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, board: Optional[TeamLeaderboard], version: Optional[str]) -> bool:
+        return (board is not None and not board.stale and time.monotonic() - board.loaded_at <= self.ttl
+                and (version is None or board.state == version))
+
+    def get(self, db: Any, team: str, version: Optional[str] = None) -> TeamLeaderboard:
+        """
+        The team's board. With ``version``, the team's committed state read
+        from the database, a board that doesn't match it is reloaded, which
+        picks up changes made by other workers before the TTL runs out.
+        """
+        board = self._boards.get(team)
+        if self._fresh(board, version):
+            return board
+        with self._lock:
+            load_lock = self._load_locks.setdefault(team, threading.Lock())
+        # Serve the old board rather than queue behind a reload already running
+        if not load_lock.acquire(blocking=board is None):
+            return board
+        try:
+            board = self._boards.get(team)
+            if self._fresh(board, version):
+                return board
+            return self._load(db, team)
+        finally:
+            load_lock.release()
+
+    def _load(self, db: Any, team: str) -> TeamLeaderboard:
+        with self._lock:
+            self._pending[team] = []
+        try:
+            result = db.fetch('SELECT api_key, name, balance, version FROM users WHERE team = %s', (team,))
+            if isinstance(result, Exception):
+                raise result
+            board = TeamLeaderboard(team, result)
+        except Exception:
+            with self._lock:
+                self._pending.pop(team, None)
+            raise
+        with self._lock:
+            for change in self._pending.pop(team):
+                if change is None:
+                    board.stale = True
+                else:
+                    board.upsert(*change)
+            self._boards[team] = board
+            for api_key, _, _, _ in result:
+                self._team_of[api_key] = team
+        return board
+
+    def record_balance(self, team: str, api_key: str, name: str, balance: float, version: int) -> None:
+        """Applies a balance committed at account ``version``, if the team's board is loaded or loading."""
+        with self._lock:
+            self._team_of[api_key] = team
+            pending = self._pending.get(team)
+            if pending is not None:
+                pending.append((api_key, name, balance, version))
+            board = self._boards.get(team)
+            if board is not None:
+                board.upsert(api_key, name, balance, version)
+
+    def invalidate_account(self, api_key: str) -> None:
+        """Marks the account's board for reload, for changes whose new value isn't known here."""
+        with self._lock:
+            team = self._team_of.get(api_key)
+            if team is None:
+                return
+            pending = self._pending.get(team)
+            if pending is not None:
+                pending.append(None)
+            board = self._boards.get(team)
+            if board is not None:
+                board.stale = True
+
+    def on_trade_committed(self, api_key: str, name: str, team: str, new_balance: float, version: int, **_) -> None:
+        self.record_balance(team, api_key, name, new_balance, version)
+
+    def on_balance_changed(self, api_key: str, **_) -> None:
+        self.invalidate_account(api_key)
+
+
+leaderboards = LeaderboardRegistry(ttl=float(os.getenv("LEADERBOARD_TTL", "30")))
+events.subscribe(TRADE_COMMITTED, leaderboards.on_trade_committed)
+events.subscribe(BALANCE_CHANGED, leaderboards.on_balance_changed)
@@ -0,0 +1,44 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+# Response rows for the dashboard routes. They are built positionally
+# straight from result tuples and encoded natively by orjson, skipping both
+# per-field dict building and jsonable_encoder. Field names are the JSON keys
+# the dashboard already reads. No __slots__: orjson serializes a dataclass
+# from its instance __dict__, and falls back to a much slower path for slots.
+
+
+@dataclass
+class PortfolioRow:
+    Stock: str
+    Quantity: int
+
+
+@dataclass
+class TransactionRow:
+    Stock: str
+    Stock_price: float
+    Quantity: int
+    Type: str
+    before_balance: float
+    After_balance: float
+    Time: datetime
+
+
+@dataclass
+class UserRow:
+    api_key: str
+    name: str
+    team: str
+    balance: float
+    token: Optional[str]
+    token_expiry: Optional[datetime]
+
+
+@dataclass
+class LeaderboardRow:
+    Rank: int
+    Name: str
+    Team: str
+    Balance: float
@@ -0,0 +1,93 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from utils.loggings import log_creator
+
+FIELDS = ("profile", "holdings", "trades", "summary")
+
+# Every section shares one column layout so they can be sent as a single
+# UNION ALL: kind, text1, text2, num1, num2, num3, num4, time, id
+_SECTIONS = {
+    "profile": '''
+    SELECT 'profile', name, team, balance, NULL, NULL, NULL, NULL, NULL
+    FROM users WHERE api_key = %s''',
+    "holdings": '''
+    SELECT 'holdings', stock, NULL, quantity, NULL, NULL, NULL, NULL, NULL
+    FROM stocks WHERE api_key = %s''',
+    # Wrapped in a derived table so ORDER BY/LIMIT apply to this branch only
+    "trades": '''
+    SELECT * FROM (
+        SELECT 'trades', stock, type, stock_price, quantity, before_balance, after_balance, time, id
+        FROM trades WHERE api_key = %s ORDER BY time DESC, id DESC LIMIT %s
+    ) AS recent''',
+    "summary": '''
+    SELECT 'summary', NULL, NULL, COUNT(*),
+           SUM(CASE WHEN type = 'buy' THEN stock_price * quantity ELSE 0 END),
+           SUM(CASE WHEN type = 'sell' THEN stock_price * quantity ELSE 0 END),
+           COUNT(DISTINCT stock), MAX(time), NULL
+    FROM trades WHERE api_key = %s''',
+}
+
+
+def overview_query(fields: Iterable[str], trades_limit: int):
+    """The UNION ALL statement and parameters for the requested sections; the profile is always included."""
+    parts, params = [_SECTIONS["profile"]], [None]
+    for field in FIELDS[1:]:
+        if field in fields:
+            parts.append(_SECTIONS[field])
+            params.append(None)
+            if field == "trades":
+                params.append(trades_limit)
+    return "\nUNION ALL".join(parts), params
+
+
+def _time(value):
+    # SQLite cannot infer a type for a column of a compound SELECT
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def overview(db: Any, api_key: str, fields: Iterable[str] = FIELDS, trades_limit: int = 20) -> Optional[Dict[str, Any]]:
+    """
+    Profile, holdings, recent trades and trade summary for one account in a
+    single round-trip. Only the sections in ``fields`` are returned. Returns
+    None when the api key is unknown; database errors are raised.
+    """
+    fields = set(fields)
+    query, params = overview_query(fields, trades_limit)
+    result = db.fetch(query, tuple(api_key if param is None else param for param in params))
+    if isinstance(result, Exception):
+        log_creator(api_key=api_key, name='Unknown', log=str(result), error=True)
+        raise result
+
+    profile = None
+    holdings, trades, summary = [], [], None
+    for kind, text1, text2, num1, num2, num3, num4, time, trade_id in result:
+        if kind == "profile":
+            profile = {"name": text1, "team": text2, "balance": num1}
+        elif kind == "holdings":
+            holdings.append({"Stock": text1, "Quantity": int(num1)})
+        elif kind == "trades":
+            trades.append({
+                "Stock": text1,
+                "Stock_price": num1,
+                "Quantity": int(num2),
+                "Type": text2,
+                "before_balance": num3,
+                "After_balance": num4,
+                "Time": _time(time)
+            })
+        else:
+            summary = {
+                "trades": int(num1),
+                "bought_value": num2 or 0.0,
+                "sold_value": num3 or 0.0,
+                "stocks_traded": int(num4),
+                "last_trade": _time(time)
+            }
+    if profile is None:
+        log_creator(api_key=api_key, name='Unknown', log='Failed to fetch overview', error=True)
+        return None
+
+    log_creator(api_key=api_key, name=profile["name"], log='Overview fetched', error=False)
+    sections = {"profile": profile, "holdings": holdings, "trades": trades, "summary": summary}
+    return {field: sections[field] for field in FIELDS if field in fields}
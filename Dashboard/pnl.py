@@ -0,0 +1,432 @@
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from DatabaseManagement.cache import TTLCache
+from DatabaseManagement.events import ACCOUNT_DELETED, TRADE_COMMITTED, events
+from MarketData.price_cache import price_cache
+from utils.loggings import log_creator
+
+# Some accounts' trades plus the account version they were read at, in one
+# statement so both come from the same snapshot
+ACCOUNT_TRADES_QUERY = '''
+SELECT t.id, t.api_key, t.stock, t.type, t.quantity, t.stock_price, t.before_balance, t.after_balance, u.version
+FROM trades t JOIN users u ON u.api_key = t.api_key
+WHERE t.api_key IN ({keys})
+'''
+# Accounts rebuilt per statement
+REBUILD_BATCH = 500
+
+# (stock, action, quantity, stock_price, before_balance, after_balance)
+Fill = Tuple[str, str, int, float, float, float]
+
+
+def fifo_batch(ids, api_keys, stocks, actions, quantities, prices, befores, afters) -> Dict[str, np.ndarray]:
+    """
+    FIFO lot accounting over a whole trade history without a per-trade loop.
+
+    Trades are grouped by (api_key, stock) and put in id order. Along each
+    group's cumulative bought quantity, the cost of the first ``x`` shares
+    bought is piecewise linear. Every sell consumes the next slice of that
+    axis, so its FIFO cost is the difference of one ``np.interp`` lookup at
+    each end of the slice. Groups are laid end to end on a single global axis,
+    so one interpolation covers every account and symbol at once.
+
+    Costs and proceeds are taken from the balance change of each trade, so
+    brokerage is included in the lot cost and in the realized P&L. Returns
+    per-group arrays (``api_key``, ``stock``, ``realized``, ``fees``,
+    ``sells``, ``wins``, ``open_qty`` and ``open_cost``) plus the open lots
+    (``lot_group``, ``lot_qty`` and ``lot_cost``, the cost per share).
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(ids) == 0:
+        empty, none = np.empty(0, dtype=np.float64), np.empty(0, dtype=object)
+        return {"api_key": none, "stock": none, "realized": empty, "fees": empty, "sells": empty, "wins": empty,
+                "open_qty": empty, "open_cost": empty, "lot_group": np.empty(0, dtype=np.intp), "lot_qty": empty,
+                "lot_cost": empty}
+
+    owners, owner_index = np.unique(np.asarray(api_keys, dtype=object), return_inverse=True)
+    symbols, symbol_index = np.unique(np.asarray(stocks, dtype=object), return_inverse=True)
+    order = np.lexsort((ids, symbol_index, owner_index))
+    code = owner_index[order].astype(np.int64) * len(symbols) + symbol_index[order]
+    starts = np.flatnonzero(np.r_[True, code[1:] != code[:-1]])
+    group = np.cumsum(np.r_[True, code[1:] != code[:-1]]) - 1
+    groups = len(starts)
+
+    is_buy = np.asarray(actions, dtype=object)[order] == "buy"
+    quantity = np.asarray(quantities, dtype=np.float64)[order]
+    notional = quantity * np.asarray(prices, dtype=np.float64)[order]
+    cash_out = np.asarray(befores, dtype=np.float64)[order] - np.asarray(afters, dtype=np.float64)[order]
+
+    bought = np.where(is_buy, quantity, 0.0)
+    sold = np.where(is_buy, 0.0, quantity)
+    cum_bought = np.cumsum(bought)
+    cum_cost = np.cumsum(np.where(is_buy, cash_out, 0.0))
+    # Cost of the first x shares bought, along the global axis
+    axis = np.r_[0.0, cum_bought[is_buy]]
+    cost_at = np.r_[0.0, cum_cost[is_buy]]
+
+    base = (cum_bought - bought)[starts]
+    total_bought = np.add.reduceat(bought, starts)
+    cum_sold = np.cumsum(sold)
+    group_sold = cum_sold - (cum_sold - sold)[starts][group]
+    # Selling more than was ever bought (e.g. holdings loaded without trades) has no cost basis
+    limit = total_bought[group]
+    upper = base[group] + np.minimum(group_sold, limit)
+    lower = base[group] + np.minimum(group_sold - sold, limit)
+    sell_cost = np.interp(upper, axis, cost_at) - np.interp(lower, axis, cost_at)
+    sell_pnl = np.where(is_buy, 0.0, -cash_out - sell_cost)
+    fee = np.where(is_buy, cash_out - notional, notional + cash_out)
+
+    total_sold = np.minimum(np.add.reduceat(sold, starts), total_bought)
+    open_qty = total_bought - total_sold
+    open_cost = np.interp(base + total_bought, axis, cost_at) - np.interp(base + total_sold, axis, cost_at)
+
+    # Lots still open: the part of each buy beyond what the group has sold
+    consumed_to = (base + total_sold)[group]
+    remaining = np.clip(cum_bought - np.maximum(cum_bought - bought, consumed_to), 0.0, bought)
+    open_lots = np.flatnonzero(is_buy & (remaining > 0))
+
+    first = order[starts]
+    return {
+        "api_key": owners[owner_index[first]],
+        "stock": symbols[symbol_index[first]],
+        "realized": np.bincount(group, weights=sell_pnl, minlength=groups),
+        "fees": np.bincount(group, weights=fee, minlength=groups),
+        "sells": np.bincount(group, weights=~is_buy, minlength=groups),
+        "wins": np.bincount(group, weights=(~is_buy) & (sell_pnl > 0), minlength=groups),
+        "open_qty": open_qty,
+        "open_cost": open_cost,
+        "lot_group": group[open_lots],
+        "lot_qty": remaining[open_lots],
+        "lot_cost": cash_out[open_lots] / bought[open_lots]
+    }
+
+
+class Position:
+    """FIFO lots and running P&L of one (api_key, stock)."""
+    __slots__ = ("lots", "realized", "fees", "sells", "wins")
+
+    def __init__(self, lots=(), realized: float = 0.0, fees: float = 0.0, sells: int = 0, wins: int = 0):
+        self.lots = deque([quantity, cost] for quantity, cost in lots)  # [quantity, cost per share]
+        self.realized = realized
+        self.fees = fees
+        self.sells = sells
+        self.wins = wins
+
+    @property
+    def quantity(self) -> float:
+        return sum(lot[0] for lot in self.lots)
+
+    @property
+    def cost(self) -> float:
+        return sum(quantity * cost for quantity, cost in self.lots)
+
+    def apply(self, action: str, quantity: int, stock_price: float, before: float, after: float) -> None:
+        notional = quantity * stock_price
+        if action == "buy":
+            cash_out = before - after
+            self.lots.append([float(quantity), cash_out / quantity])
+            self.fees += cash_out - notional
+            return
+        proceeds = after - before
+        cost, left = 0.0, float(quantity)
+        while left > 0 and self.lots:
+            lot = self.lots[0]
+            taken = min(lot[0], left)
+            cost += taken * lot[1]
+            lot[0] -= taken
+            left -= taken
+            if lot[0] <= 0:
+                self.lots.popleft()
+        pnl = proceeds - cost
+        self.realized += pnl
+        self.fees += notional - proceeds
+        self.sells += 1
+        self.wins += pnl > 0
+
+
+class AccountPnl:
+    """
+    Positions of one account, rebuilt from history and then kept current by
+    the trade path. ``version`` is the users.version the positions reflect;
+    fills committed at or below it are already counted and are skipped.
+    """
+    def __init__(self, api_key: str, positions: Dict[str, Position], version: int = 0):
+        self.api_key = api_key
+        self.positions = positions
+        self.version = version
+        self._lock = threading.Lock()
+
+    def apply(self, fills: Sequence[Fill], version: int) -> bool:
+        """Applies fills committed at account ``version``. Returns False if they were already counted."""
+        with self._lock:
+            if version <= self.version:
+                return False
+            for stock, action, quantity, stock_price, before, after in fills:
+                self.positions.setdefault(stock, Position()).apply(action, quantity, stock_price, before, after)
+            self.version = version
+            return True
+
+    def avg_costs(self) -> Dict[str, float]:
+        """Average cost per share of each position's open lots, brokerage included."""
+        with self._lock:
+            costs = {}
+            for stock, position in self.positions.items():
+                quantity = position.quantity
+                if quantity > 0:
+                    costs[stock] = position.cost / quantity
+            return costs
+
+    def columns(self):
+        """(stocks, quantity, cost, realized, fees, sells, wins) of the positions, one array each, by symbol."""
+        with self._lock:
+            stocks = sorted(self.positions)
+            positions = [self.positions[stock] for stock in stocks]
+            quantity = np.array([position.quantity for position in positions], dtype=np.float64)
+            cost = np.array([position.cost for position in positions], dtype=np.float64)
+            realized = np.array([position.realized for position in positions], dtype=np.float64)
+            fees = np.array([position.fees for position in positions], dtype=np.float64)
+            sells = np.array([position.sells for position in positions], dtype=np.float64)
+            wins = np.array([position.wins for position in positions], dtype=np.float64)
+        return stocks, quantity, cost, realized, fees, sells, wins
+
+    def summary(self) -> Dict[str, Any]:
+        return _summarize(*self.columns())
+
+
+def _mark(stocks, quantity: np.ndarray, cost: np.ndarray):
+    """Last price and unrealized P&L per position; unpriced positions are marked at their average cost."""
+    avg_cost = np.divide(cost, quantity, out=np.zeros_like(cost), where=quantity != 0)
+    if len(stocks) == 0:
+        return avg_cost, avg_cost, np.zeros(0, dtype=np.float64)
+    symbols, symbol_index = np.unique(np.asarray(stocks, dtype=object), return_inverse=True)
+    price = price_cache.prices_for(symbols)[symbol_index]
+    price = np.where(np.isnan(price), avg_cost, price)
+    return avg_cost, price, quantity * price - cost
+
+
+def _summarize(stocks, quantity, cost, realized, fees, sells, wins) -> Dict[str, Any]:
+    avg_cost, price, unrealized = _mark(stocks, quantity, cost)
+    win_rate = np.divide(wins, sells, out=np.zeros_like(wins), where=sells != 0)
+    rows = [
+        {
+            "Stock": stock,
+            "Quantity": int(round(quantity_)),
+            "Avg_cost": avg_cost_,
+            "Last_price": price_,
+            "Realized_pnl": realized_,
+            "Unrealized_pnl": unrealized_,
+            "Total_pnl": realized_ + unrealized_,
+            "Fees": fees_,
+            "Closed_trades": int(sells_),
+            "Win_rate": win_rate_
+        }
+        for stock, quantity_, avg_cost_, price_, realized_, unrealized_, fees_, sells_, win_rate_ in zip(
+            stocks, quantity.tolist(), avg_cost.tolist(), price.tolist(), realized.tolist(), unrealized.tolist(),
+            fees.tolist(), sells.tolist(), win_rate.tolist()
+        )
+    ]
+    total_sells = float(sells.sum())
+    total = {
+        "Realized_pnl": float(realized.sum()),
+        "Unrealized_pnl": float(unrealized.sum()),
+        "Total_pnl": float(realized.sum() + unrealized.sum()),
+        "Fees": float(fees.sum()),
+        "Closed_trades": int(total_sells),
+        "Win_rate": float(wins.sum() / total_sells) if total_sells else 0.0
+    }
+    return {"positions": rows, "total": total}
+
+
+def _batch(rows: list) -> Dict[str, np.ndarray]:
+    if not rows:
+        return fifo_batch(*([],) * 8)
+    return fifo_batch(*zip(*rows))
+
+
+def rebuild_accounts(db: Any, api_keys: Sequence[str]) -> Dict[str, AccountPnl]:
+    """Rebuilds the lots of several accounts from their full trade histories, one batch pass per statement."""
+    accounts = {api_key: AccountPnl(api_key, {}) for api_key in api_keys}
+    keys = list(accounts)
+    for start in range(0, len(keys), REBUILD_BATCH):
+        chunk = keys[start:start + REBUILD_BATCH]
+        result = db.fetch(ACCOUNT_TRADES_QUERY.format(keys=", ".join(["%s"] * len(chunk))), tuple(chunk))
+        if isinstance(result, Exception):
+            raise result
+        # Accounts without trades read had none committed, so they stay at version 0 and every fill published later is new
+        for api_key, version in {row[1]: row[8] for row in result}.items():
+            accounts[api_key].version = version
+        batch = _batch([row[:8] for row in result])
+        lots: Dict[int, List[Tuple[float, float]]] = {}
+        for group, quantity, cost in zip(batch["lot_group"].tolist(), batch["lot_qty"].tolist(), batch["lot_cost"].tolist()):
+            lots.setdefault(group, []).append((quantity, cost))
+        for group, (owner, stock, realized, fees, sells, wins) in enumerate(zip(
+            batch["api_key"].tolist(), batch["stock"].tolist(), batch["realized"].tolist(), batch["fees"].tolist(),
+            batch["sells"].tolist(), batch["wins"].tolist()
+        )):
+            accounts[owner].positions[stock] = Position(lots.get(group, ()), realized, fees, int(sells), int(wins))
+    return accounts
+
+
+def rebuild_account(db: Any, api_key: str) -> AccountPnl:
+    """Rebuilds an account's lots from its full trade history."""
+    return rebuild_accounts(db, [api_key])[api_key]
+
+
+class PnlLedgers:
+    """
+    AccountPnl per recently viewed account. An account is rebuilt from the
+    trades table on first use and after ``ttl`` seconds, which picks up
+    trades made by other workers; trades committed through this process are
+    applied to the cached lots as they happen.
+
+    Fills recorded while an account is being rebuilt are kept and replayed
+    onto the rebuilt lots before they are cached. The account version each
+    fill was committed at decides whether the rebuild already counted it, so
+    no fill is lost or applied twice.
+    """
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self._accounts = TTLCache(maxsize=maxsize, ttl=ttl)
+        # api_key -> one list of (fills, version) per rebuild in progress
+        self._rebuilding: Dict[str, List[list]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Any, api_key: str) -> AccountPnl:
+        return self.get_many(db, [api_key])[api_key]
+
+    def get_many(self, db: Any, api_keys: Sequence[str]) -> Dict[str, AccountPnl]:
+        """The ledgers of several accounts; those not cached are rebuilt together."""
+        accounts: Dict[str, AccountPnl] = {}
+        missing: Dict[str, int] = {}  # api_key -> fill token
+        for api_key in api_keys:
+            account = self._accounts.get(api_key)
+            if account is not None:
+                accounts[api_key] = account
+            elif api_key not in missing:
+                missing[api_key] = self._accounts.begin_fill(api_key)
+        if not missing:
+            return accounts
+        recorded = {api_key: [] for api_key in missing}
+        with self._lock:
+            for api_key, fills in recorded.items():
+                self._rebuilding.setdefault(api_key, []).append(fills)
+        rebuilt = None
+        try:
+            rebuilt = rebuild_accounts(db, list(missing))
+        finally:
+            with self._lock:
+                for api_key, fills in recorded.items():
+                    waiting = self._rebuilding[api_key]
+                    waiting.remove(fills)
+                    if not waiting:
+                        del self._rebuilding[api_key]
+                    if rebuilt is not None:
+                        account = rebuilt[api_key]
+                        for replayed, version in fills:
+                            account.apply(replayed, version)
+                        self._accounts.set(api_key, account, missing[api_key])
+        accounts.update(rebuilt)
+        return accounts
+
+    def record(self, api_key: str, fills: Sequence[Fill], version: int) -> None:
+        """Applies fills committed at account ``version``, if the account's lots are loaded or being rebuilt."""
+        with self._lock:
+            for recorded in self._rebuilding.get(api_key, ()):
+                recorded.append((fills, version))
+            account = self._accounts.get(api_key)
+            if account is not None:
+                account.apply(fills, version)
+
+    def invalidate(self, api_key: str) -> None:
+        self._accounts.invalidate(api_key)
+
+    def on_trade_committed(self, api_key: str, fills: Sequence[Fill], version: int, **_) -> None:
+        self.record(api_key, fills, version)
+
+    def on_account_deleted(self, api_key: str, **_) -> None:
+        self.invalidate(api_key)
+
+
+pnl_ledgers = PnlLedgers(
+    maxsize=int(os.getenv("PNL_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PNL_CACHE_TTL", "300"))
+)
+events.subscribe(TRADE_COMMITTED, pnl_ledgers.on_trade_committed)
+events.subscribe(ACCOUNT_DELETED, pnl_ledgers.on_account_deleted)
+
+
+def open_costs(db: Any, api_keys: Iterable[str]) -> Dict[Tuple[str, str], float]:
+    """
+    Average cost per share of the open FIFO lots, brokerage included, per
+    (api_key, stock), from the accounts' cached ledgers, the same ones /api/pnl
+    reports from.
+    """
+    return {
+        (api_key, stock): cost
+        for api_key, account in pnl_ledgers.get_many(db, list(api_keys)).items()
+        for stock, cost in account.avg_costs().items()
+    }
+
+
+def account_pnl(db: Any, api_key: str) -> Optional[Dict[str, Any]]:
+    try:
+        price_cache.seed(db)
+        summary = pnl_ledgers.get(db, api_key).summary()
+    except Exception as e:
+        log_creator(api_key=api_key, name='Unknown', log=str(e), error=True)
+        return None
+    log_creator(api_key=api_key, name='Unknown', log='P&L fetched', error=False)
+    return summary
+
+
+def team_pnl(db: Any, team: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Per-member P&L of a team, best total first, from the members' cached
+    ledgers. Only members without one are rebuilt from their trades, together.
+    """
+    try:
+        price_cache.seed(db)
+        users = db.fetch('SELECT api_key, name FROM users WHERE team = %s', (team,))
+        if isinstance(users, Exception):
+            raise users
+        if not users:
+            log_creator(api_key="unknown", name=team, log='Failed to fetch team P&L', error=True)
+            return None
+        members = [api_key for api_key, _ in users]
+        accounts = pnl_ledgers.get_many(db, members)
+    except Exception as e:
+        log_creator(api_key="unknown", name=team, log=str(e), error=True)
+        return None
+
+    columns = [accounts[api_key].columns() for api_key in members]
+    owner = np.repeat(np.arange(len(members)), [len(stocks) for stocks, *_ in columns])
+    stocks = [stock for member_stocks, *_ in columns for stock in member_stocks]
+    quantity, cost, realized, fees, sells, wins = (np.concatenate([column[i] for column in columns]) for i in range(1, 7))
+    _, _, unrealized = _mark(stocks, quantity, cost)
+
+    def per_member(values):
+        return np.bincount(owner, weights=values, minlength=len(members))
+
+    realized, unrealized = per_member(realized), per_member(unrealized)
+    fees, sells, wins = per_member(fees), per_member(sells), per_member(wins)
+    total = realized + unrealized
+    win_rate = np.divide(wins, sells, out=np.zeros_like(wins), where=sells != 0)
+    names = dict(users)
+    log_creator(api_key="unknown", name=team, log='Team P&L fetched', error=False)
+    return [
+        {
+            "Name": names[members[index]],
+            "Team": team,
+            "Realized_pnl": float(realized[index]),
+            "Unrealized_pnl": float(unrealized[index]),
+            "Total_pnl": float(total[index]),
+            "Fees": float(fees[index]),
+            "Closed_trades": int(sells[index]),
+            "Win_rate": float(win_rate[index])
+        }
+        for index in np.argsort(-total, kind="stable").tolist()
+    ]
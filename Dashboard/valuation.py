@@ -0,0 +1,157 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from Dashboard.pnl import open_costs
+from MarketData.price_cache import price_cache
+from utils.loggings import log_creator
+
+# Holdings only; their cost basis comes from the FIFO lots in Dashboard/pnl.py,
+# so valuations agree with /api/pnl
+POSITIONS_QUERY = '''
+SELECT s.api_key, s.stock, s.quantity
+FROM stocks s
+JOIN users u ON u.api_key = s.api_key
+WHERE s.quantity <> 0{filter}
+'''
+
+
+def fetch_positions(db: Any, api_key: Optional[str] = None, team: Optional[str] = None) -> list:
+    """
+    Holdings of one account, one team, or everyone as (api_key, stock,
+    quantity, avg_cost) rows. avg_cost is None for holdings with no open lots.
+    """
+    if api_key is not None:
+        where, params = ' AND s.api_key = %s', (api_key,)
+    elif team is not None:
+        where, params = ' AND u.team = %s', (team,)
+    else:
+        where, params = '', ()
+    result = db.fetch(POSITIONS_QUERY.format(filter=where), params)
+    if isinstance(result, Exception):
+        raise result
+    if not result:
+        return result
+    costs = open_costs(db, {owner for owner, _, _ in result})
+    return [(owner, stock, quantity, costs.get((owner, stock))) for owner, stock, quantity in result]
+
+
+def value_positions(api_keys, stocks, quantities, avg_costs) -> Dict[str, np.ndarray]:
+    """
+    Marks positions to market in one vectorized pass. Symbols are looked up in
+    the price cache once each; positions without a known price are marked at
+    their average cost and flagged in ``priced``.
+
+    Returns per-position arrays (price, avg_cost, market_value, weight,
+    unrealized_pnl, priced) plus the per-account ``owners``, ``owner_index`` and
+    ``holdings_value`` used to compute the weights.
+    """
+    api_keys = np.asarray(api_keys, dtype=object)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    avg_costs = np.asarray(avg_costs, dtype=np.float64)
+    if len(api_keys) == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return {"price": empty, "avg_cost": empty, "market_value": empty, "weight": empty, "unrealized_pnl": empty,
+                "priced": np.empty(0, dtype=bool), "owners": np.empty(0, dtype=object),
+                "owner_index": np.empty(0, dtype=np.intp), "holdings_value": empty}
+
+    symbols, symbol_index = np.unique(np.asarray(stocks, dtype=object), return_inverse=True)
+    price = price_cache.prices_for(symbols)[symbol_index]
+    priced = ~np.isnan(price)
+    avg_costs = np.nan_to_num(np.where(np.isnan(avg_costs), price, avg_costs))
+    price = np.where(priced, price, avg_costs)
+
+    market_value = quantities * price
+    owners, owner_index = np.unique(api_keys, return_inverse=True)
+    holdings_value = np.bincount(owner_index, weights=market_value, minlength=len(owners))
+    owner_total = holdings_value[owner_index]
+    weight = np.divide(market_value, owner_total, out=np.zeros_like(market_value), where=owner_total != 0)
+    unrealized_pnl = (price - avg_costs) * quantities
+
+    return {"price": price, "avg_cost": avg_costs, "market_value": market_value, "weight": weight, "unrealized_pnl": unrealized_pnl,
+            "priced": priced, "owners": owners, "owner_index": owner_index, "holdings_value": holdings_value}
+
+
+def _columns(rows: list):
+    if not rows:
+        return [], [], [], []
+    api_keys, stocks, quantities, avg_costs = zip(*rows)
+    return api_keys, stocks, quantities, [np.nan if cost is None else cost for cost in avg_costs]
+
+
+def valued_portfolio(db: Any, api_key: str) -> Optional[List[Dict[str, Any]]]:
+    try:
+        price_cache.seed(db)
+        rows = fetch_positions(db, api_key=api_key)
+    except Exception as e:
+        log_creator(api_key=api_key, name='Unknown', log=str(e), error=True)
+        return None
+    if not rows:
+        log_creator(api_key=api_key, name='Unknown', log='Failed to fetch portfolio', error=True)
+        return None
+
+    api_keys, stocks, quantities, avg_costs = _columns(rows)
+    valued = value_positions(api_keys, stocks, quantities, avg_costs)
+    log_creator(api_key=api_key, name='Unknown', log='Valued portfolio fetched', error=False)
+    return [
+        {
+            "Stock": stock,
+            "Quantity": quantity,
+            "Avg_cost": avg_cost,
+            "Last_price": last_price,
+            "Market_value": market_value,
+            "Weight": weight,
+            "Unrealized_pnl": unrealized_pnl,
+            "Priced": priced
+        }
+        for stock, quantity, avg_cost, last_price, market_value, weight, unrealized_pnl, priced in zip(
+            stocks, quantities, valued["avg_cost"].tolist(), valued["price"].tolist(),
+            valued["market_value"].tolist(), valued["weight"].tolist(), valued["unrealized_pnl"].tolist(),
+            valued["priced"].tolist()
+        )
+    ]
+
+
+def networth_leaderboard(db: Any, team: str, offset: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+    """Ranks a team by cash plus marked-to-market holdings."""
+    try:
+        price_cache.seed(db)
+        users = db.fetch('SELECT api_key, name, balance FROM users WHERE team = %s', (team,))
+        if isinstance(users, Exception):
+            raise users
+        rows = fetch_positions(db, team=team)
+    except Exception as e:
+        log_creator(api_key="unknown", name=team, log=str(e), error=True)
+        return None
+    if not users:
+        log_creator(api_key="unknown", name=team, log='Failed to fetch net worth leaderboard', error=True)
+        return None
+
+    user_keys, names, balances = zip(*users)
+    user_keys = np.asarray(user_keys, dtype=object)
+    balances = np.asarray(balances, dtype=np.float64)
+    holdings = np.zeros(len(user_keys), dtype=np.float64)
+    if rows:
+        valued = value_positions(*_columns(rows))
+        # Scatter each owner's holdings value onto the team's user order
+        order = np.argsort(user_keys)
+        positions = order[np.searchsorted(user_keys[order], valued["owners"])]
+        holdings[positions] = valued["holdings_value"]
+    networth = balances + holdings
+
+    ranking = np.argsort(-networth, kind="stable")
+    sorted_networth = -networth[ranking]
+    ranks = np.searchsorted(sorted_networth, sorted_networth, side="left") + 1
+    stop = None if limit is None else offset + limit
+    log_creator(api_key="unknown", name=team, log='Net worth leaderboard fetched', error=False)
+    return [
+        {
+            "Rank": int(ranks[position]),
+            "Name": names[index],
+            "Team": team,
+            "Balance": float(balances[index]),
+            "Holdings_value": float(holdings[index]),
+            "Net_worth": float(networth[index])
+        }
+        for position, index in enumerate(ranking[offset:stop].tolist(), start=offset)
+    ]
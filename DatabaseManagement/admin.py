@@ -1,5 +1,5 @@
 from typing import Any, Dict, Union
-from database import Database
+from DatabaseManagement.database import Database
 
 def create_users_table(db: Any) -> Dict[str, Union[bool, str]]:
     query = '''
@@ -36,6 +36,7 @@ def create_trades_table(db: Any) -> Dict[str, Union[bool, str]]:
     '''
     success = db.execute_final(query)
     db.create_index("trades", "api_key_index_2", ["api_key"])
+    db.create_index("trades", "api_key_time_id", ["api_key", "time", "id"])
     return {"success": success, "message": "Trades table created" if success is True else "Failed to create trades table"}
 
 
@@ -53,6 +54,7 @@ def create_stocks_table(db: Any) -> Dict[str, Union[bool, str]]:
     success = db.execute_final(query)
     db.create_index("stocks", "api_key_index_3", ["api_key"])
     db.create_index("stocks", "stock_index_1", ["stock"])
+    db.create_index("stocks", "api_key_stock_unique", ["api_key", "stock"], unique=True)
     return {"success": success, "message": "Stocks table created" if success is True else "Failed to create stocks table"}
 
 def create_log_table(db: Any) -> Dict[str, Union[bool, str]]:
@@ -71,6 +73,8 @@ def create_log_table(db: Any) -> Dict[str, Union[bool, str]]:
     return {"success": success, "message": "Logs table created" if success is True else "Failed to create logs table"}
 
 if __name__ == "__main__":
+    # Tables and indexes are managed by the versioned migrations:
+    #   python -m DatabaseManagement.migrations migrate
     db = Database()
     
     # print(db.delete_table("stocks"))
@@ -0,0 +1,72 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, TypeVar, Union
+
+from DatabaseManagement import service
+
+T = TypeVar("T")
+
+# Sized like the connection pool: more threads than connections would only queue on checkout
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DB_EXECUTOR_WORKERS", os.getenv("MYSQL_POOL_MAX", "10"))),
+    thread_name_prefix="db"
+)
+
+
+async def run_in_db_thread(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Runs a blocking database call on the bounded database executor so the event
+    loop stays free while the query is in flight.
+    """
+    loop = asyncio.get_running_loop()
+    # Carry the request's logging context over to the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+def shutdown_executor() -> None:
+    _executor.shutdown(wait=True)
+
+
+async def create_user(db: Any, name: str, team: str, balance: float, api_key: str, token: str, token_expiry: datetime) -> Dict[str, Union[bool, str]]:
+    return await run_in_db_thread(service.create_user, db, name, team, balance, api_key, token, token_expiry)
+
+async def delete_user(db: Any, api_key: str) -> Dict[str, Union[bool, str]]:
+    return await run_in_db_thread(service.delete_user, db, api_key)
+
+async def get_user(db: Any, api_key: str) -> Optional[Dict[str, Union[str, float]]]:
+    return await run_in_db_thread(service.get_user, db, api_key)
+
+async def update_user_token(db: Any, api_key: str, token: str, token_expiry: datetime) -> Dict[str, Union[bool, str]]:
+    return await run_in_db_thread(service.update_user_token, db, api_key, token, token_expiry)
+
+async def update_balance(db: Any, api_key: str, new_balance: float) -> Dict[str, Union[bool, str]]:
+    return await run_in_db_thread(service.update_balance, db, api_key, new_balance)
+
+async def create_trade(db: Any, api_key: str, name: str, stock: str, stock_price: float, quantity: int, type: str, before_balance: float, after_balance: float, time: datetime) -> Dict[str, Union[bool, str]]:
+    return await run_in_db_thread(service.create_trade, db, api_key, name, stock, stock_price, quantity, type, before_balance, after_balance, time)
+
+async def create_stock(db: Any, api_key: str, name: str, stock: str, quantity: int) -> Dict[str, Union[bool, str]]:
+    return await run_in_db_thread(service.create_stock, db, api_key, name, stock, quantity)
+
+async def get_stock(db: Any, api_key: str, stock: str) -> Optional[Dict[str, Union[str, float]]]:
+    return await run_in_db_thread(service.get_stock, db, api_key, stock)
+
+async def update_stock(db: Any, api_key: str, stock: str, quantity: int) -> Dict[str, Union[bool, str]]:
+    return await run_in_db_thread(service.update_stock, db, api_key, stock, quantity)
+
+async def delete_stock(db: Any, api_key: str, stock: str) -> Dict[str, Union[bool, str]]:
+    return await run_in_db_thread(service.delete_stock, db, api_key, stock)
+
+async def commit_transaction(db: Any) -> None:
+    return await run_in_db_thread(db.commit_transaction)
+
+async def execute_trade(db: Any, api_key: str, stock: str, stock_price: float, quantity: int, action: str, charges: float, flat_charge: float = 0.0) -> Optional[Dict[str, Any]]:
+    return await run_in_db_thread(service.execute_trade, db, api_key, stock, stock_price, quantity, action, charges, flat_charge)
+
+async def execute_trades_batch(db: Any, api_key: str, orders: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    return await run_in_db_thread(service.execute_trades_batch, db, api_key, orders)
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire ``ttl`` seconds after they
+    were written. Holds at most ``maxsize`` entries; the least recently used
+    one is evicted first.
+
+    A miss is filled by calling ``begin_fill`` before reading the source and
+    passing its token to ``set``. An ``update`` or ``invalidate`` of the key in
+    between voids the token, so a value read before that write is not cached
+    over it.
+    """
+    def __init__(self, maxsize: int = 10000, ttl: float = 30.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Key -> token of the fill in progress for it, if any
+        self._fills: Dict[Hashable, int] = {}
+        self._fill_seq = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def begin_fill(self, key: Hashable) -> int:
+        """Starts filling ``key`` after a miss; pass the returned token to ``set``."""
+        with self._lock:
+            self._fill_seq += 1
+            # Abandoned fills (e.g. failed reads) are forgotten in bulk; their tokens just stop matching
+            if len(self._fills) >= self.maxsize:
+                self._fills.clear()
+            self._fills[key] = self._fill_seq
+            return self._fill_seq
+
+    def set(self, key: Hashable, value: Any, fill: Optional[int] = None) -> bool:
+        """
+        Caches ``value``. With a ``fill`` token from ``begin_fill`` nothing is
+        written if the key was updated or invalidated since; returns whether
+        the value was cached.
+        """
+        with self._lock:
+            if fill is not None:
+                if self._fills.get(key) != fill:
+                    return False
+                del self._fills[key]
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def update(self, key: Hashable, **fields) -> bool:
+        """Writes ``fields`` through to a cached dict entry, if there is one. Keeps its expiry."""
+        with self._lock:
+            self._fills.pop(key, None)
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            expires_at, value = entry
+            self._data[key] = (expires_at, {**value, **fields})
+            return True
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._fills.pop(key, None)
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._fills.clear()
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+# User rows keyed by api_key, shared by the extension and dashboard services
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "30"))
+)
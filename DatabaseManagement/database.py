@@ -1,55 +1,85 @@
 import os
-from typing import Optional
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
 import mysql.connector
 from mysql.connector import Error
 from dotenv import load_dotenv
 
+from DatabaseManagement.query_stats import query_stats
+from utils.metrics import DB_POOL_CONNECTIONS, observe_query, query_name
+
 load_dotenv()
 
+# mysql, or sqlite for an embedded single-node database in SQLITE_PATH
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+
+
+def connect_mysql():
+    """Opens a new raw MySQL connection from the environment settings."""
+    return mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST"),
+        user=os.getenv("MYSQL_USER"),
+        password=os.getenv("MYSQL_PASSWORD"),
+        database=os.getenv("MYSQL_DATABASE"),
+        port=os.getenv("MYSQL_PORT")
+    )
+
+
+def connect_db():
+    """Opens a new raw connection to the configured backend."""
+    if DB_BACKEND == "sqlite":
+        from DatabaseManagement.sqlite_backend import connect_sqlite
+        return connect_sqlite()
+    return connect_mysql()
+
+
 class Database:
-    def __init__(self):
+    def __init__(self, connection=None):
         self.connection = None
         self.cursor = None
         self.transaction_active = False
-        self.connect()
+        # Callbacks to run once the current transaction has committed
+        self._after_commit: List[Callable[[], None]] = []
+        if connection is None:
+            self.connect()
+        else:
+            self.connection = connection
+            self.cursor = connection.cursor(buffered=True)
     
     def connect(self) -> dict:
         message = {"success": False, "message": ""}
         try:
-            self.connection = mysql.connector.connect(
-                host=os.getenv("MYSQL_HOST"),
-                user=os.getenv("MYSQL_USER"),
-                password=os.getenv("MYSQL_PASSWORD"),
-                database=os.getenv("MYSQL_DATABASE"),
-                port=os.getenv("MYSQL_PORT")
-            )
+            self.connection = connect_db()
             if self.connection.is_connected():
                 self.cursor = self.connection.cursor(buffered=True)
                 print("Successfully connected to the database")
                 message["success"] = True
                 message["message"] = "Successfully connected to the database"
         except Error as e:
-            print(f"Error while connecting to MySQL: {e}")
+            print(f"Error while connecting to the database: {e}")
             message["message"] = str(e)
         return message
     
+    @property
+    def dialect(self) -> str:
+        return "sqlite" if DB_BACKEND == "sqlite" else "mysql"
+
     def start_transaction(self):
         """Starts a new transaction."""
         if self.connection:
             self.connection.start_transaction()
-            print(self.connection.in_transaction)
-            print("Transaction started")
         else:
             print("Transaction already in progress")
     
     def commit_transaction(self):
         """Commits the current transaction."""
         if self.connection:
-            # print(self.connection.in_transaction)
             self.connection.commit()
-            print(self.connection.in_transaction)
             self.transaction_active = False
-            print("Transaction committed")
+            self._committed()
         else:
             print("No active transaction to commit")
     
@@ -58,10 +88,26 @@ class Database:
         if self.connection:
             self.connection.rollback()
             self.transaction_active = False
-            print("Transaction rolled back")
+            self._after_commit.clear()
         else:
             print("No active transaction to rollback")
     
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """
+        Runs ``callback`` once the writes made so far are committed, e.g. to
+        invalidate a cache only when other connections can read the new rows.
+        Dropped if the transaction is rolled back instead.
+        """
+        self._after_commit.append(callback)
+
+    def _committed(self) -> None:
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"After-commit callback failed: {e}")
+
     def delete_table(self, table_name):
         try:
             query = f"DROP TABLE IF EXISTS {table_name}"
@@ -73,10 +119,41 @@ class Database:
         except Error as e:
             return e
         
-    def create_index(self, table_name, index_name, columns):
+    def index_exists(self, table_name, index_name) -> bool:
+        if self.dialect == "sqlite":
+            result = self.fetch('''
+            SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s LIMIT 1
+            ''', (table_name, index_name))
+        else:
+            result = self.fetch('''
+            SELECT 1 FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1
+            ''', (table_name, index_name))
+        if isinstance(result, Exception):
+            raise result
+        return bool(result)
+
+    def column_exists(self, table_name, column_name) -> bool:
+        if self.dialect == "sqlite":
+            result = self.fetch('''
+            SELECT 1 FROM pragma_table_info(%s) WHERE name = %s LIMIT 1
+            ''', (table_name, column_name))
+        else:
+            result = self.fetch('''
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1
+            ''', (table_name, column_name))
+        if isinstance(result, Exception):
+            raise result
+        return bool(result)
+
+    def create_index(self, table_name, index_name, columns, unique=False):
         try:
+            if self.index_exists(table_name, index_name):
+                return True
             column_list = ', '.join(columns)
-            query = f"CREATE INDEX {index_name} ON {table_name} ({column_list})"
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            query = f"CREATE {kind} {index_name} ON {table_name} ({column_list})"
             result = self.execute_final(query)
             if result is not True:
                 raise Error("Failed to create index")
@@ -85,39 +162,305 @@ class Database:
             print(f"Error creating index: {e}")
             return e
     
+    def _observe(self, query: str, params: Any, start: float, ok: bool, rows: Optional[int] = None) -> None:
+        """Feeds one statement's timing into the metrics and the slow-query log."""
+        elapsed = time.perf_counter() - start
+        name = query_name(3)
+        observe_query(name, elapsed, ok)
+        if rows is None and ok:
+            rows = max(self.cursor.rowcount, 0)
+        # Plans run on their own connection, never inside this one's transaction
+        query_stats.record(query, elapsed, rows, ok, name, params, explain_plan)
+
+    def explain(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """The execution plan of a statement, one dict per plan row."""
+        prefix = "EXPLAIN QUERY PLAN " if self.dialect == "sqlite" else "EXPLAIN "
+        cursor = self.connection.cursor(buffered=True)
+        try:
+            cursor.execute(prefix + query, params)
+            columns = cursor.column_names
+            return [
+                {column: value if isinstance(value, (int, float, str, type(None))) else str(value)
+                 for column, value in zip(columns, row)}
+                for row in cursor.fetchall()
+            ]
+        finally:
+            cursor.close()
+
     def execute(self, query: str, params: tuple = ()) -> bool:
+        start, ok = time.perf_counter(), False
         try:
             self.cursor.execute(query, params)
+            ok = True
             return True
         except Error as e:
-            print(f"Error executing query: {e}")
             return e
+        finally:
+            self._observe(query, params, start, ok)
         
+    def executemany(self, query: str, seq_params: list) -> bool:
+        start, ok = time.perf_counter(), False
+        try:
+            self.cursor.executemany(query, seq_params)
+            ok = True
+            return True
+        except Error as e:
+            return e
+        finally:
+            self._observe(query, seq_params, start, ok)
+
     def execute_final(self, query: str, params: tuple = ()) -> bool:
+        start, ok = time.perf_counter(), False
         try:
             self.cursor.execute(query, params)
             self.connection.commit()
+            ok = True
+            self._committed()
             return True
         except Error as e:
-            print(f"Error executing query: {e}")
             return e
+        finally:
+            self._observe(query, params, start, ok)
 
-    def fetch(self, query: str, params: tuple = ()) -> Optional[list]:
+    def fetch(self, query: str, params: tuple = (), commit: bool = True) -> Optional[list]:
+        """
+        Runs a query and returns all rows. Pass ``commit=False`` inside a
+        transaction, e.g. for ``SELECT ... FOR UPDATE``, to keep its locks.
+        """
+        start, ok, rows = time.perf_counter(), False, None
         try:
             self.cursor.execute(query, params)
             result = self.cursor.fetchall()
-            self.connection.commit()
-            print("Data fetched successfully")
+            if commit:
+                self.connection.commit()
+                self._committed()
+            ok, rows = True, len(result)
             return result
         except Error as e:
-            print(f"Error fetching data: {e}")
             return e
+        finally:
+            self._observe(query, params, start, ok, rows)
+
+    def iter_fetch(self, query: str, params: tuple = (), size: int = 500) -> Iterator[List[tuple]]:
+        """
+        Streams a result set in chunks of ``size`` rows through an unbuffered
+        cursor, so the rows are pulled from the server as they are consumed
+        instead of being loaded into memory all at once.
+        """
+        cursor = self.connection.cursor(buffered=False)
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            # Drain whatever is left if the consumer stopped early
+            if self.connection.unread_result:
+                self.connection.consume_results()
+            cursor.close()
+            self.connection.commit()
+            self._committed()
 
     def close(self) -> None:
         if self.connection.is_connected():
             self.cursor.close()
             self.connection.close()
-            print("MySQL connection is closed")
+            print("Database connection is closed")
+
+
+class _PlanExplainer:
+    """
+    EXPLAINs statements for the slow-query log on a connection of its own,
+    opened on first use. Only query_stats' background thread calls it.
+    """
+    def __init__(self):
+        self._db: Optional[Database] = None
+
+    def __call__(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        if self._db is None or not self._db.connection.is_connected():
+            self._db = Database(connect_db())
+        try:
+            return self._db.explain(query, params)
+        finally:
+            # Ends the read view EXPLAIN may have opened
+            self._db.connection.rollback()
+
+
+explain_plan = _PlanExplainer()
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of database connections shared by all requests.
+
+    Connections are opened lazily up to ``max_size``, ``min_size`` of them are
+    opened up front by ``open()``, and a borrower waits at most ``timeout``
+    seconds for one to become free. A connection that has been idle for longer
+    than ``ping_interval`` seconds is pinged before it is handed out and
+    replaced if the server has dropped it.
+    """
+    def __init__(self, min_size: Optional[int] = None, max_size: Optional[int] = None,
+                 timeout: Optional[float] = None, ping_interval: Optional[float] = None,
+                 connect=connect_db):
+        self.min_size = min_size if min_size is not None else int(os.getenv("MYSQL_POOL_MIN", "2"))
+        self.max_size = max_size if max_size is not None else int(os.getenv("MYSQL_POOL_MAX", "10"))
+        self.timeout = timeout if timeout is not None else float(os.getenv("MYSQL_POOL_TIMEOUT", "10"))
+        self.ping_interval = ping_interval if ping_interval is not None else float(os.getenv("MYSQL_POOL_PING_INTERVAL", "1"))
+        if self.min_size > self.max_size:
+            raise ValueError("MYSQL_POOL_MIN cannot be larger than MYSQL_POOL_MAX")
+        self._connect = connect
+        # LIFO so the most recently used (warmest) connection is reused first
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        self._size = 0
+        self._opened = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return self._idle.qsize()
+
+    @property
+    def in_use(self) -> int:
+        return self._size - self._idle.qsize()
+
+    def _publish_usage(self) -> None:
+        idle = self._idle.qsize()
+        DB_POOL_CONNECTIONS.labels("in_use").set(self._size - idle)
+        DB_POOL_CONNECTIONS.labels("idle").set(idle)
+
+    def open(self) -> dict:
+        """Opens ``min_size`` connections so the first requests don't pay for the handshake."""
+        with self._lock:
+            self._opened = True
+            missing = max(self.min_size - self._size, 0)
+            self._size += missing
+        for opened in range(missing):
+            try:
+                self._idle.put((self._connect(), time.monotonic()))
+            except Error as e:
+                with self._lock:
+                    self._size -= missing - opened
+                return {"success": False, "message": str(e)}
+        return {"success": True, "message": f"Connection pool opened with {self._size} connections"}
+
+    def close(self) -> None:
+        """Closes every idle connection. Borrowed connections are closed when returned."""
+        with self._lock:
+            self._opened = False
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def _discard(self, connection) -> None:
+        with self._lock:
+            self._size -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _healthy(self, connection, idle_since: float) -> bool:
+        if time.monotonic() - idle_since < self.ping_interval:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Borrows a raw connection, waiting up to ``timeout`` seconds for a free slot."""
+        if not self._opened:
+            self.open()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeoutError(f"No database connection available after {self.timeout}s")
+        try:
+            while True:
+                try:
+                    connection, idle_since = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if self._healthy(connection, idle_since):
+                    self._publish_usage()
+                    return connection
+                self._discard(connection)
+            with self._lock:
+                self._size += 1
+            try:
+                connection = self._connect()
+                self._publish_usage()
+                return connection
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, connection) -> None:
+        """Returns a borrowed connection, rolling back anything left uncommitted."""
+        try:
+            if not self._opened or not connection.is_connected():
+                self._discard(connection)
+                return
+            if connection.in_transaction:
+                connection.rollback()
+            self._idle.put((connection, time.monotonic()))
+        except Exception:
+            self._discard(connection)
+        finally:
+            self._slots.release()
+            self._publish_usage()
+
+    @contextmanager
+    def connection(self) -> Iterator[Database]:
+        """Borrows a connection wrapped in a ``Database`` for the duration of the block."""
+        connection = self.acquire()
+        db = Database(connection)
+        try:
+            yield db
+        finally:
+            try:
+                db.cursor.close()
+            except Exception:
+                pass
+            self.release(connection)
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def get_db() -> Iterator[Database]:
+    """FastAPI dependency handing each request its own pooled connection."""
+    with get_pool().connection() as db:
+        yield db
+
 
 if __name__ == "__main__":
     db = Database()
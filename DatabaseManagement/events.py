@@ -0,0 +1,36 @@
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+# Published after the write has committed
+TRADE_COMMITTED = "trade_committed"  # api_key, name, team, fills, new_balance, version
+BALANCE_CHANGED = "balance_changed"  # api_key; the new balance is not known
+ACCOUNT_DELETED = "account_deleted"  # api_key
+
+
+class Events:
+    """
+    In-process publish/subscribe for committed writes. The trade path
+    publishes; read models such as the leaderboards and P&L ledgers subscribe
+    when their module is imported, so the write side never imports them.
+    """
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[..., None]]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, event: str, handler: Callable[..., None]) -> None:
+        with self._lock:
+            self._handlers[event].append(handler)
+
+    def publish(self, event: str, **payload) -> None:
+        """Calls every handler of ``event``. A failing handler is reported and skipped; the write has already committed."""
+        with self._lock:
+            handlers = list(self._handlers.get(event, ()))
+        for handler in handlers:
+            try:
+                handler(**payload)
+            except Exception as e:
+                print(f"{event} handler {getattr(handler, '__qualname__', handler)} failed: {e}")
+
+
+events = Events()
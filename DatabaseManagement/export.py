@@ -0,0 +1,283 @@
+import argparse
+import json
+import os
+import uuid
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from DatabaseManagement.database import Database
+from utils.loggings import log_creator
+
+STATE_FILE = "_export_state.json"
+# Hive's name for the partition of NULL values
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+# Partitions with an open ParquetWriter at once; each holds a row group buffer and a file handle
+MAX_OPEN_WRITERS = int(os.getenv("EXPORT_MAX_OPEN_WRITERS", "64"))
+# Ids skipped below the watermark are re-read on later runs while they are
+# within this many ids of it, in case their transaction commits late
+ID_OVERLAP = int(os.getenv("EXPORT_ID_OVERLAP", "1000"))
+
+TRADES_QUERY = '''
+SELECT t.id, t.api_key, t.name, t.stock, t.stock_price, t.quantity, t.type,
+       t.before_balance, t.after_balance, t.time, u.team
+FROM trades t
+LEFT JOIN users u ON u.api_key = t.api_key
+WHERE t.id > %s
+ORDER BY t.id
+'''
+TRADES_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("api_key", pa.string()),
+    ("name", pa.string()),
+    ("stock", pa.string()),
+    ("stock_price", pa.float64()),
+    ("quantity", pa.int64()),
+    ("type", pa.string()),
+    ("before_balance", pa.float64()),
+    ("after_balance", pa.float64()),
+    ("time", pa.timestamp("s")),
+])
+
+STOCKS_QUERY = '''
+SELECT s.id, s.api_key, s.name, s.stock, s.quantity, u.team
+FROM stocks s
+LEFT JOIN users u ON u.api_key = s.api_key
+'''
+STOCKS_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("api_key", pa.string()),
+    ("name", pa.string()),
+    ("stock", pa.string()),
+    ("quantity", pa.int64()),
+])
+
+# Tokens are left out on purpose
+USERS_QUERY = 'SELECT api_key, name, balance, team FROM users'
+USERS_SCHEMA = pa.schema([
+    ("api_key", pa.string()),
+    ("name", pa.string()),
+    ("balance", pa.float64()),
+])
+
+
+def _is_run_file(name: str, run_id: str) -> bool:
+    return name == f"part-{run_id}.parquet" or name.startswith(f"part-{run_id}-")
+
+
+class PartitionedWriter:
+    """
+    Writes rows into ``<root>/team=<team>/date=<date>/part-<run>.parquet``,
+    keeping an open ParquetWriter per partition so each chunk becomes a row
+    group and memory stays bounded by the chunk size. At most ``max_open``
+    writers are open at once: the least recently used one is closed, and a
+    partition written to again afterwards gets another part file,
+    ``part-<run>-<n>.parquet``. Files are written under a hidden name and only
+    renamed into place by ``commit``, so readers never see a half-written run.
+    """
+    def __init__(self, root: str, schema: pa.Schema, run_id: str, max_open: int = MAX_OPEN_WRITERS):
+        self.root = root
+        self.schema = schema
+        self.run_id = run_id
+        self.max_open = max_open
+        self.rows = 0
+        self._writers: "OrderedDict[Tuple[str, str], Tuple[pq.ParquetWriter, str, str]]" = OrderedDict()
+        self._closed: List[Tuple[str, str]] = []  # (pending, final) of files finished early
+        self._parts: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def _writer(self, team: Optional[str], day: Optional[date]) -> pq.ParquetWriter:
+        key = (NULL_PARTITION if team is None else quote(team, safe=""),
+               NULL_PARTITION if day is None else day.isoformat())
+        if key in self._writers:
+            self._writers.move_to_end(key)
+            return self._writers[key][0]
+        while len(self._writers) >= self.max_open:
+            _, (writer, pending, final) = self._writers.popitem(last=False)
+            writer.close()
+            self._closed.append((pending, final))
+        directory = os.path.join(self.root, f"team={key[0]}", f"date={key[1]}")
+        os.makedirs(directory, exist_ok=True)
+        part = self._parts[key]
+        self._parts[key] += 1
+        name = f"part-{self.run_id}.parquet" if part == 0 else f"part-{self.run_id}-{part}.parquet"
+        final = os.path.join(directory, name)
+        pending = os.path.join(directory, f".{name}.inprogress")
+        self._writers[key] = (pq.ParquetWriter(pending, self.schema, compression="zstd"), pending, final)
+        return self._writers[key][0]
+
+    def write(self, partitions: Dict[Tuple[Optional[str], Optional[date]], List[tuple]]) -> None:
+        names = self.schema.names
+        for (team, day), rows in partitions.items():
+            columns = list(zip(*rows))
+            table = pa.Table.from_arrays([pa.array(columns[i], type=self.schema.field(name).type)
+                                          for i, name in enumerate(names)], schema=self.schema)
+            self._writer(team, day).write_table(table)
+            self.rows += len(rows)
+
+    def commit(self) -> None:
+        for writer, pending, final in self._writers.values():
+            writer.close()
+            self._closed.append((pending, final))
+        self._writers.clear()
+        for pending, final in self._closed:
+            os.replace(pending, final)
+        self._closed.clear()
+
+    def abort(self) -> None:
+        for writer, pending, final in self._writers.values():
+            writer.close()
+            self._closed.append((pending, final))
+        self._writers.clear()
+        for pending, _ in self._closed:
+            os.remove(pending)
+        self._closed.clear()
+
+
+def _export(db: Any, writer: PartitionedWriter, query: str, params: tuple, partition, chunk_size: int,
+            keep: Optional[Callable[[tuple], bool]] = None) -> Optional[tuple]:
+    """
+    Streams ``query`` into ``writer``; ``partition(row)`` splits a row into
+    (team, date, values). Rows for which ``keep(row)`` is false are skipped.
+    Returns the last row read.
+    """
+    last = None
+    try:
+        for chunk in db.iter_fetch(query, params, size=chunk_size):
+            partitions = defaultdict(list)
+            for row in chunk:
+                if keep is not None and not keep(row):
+                    continue
+                team, day, values = partition(row)
+                partitions[(team, day)].append(values)
+            writer.write(partitions)
+            last = chunk[-1]
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+    return last
+
+
+def _drop_other_runs(root: str, run_id: str, date_dir: Optional[str] = None) -> None:
+    """Removes files left by earlier runs, in every date partition or only in ``date_dir``."""
+    for directory, _, files in os.walk(root):
+        if date_dir is not None and os.path.basename(directory) != date_dir:
+            continue
+        for name in files:
+            if name.startswith("part-") and not _is_run_file(name, run_id):
+                os.remove(os.path.join(directory, name))
+
+
+def load_state(out_dir: str) -> Dict[str, Any]:
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(out_dir: str, state: Dict[str, Any]) -> None:
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def export_trades(db: Any, out_dir: str, since_id: int = 0, chunk_size: int = 50000, run_id: Optional[str] = None,
+                  gaps: Iterable[int] = (), overlap: int = ID_OVERLAP) -> Dict[str, Any]:
+    """
+    Appends every trade with an id above ``since_id``, partitioned by the
+    trader's team and the trade date.
+
+    Auto-increment ids are handed out before commit, so a trade can become
+    visible after a higher id was already exported. Ids missing below the
+    watermark are returned as ``gaps``; passing them back re-reads from the
+    oldest one and exports those that have appeared since. Gaps more than
+    ``overlap`` ids below the watermark are given up on (rolled back trades
+    leave gaps that never fill).
+    """
+    writer = PartitionedWriter(os.path.join(out_dir, "trades"), TRADES_SCHEMA, run_id or uuid.uuid4().hex)
+    open_gaps: Set[int] = set(gaps)
+    previous = since_id
+
+    def keep(row) -> bool:
+        nonlocal previous
+        trade_id = row[0]
+        if trade_id <= since_id:
+            if trade_id in open_gaps:
+                open_gaps.discard(trade_id)
+                return True
+            return False
+        open_gaps.update(range(max(previous + 1, trade_id - overlap), trade_id))
+        previous = trade_id
+        return True
+
+    start = min(open_gaps) - 1 if open_gaps else since_id
+    # The team column is last and only used for the partition path
+    _export(db, writer, TRADES_QUERY, (start,),
+            lambda row: (row[10], row[9].date() if row[9] is not None else None, row[:10]), chunk_size, keep)
+    last_id = max(previous, since_id)
+    return {"rows": writer.rows, "last_id": last_id, "gaps": sorted(gap for gap in open_gaps if gap >= last_id - overlap)}
+
+
+def export_snapshot(db: Any, out_dir: str, table: str, chunk_size: int = 50000, run_id: Optional[str] = None,
+                    snapshot_date: Optional[date] = None) -> Dict[str, Any]:
+    """Writes the current ``stocks`` or ``users`` table under today's date, partitioned by team."""
+    query, schema = {"stocks": (STOCKS_QUERY, STOCKS_SCHEMA), "users": (USERS_QUERY, USERS_SCHEMA)}[table]
+    day = snapshot_date or date.today()
+    writer = PartitionedWriter(os.path.join(out_dir, table), schema, run_id or uuid.uuid4().hex)
+    _export(db, writer, query, (), lambda row: (row[-1], day, row[:-1]), chunk_size)
+    # A rerun on the same day replaces that day's snapshot
+    _drop_other_runs(writer.root, writer.run_id, f"date={day.isoformat()}")
+    return {"rows": writer.rows}
+
+
+def run_export(db: Any, out_dir: str, tables: Iterable[str] = ("trades", "stocks", "users"), full: bool = False,
+               chunk_size: int = 50000) -> Dict[str, Any]:
+    """
+    Exports the requested tables and records the last exported trade id in
+    the state file, so the next run only appends newer trades. ``full``
+    ignores the recorded id and exports every trade again.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    state = load_state(out_dir)
+    run_id = datetime.now().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+    summary = {"run_id": run_id}
+    for table in tables:
+        if table == "trades":
+            since_id = 0 if full else state.get("trades_last_id", 0)
+            gaps = () if full else state.get("trades_gaps", ())
+            summary["trades"] = export_trades(db, out_dir, since_id, chunk_size, run_id, gaps)
+            if full:
+                _drop_other_runs(os.path.join(out_dir, "trades"), run_id)
+            state["trades_last_id"] = summary["trades"]["last_id"]
+            state["trades_gaps"] = summary["trades"]["gaps"]
+            # Saved per table so a failure in a later snapshot does not re-export these trades
+            save_state(out_dir, {**state, "exported_at": datetime.now().isoformat()})
+        else:
+            summary[table] = export_snapshot(db, out_dir, table, chunk_size, run_id)
+    log_creator(api_key="unknown", name="export", log=f"Exported {summary}", error=False)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export trades, holdings and users to partitioned Parquet")
+    parser.add_argument("--out", default="exports", help="output directory")
+    parser.add_argument("--tables", nargs="+", choices=["trades", "stocks", "users"], default=["trades", "stocks", "users"])
+    parser.add_argument("--full", action="store_true", help="export every trade instead of only new ones")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows fetched and written per batch")
+    args = parser.parse_args(argv)
+
+    db = Database()
+    try:
+        print(json.dumps(run_export(db, args.out, args.tables, args.full, args.chunk_size), indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
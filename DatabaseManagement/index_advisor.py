@@ -0,0 +1,111 @@
+import ast
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules whose SQL runs on the request path
+SERVICE_MODULES = [
+    "DatabaseManagement/service.py",
+    "Dashboard/dashboard_service.py",
+    "Dashboard/valuation.py",
+    "Dashboard/leaderboard.py",
+    "Dashboard/pnl.py",
+    "Dashboard/equity_curve.py",
+    "MarketData/price_cache.py",
+    "DatabaseManagement/versions.py",
+]
+
+_STATEMENT = re.compile(r"^\s*(SELECT|UPDATE|DELETE)\b", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _module_queries(path: str) -> Iterator[Tuple[str, str]]:
+    """Yields ``(location, query)`` for each complete SQL string literal in a module."""
+    with open(os.path.join(ROOT, path)) as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str) and _STATEMENT.match(node.value):
+            # Templates are expanded below with their real fragments
+            if "{" in node.value:
+                continue
+            yield f"{path}:{node.lineno}", node.value
+
+
+def _built_queries() -> Iterator[Tuple[str, str, tuple]]:
+    """Queries assembled at runtime, in their most selective and least selective forms."""
+    from Dashboard.dashboard_service import _transaction_query, encode_cursor
+    from Dashboard.overview import FIELDS, overview_query
+    from Dashboard.pnl import ACCOUNT_TRADES_QUERY
+    from Dashboard.valuation import POSITIONS_QUERY
+
+    cursor = encode_cursor(datetime(2000, 1, 1), 1)
+    yield ("Dashboard/dashboard_service.py:_transaction_query(all filters)",
+           *_transaction_query("0", stock="0", transaction_type="buy", start_date="2000-01-01",
+                               end_date="2000-01-01", cursor=cursor))
+    yield "Dashboard/dashboard_service.py:_transaction_query(page)", *_transaction_query("0", cursor=cursor)
+    yield "Dashboard/valuation.py:POSITIONS_QUERY(api_key)", POSITIONS_QUERY.format(filter=" AND s.api_key = %s"), ("0",)
+    yield "Dashboard/valuation.py:POSITIONS_QUERY(team)", POSITIONS_QUERY.format(filter=" AND u.team = %s"), ("0",)
+    yield "Dashboard/pnl.py:ACCOUNT_TRADES_QUERY(one account)", ACCOUNT_TRADES_QUERY.format(keys="%s"), ("0",)
+    query, params = overview_query(FIELDS, 20)
+    yield "Dashboard/overview.py:overview_query(all fields)", query, tuple("0" if p is None else p for p in params)
+
+
+def collect_queries(modules: List[str] = SERVICE_MODULES) -> List[Tuple[str, str, tuple]]:
+    queries = []
+    for path in modules:
+        for location, query in _module_queries(path):
+            # String placeholders keep index lookups sargable on the VARCHAR keys
+            queries.append((location, query, ("0",) * query.count("%s")))
+    queries.extend(_built_queries())
+    return queries
+
+
+def _findings(plan: List[Dict[str, Any]]) -> List[str]:
+    findings = []
+    for step in plan:
+        table = step.get("table")
+        extra = step.get("Extra") or ""
+        if step.get("type") == "ALL":
+            findings.append(f"full table scan on {table} (~{step.get('rows')} rows)")
+        if "Using filesort" in extra:
+            findings.append(f"filesort on {table}")
+        if "Using temporary" in extra:
+            findings.append(f"temporary table for {table}")
+    return findings
+
+
+def advise_indexes(db: Any, modules: List[str] = SERVICE_MODULES) -> List[Dict[str, Any]]:
+    """
+    Runs EXPLAIN on every query in the service modules and reports the plan
+    of each, flagging full scans, filesorts and temporary tables.
+    """
+    report = []
+    for location, query, params in collect_queries(modules):
+        statement = _WHITESPACE.sub(" ", query).strip()
+        result = db.fetch(f"EXPLAIN {statement}", params)
+        if isinstance(result, Exception):
+            report.append({"location": location, "query": statement, "error": str(result), "findings": [], "plan": []})
+            continue
+        columns = db.cursor.column_names
+        plan = [dict(zip(columns, row)) for row in result]
+        report.append({"location": location, "query": statement, "findings": _findings(plan), "plan": plan})
+    return report
+
+
+def format_report(report: List[Dict[str, Any]]) -> str:
+    lines = []
+    flagged = 0
+    for entry in report:
+        if entry.get("error"):
+            status = f"ERROR {entry['error']}"
+        elif entry["findings"]:
+            status = "; ".join(entry["findings"])
+            flagged += 1
+        else:
+            status = "ok"
+        lines.append(f"{entry['location']}\n    {entry['query'][:160]}\n    -> {status}")
+    lines.append(f"\n{flagged} of {len(report)} queries need attention")
+    return "\n".join(lines)
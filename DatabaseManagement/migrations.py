@@ -0,0 +1,160 @@
+import argparse
+import json
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from DatabaseManagement.admin import create_stocks_table, create_trades_table, create_users_table
+from DatabaseManagement.database import Database
+from utils.loggings import log_creator
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Any], None]
+
+
+def _check(result):
+    if isinstance(result, Exception):
+        raise result
+    if isinstance(result, dict) and result.get("success") is not True:
+        raise RuntimeError(result.get("message", "Migration step failed"))
+    return result
+
+
+def _create_tables(db: Any) -> None:
+    _check(create_users_table(db))
+    _check(create_trades_table(db))
+    _check(create_stocks_table(db))
+
+
+def _unique_holdings(db: Any) -> None:
+    if db.dialect == "sqlite":
+        # SQLite databases are always created with the unique key in place
+        _check(db.create_index("stocks", "api_key_stock_unique", ["api_key", "stock"], unique=True))
+        return
+    # Fold duplicate (api_key, stock) rows into the oldest one before the unique key can be added
+    _check(db.execute('''
+    UPDATE stocks s
+    JOIN (
+        SELECT api_key, stock, MIN(id) AS keep_id, SUM(quantity) AS total
+        FROM stocks GROUP BY api_key, stock HAVING COUNT(*) > 1
+    ) d ON s.id = d.keep_id
+    SET s.quantity = d.total
+    '''))
+    _check(db.execute('''
+    DELETE s FROM stocks s
+    JOIN (
+        SELECT api_key, stock, MIN(id) AS keep_id
+        FROM stocks GROUP BY api_key, stock HAVING COUNT(*) > 1
+    ) d ON s.api_key = d.api_key AND s.stock = d.stock AND s.id <> d.keep_id
+    '''))
+    db.commit_transaction()
+    _check(db.create_index("stocks", "api_key_stock_unique", ["api_key", "stock"], unique=True))
+
+
+def _query_indexes(db: Any) -> None:
+    # Trade history pages: WHERE api_key = ? ORDER BY time DESC, id DESC
+    _check(db.create_index("trades", "api_key_time_id", ["api_key", "time", "id"]))
+    # Average buy price per holding: WHERE api_key = ? AND type = 'buy' GROUP BY api_key, stock
+    _check(db.create_index("trades", "api_key_type_stock", ["api_key", "type", "stock"]))
+    # Last traded price per symbol: GROUP BY stock with MAX(id)
+    _check(db.create_index("trades", "stock_id", ["stock", "id"]))
+    # Leaderboard loads: WHERE team = ?, read in balance order
+    _check(db.create_index("users", "team_balance", ["team", "balance"]))
+
+
+def _account_versions(db: Any) -> None:
+    # Bumped with every write to an account; the dashboard's ETags are built from it
+    if not db.column_exists("users", "version"):
+        _check(db.execute_final('ALTER TABLE users ADD COLUMN version BIGINT NOT NULL DEFAULT 0'))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Create users, trades and stocks tables", _create_tables),
+    Migration(2, "Unique holding per (api_key, stock)", _unique_holdings),
+    Migration(3, "Composite indexes for trade history, valuation and leaderboards", _query_indexes),
+    Migration(4, "Per-account version counter for ETags", _account_versions),
+]
+
+LOCK_NAME = "paper_trading_migrations"
+
+
+def _ensure_version_table(db: Any) -> None:
+    _check(db.execute_final('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description VARCHAR(255),
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    '''))
+
+
+def applied_versions(db: Any) -> List[int]:
+    _ensure_version_table(db)
+    return [row[0] for row in _check(db.fetch('SELECT version FROM schema_version ORDER BY version'))]
+
+
+def migrate(db: Any, target: Optional[int] = None) -> List[int]:
+    """
+    Applies every migration newer than the recorded schema version, in order,
+    up to ``target``. Each applied version is recorded in schema_version, so
+    running it again is a no-op. An advisory lock keeps workers that start
+    together from migrating concurrently. Returns the versions applied.
+    """
+    # SQLite serializes schema changes on its own database lock
+    use_lock = db.dialect == "mysql"
+    if use_lock:
+        locked = _check(db.fetch('SELECT GET_LOCK(%s, 60)', (LOCK_NAME,)))
+        if not locked or locked[0][0] != 1:
+            raise RuntimeError("Could not acquire the migration lock")
+    try:
+        done = set(applied_versions(db))
+        applied = []
+        for migration in MIGRATIONS:
+            if migration.version in done or (target is not None and migration.version > target):
+                continue
+            migration.apply(db)
+            _check(db.execute_final('INSERT INTO schema_version (version, description) VALUES (%s, %s)',
+                                    (migration.version, migration.description)))
+            log_creator(api_key="unknown", name="migrations", log=f"Applied migration {migration.version}: {migration.description}", error=False)
+            applied.append(migration.version)
+        return applied
+    finally:
+        if use_lock:
+            db.fetch('SELECT RELEASE_LOCK(%s)', (LOCK_NAME,))
+
+
+def status(db: Any) -> List[dict]:
+    done = set(applied_versions(db))
+    return [{"version": m.version, "description": m.description, "applied": m.version in done} for m in MIGRATIONS]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Schema migrations for the paper trading database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    up = sub.add_parser("migrate", help="apply pending migrations")
+    up.add_argument("--target", type=int, default=None, help="stop after this version")
+    sub.add_parser("status", help="list migrations and whether they are applied")
+    advise = sub.add_parser("advise", help="EXPLAIN the service queries and flag scans and filesorts")
+    advise.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    db = Database()
+    try:
+        if args.command == "migrate":
+            print("Applied:", migrate(db, args.target) or "nothing, schema is up to date")
+        elif args.command == "status":
+            for row in status(db):
+                print(f"{row['version']:>4}  {'applied' if row['applied'] else 'pending':8} {row['description']}")
+        elif db.dialect != "mysql":
+            print("The index advisor reads MySQL EXPLAIN plans and only runs against MySQL")
+        else:
+            from DatabaseManagement.index_advisor import advise_indexes, format_report
+            report = advise_indexes(db)
+            print(json.dumps(report, indent=2, default=str) if args.json else format_report(report))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query: str) -> str:
+    """
+    Normalizes a statement so every execution of the same query shape shares
+    one key: literals and placeholders become ``?``, IN lists collapse to
+    ``IN (...)`` and whitespace is squeezed.
+    """
+    normalized = _PLACEHOLDER.sub("?", _NUMBER.sub("?", _STRING.sub("?", query)))
+    return _WHITESPACE.sub(" ", _IN_LIST.sub("IN (...)", normalized)).strip()
+
+
+def _shape(value: Any) -> str:
+    if isinstance(value, str):
+        return f"str({len(value)})"
+    return type(value).__name__
+
+
+def params_shape(params: Any) -> Any:
+    """Types (and string lengths) of the parameters, without their values."""
+    if isinstance(params, list):
+        return {"rows": len(params), "first": params_shape(params[0]) if params else None}
+    return [_shape(value) for value in params or ()]
+
+
+class QueryStats:
+    """
+    Rolling per-fingerprint statement statistics and a bounded log of slow
+    statements. Statements slower than ``slow_ms`` are logged with their
+    parameter shape and, at most once per ``explain_interval`` seconds per
+    fingerprint, their EXPLAIN plan.
+
+    Plans are produced by a background thread, so the statement's caller
+    never waits for one. The log entry shows ``"plan": "pending"`` until it
+    is filled in. If more than ``explain_queue`` plans are waiting, new ones
+    are skipped.
+    """
+    def __init__(self, slow_ms: float = 200.0, log_size: int = 100, max_fingerprints: int = 1000,
+                 explain_interval: float = 60.0, explain_queue: int = 16):
+        self.slow_ms = slow_ms
+        self.max_fingerprints = max_fingerprints
+        self.explain_interval = explain_interval
+        self._stats: Dict[str, list] = {}  # fingerprint -> [count, total, max, rows, errors, caller]
+        self._slow = deque(maxlen=log_size)
+        self._explained: Dict[str, float] = {}
+        self._explain_jobs = queue.Queue(maxsize=explain_queue)
+        self._explainer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def record(self, query: str, seconds: float, rows: Optional[int], ok: bool, caller: str,
+               params: Any = (), explain: Optional[Callable[[str, Any], List[Dict[str, Any]]]] = None) -> None:
+        key = fingerprint(query)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    key = "<other>"
+                entry = self._stats.setdefault(key, [0, 0.0, 0.0, 0, 0, caller])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] += rows or 0
+            entry[4] += not ok
+        if seconds * 1000 >= self.slow_ms:
+            self._log_slow(key, query, seconds, rows, ok, caller, params, explain)
+
+    def _log_slow(self, key, query, seconds, rows, ok, caller, params, explain) -> None:
+        due = False
+        now = time.monotonic()
+        if explain is not None and ok and _EXPLAINABLE.match(query) and not isinstance(params, list):
+            with self._lock:
+                due = now - self._explained.get(key, float("-inf")) >= self.explain_interval
+                if due:
+                    self._explained[key] = now
+        entry = {
+            "fingerprint": key,
+            "caller": caller,
+            "ms": round(seconds * 1000, 3),
+            "rows": rows,
+            "ok": ok,
+            "params": params_shape(params),
+            "plan": None,
+            "at": datetime.now().isoformat(timespec="seconds")
+        }
+        if due:
+            self._start_explainer()
+            try:
+                self._explain_jobs.put_nowait((entry, explain, query, params))
+                entry["plan"] = "pending"
+            except queue.Full:
+                pass
+        self._slow.append(entry)
+
+    def _start_explainer(self) -> None:
+        if self._explainer is not None:
+            return
+        with self._lock:
+            if self._explainer is None:
+                self._explainer = threading.Thread(target=self._explain_worker, name="query-explain", daemon=True)
+                self._explainer.start()
+
+    def _explain_worker(self) -> None:
+        while True:
+            entry, explain, query, params = self._explain_jobs.get()
+            try:
+                entry["plan"] = explain(query, params)
+            except Exception as e:
+                entry["plan"] = [{"error": str(e)}]
+
+    def summary(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """The fingerprints with the most total time first."""
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {
+                "fingerprint": key,
+                "caller": caller,
+                "count": count,
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total / count * 1000, 3),
+                "max_ms": round(longest * 1000, 3),
+                "rows": rows,
+                "errors": errors
+            }
+            for key, (count, total, longest, rows, errors, caller) in items
+        ]
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """Logged slow statements, newest first."""
+        return list(reversed(self._slow))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self._explained.clear()
+
+
+query_stats = QueryStats(
+    slow_ms=float(os.getenv("SLOW_QUERY_MS", "200")),
+    log_size=int(os.getenv("SLOW_QUERY_LOG_SIZE", "100")),
+    max_fingerprints=int(os.getenv("QUERY_STATS_MAX", "1000")),
+    explain_interval=float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "60")),
+    explain_queue=int(os.getenv("SLOW_QUERY_EXPLAIN_QUEUE", "16"))
+)
@@ -1,9 +1,19 @@
+import os
+import random
+import time
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, Union
 
+from mysql.connector import Error
+
+from DatabaseManagement.cache import user_cache
+from DatabaseManagement.events import ACCOUNT_DELETED, BALANCE_CHANGED, TRADE_COMMITTED, events
+from DatabaseManagement.versions import bump_version
+from MarketData.price_cache import price_cache
 from DatabaseManagement.database import Database
 from utils.IST_Time import get_current_time_IST
 from utils.loggings import log_creator
+from utils.metrics import TRADES_IN_FLIGHT
 from utils.util import create_api_key, create_token
 
 def create_user(db: Any, name: str, team: str, balance: float, api_key: str, token: str, token_expiry: datetime) -> Dict[str, Union[bool, str]]:
@@ -24,6 +34,7 @@ def delete_user(db: Any, api_key: str) ->   Dict[str, Union[bool, str]]:
     DELETE FROM users WHERE api_key = %s
     '''
     success = db.execute(query, (api_key,))
+    db.after_commit(lambda: _forget_account(api_key))
     if success is True:
         log_creator(api_key=api_key, name='Unknown', log='User deleted', error=False)
         return {"success": True, "message": "User deleted"}
@@ -32,14 +43,28 @@ def delete_user(db: Any, api_key: str) ->   Dict[str, Union[bool, str]]:
         return {"success": False, "message": "Failed to delete user"}
 
 
+def _forget_account(api_key: str) -> None:
+    user_cache.invalidate(api_key)
+    events.publish(ACCOUNT_DELETED, api_key=api_key)
+
+
+def _balance_changed(api_key: str) -> None:
+    user_cache.invalidate(api_key)
+    events.publish(BALANCE_CHANGED, api_key=api_key)
+
+
 def get_user(db: Any, api_key: str) -> Optional[Dict[str, Union[str, float]]]:
+    cached = user_cache.get(api_key)
+    if cached is not None:
+        return dict(cached)
+    fill = user_cache.begin_fill(api_key)
     query = '''
     SELECT * FROM users WHERE api_key = %s
     '''
     result = db.fetch(query, (api_key,))
     if result not in [[]]:
         log_creator(api_key=api_key, name='Unknown', log='User data fetched', error=False)
-        return {
+        user = {
             "api_key": result[0][0],
             "name": result[0][1],
             "team" : result[0][2],
@@ -47,6 +72,8 @@ def get_user(db: Any, api_key: str) -> Optional[Dict[str, Union[str, float]]]:
             "token": result[0][4],
             "token_expiry": result[0][5]
         }
+        user_cache.set(api_key, user, fill)
+        return dict(user)
     else:
         log_creator(api_key="unknown", name='Unknown', log='Failed to fetch user data', error=True)
         return None
@@ -54,9 +81,10 @@ def get_user(db: Any, api_key: str) -> Optional[Dict[str, Union[str, float]]]:
 
 def update_user_token(db: Any, api_key: str, token: str, token_expiry: datetime) -> Dict[str, Union[bool, str]]:
     query = '''
-    UPDATE users SET token = %s, token_expiry = %s WHERE api_key = %s 
+    UPDATE users SET token = %s, token_expiry = %s, version = version + 1 WHERE api_key = %s 
     '''
     success = db.execute(query, (token, token_expiry, api_key))
+    db.after_commit(lambda: user_cache.invalidate(api_key))
     if success is True:
         log_creator(api_key=api_key, name='Unknown', log='User token updated', error=False)
         return {"success": True, "message": "User token updated"}
@@ -67,9 +95,10 @@ def update_user_token(db: Any, api_key: str, token: str, token_expiry: datetime)
 
 def update_balance(db: Any, api_key: str, new_balance: float) -> Dict[str, Union[bool, str]]:
     query = '''
-    UPDATE users SET balance = %s WHERE api_key = %s
+    UPDATE users SET balance = %s, version = version + 1 WHERE api_key = %s
     '''
     success = db.execute(query, (new_balance, api_key))
+    db.after_commit(lambda: _balance_changed(api_key))
     if success is True:
         log_creator(api_key=api_key, name='Unknown', log='Balance updated', error=False)
         return {"success": True, "message": "Balance updated"}
@@ -84,6 +113,8 @@ def create_trade(db: Any, api_key: str, name: str, stock: str, stock_price: floa
     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
     '''
     success = db.execute(query, (api_key, name, stock, stock_price, quantity, type, before_balance, after_balance, time))
+    if success is True:
+        success = bump_version(db, api_key)
     if success is True:
         log_creator(api_key=api_key, name=name, log='Trade created', error=False)
         return {"success": True, "message": "Trade created"}
@@ -98,6 +129,8 @@ def create_stock(db: Any, api_key: str, name: str, stock: str, quantity: int) ->
     VALUES (%s, %s, %s, %s)
     '''
     success = db.execute(query, (api_key, name, stock, quantity))
+    if success is True:
+        success = bump_version(db, api_key)
     if success is True:
         log_creator(api_key=api_key, name=name, log='Stock portfolio created', error=False)
         return {"success": True, "message": "Stock portfolio created"}
@@ -128,6 +161,8 @@ def update_stock(db: Any, api_key: str, stock: str, quantity: int) -> Dict[str,
     UPDATE stocks SET quantity = %s WHERE api_key = %s AND stock = %s
     '''
     success = db.execute(query, (quantity, api_key, stock))
+    if success is True:
+        success = bump_version(db, api_key)
     if success is True:
         log_creator(api_key=api_key, name='Unknown', log='Stock updated', error=False)
         return {"success": True, "message": "Stock updated"}
@@ -140,13 +175,240 @@ def delete_stock(db: Any, api_key: str, stock: str) -> Dict[str, Union[bool, str
     DELETE FROM stocks WHERE api_key = %s AND stock = %s
     '''
     success = db.execute(query, (api_key, stock))
+    if success is True:
+        success = bump_version(db, api_key)
     if success is True:
         log_creator(api_key=api_key, name='Unknown', log='Stock deleted', error=False)
         return {"success": True, "message": "Stock deleted"}
     else:
         log_creator(api_key=api_key, name='Unknown', log='Failed to delete stock', error=True)
         return {"success": False, "message": "Failed to delete stock"}
-    
+
+
+T = TypeVar("T")
+
+# Brokerage on each side, as a fraction of the traded value, and the flat depository charge per sell
+BUY_CHARGES = 0.0011842
+SELL_CHARGES = 0.0011842
+DP_CHARGE = 15
+
+# Lock wait timeout and deadlock: the transaction was rolled back and is safe to retry
+RETRYABLE_ERRORS = (1205, 1213)
+TRADE_MAX_ATTEMPTS = int(os.getenv("TRADE_MAX_ATTEMPTS", "3"))
+
+
+def _check(result):
+    """Turns the error object returned by Database.execute/fetch back into an exception."""
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def _trade_result(success: bool, message: str, error: Optional[str], name: str, stock: str, quantity: int, balance: float) -> Dict[str, Any]:
+    return {
+        "success": success,
+        "message": message,
+        "error": error,
+        "name": name,
+        "stock": stock,
+        "qt": quantity,
+        "balance": balance
+    }
+
+
+def _on_trade_committed(api_key: str, name: str, team: str, fills: List[Tuple[str, str, int, float, float, float]], new_balance: float, version: int) -> None:
+    """
+    Pushes committed trades into the user cache and price cache, and
+    publishes them to the read models subscribed to TRADE_COMMITTED. Fills are
+    (stock, action, quantity, stock_price, before_balance, after_balance);
+    ``version`` is the account's users.version after the commit.
+    """
+    user_cache.update(api_key, balance=new_balance)
+    events.publish(TRADE_COMMITTED, api_key=api_key, name=name, team=team, fills=fills, new_balance=new_balance, version=version)
+    for stock, _, _, stock_price, _, _ in fills:
+        price_cache.update(stock, stock_price)
+
+
+def _price_order(action: str, stock_price: float, quantity: int, charges: float, flat_charge: float, balance: float, held: int):
+    """
+    Applies one order to a balance and holding. Returns
+    ``(new_balance, new_quantity, None)``, or ``(balance, held, (message, error))``
+    when the account cannot afford it.
+    """
+    if action == "buy":
+        new_balance = balance - quantity * stock_price * (1 + charges)
+        if new_balance < 0:
+            return balance, held, ("Insufficient balance", "Not enough funds")
+        return new_balance, held + quantity, None
+    if held < quantity:
+        return balance, held, ("Insufficient stock", "Not enough shares")
+    return balance + quantity * stock_price * (1 - charges) - flat_charge, held - quantity, None
+
+
+def _with_trade_retry(db: Any, api_key: str, attempt: Callable[[], T]) -> T:
+    """
+    Runs one trade transaction, retrying deadlocks and lock wait timeouts up
+    to TRADE_MAX_ATTEMPTS times. Other database errors are raised after the
+    transaction is rolled back.
+    """
+    for attempt_number in range(1, TRADE_MAX_ATTEMPTS + 1):
+        try:
+            return attempt()
+        except Error as e:
+            db.rollback_transaction()
+            if e.errno in RETRYABLE_ERRORS and attempt_number < TRADE_MAX_ATTEMPTS:
+                time.sleep(random.uniform(0, 0.05 * attempt_number))
+                continue
+            log_creator(api_key=api_key, name='Unknown', log=f'Failed to execute trade: {e}', error=True)
+            raise
+
+
+def _execute_trade_once(db: Any, api_key: str, stock: str, stock_price: float, quantity: int, action: str, charges: float, flat_charge: float, trade_time: datetime) -> Optional[Dict[str, Any]]:
+    # One locking read takes the account row and the holding row, so concurrent
+    # orders for the same account queue here instead of overwriting each other
+    rows = _check(db.fetch('''
+    SELECT u.name, u.team, u.balance, u.version, s.quantity FROM users u
+    LEFT JOIN stocks s ON s.api_key = u.api_key AND s.stock = %s
+    WHERE u.api_key = %s FOR UPDATE
+    ''', (stock, api_key), commit=False))
+    if not rows:
+        db.rollback_transaction()
+        return None
+    name, team, balance, version, held = rows[0]
+
+    new_balance, new_quantity, rejection = _price_order(action, stock_price, quantity, charges, flat_charge, balance, held or 0)
+    if rejection is not None:
+        db.rollback_transaction()
+        return _trade_result(False, *rejection, name, stock, quantity, balance)
+
+    _check(db.execute('''
+    INSERT INTO trades (api_key, name, stock, stock_price, quantity, type, before_balance, after_balance, time) 
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ''', (api_key, name, stock, stock_price, quantity, action, balance, new_balance, trade_time)))
+    if new_quantity == 0:
+        _check(db.execute('''
+        DELETE FROM stocks WHERE api_key = %s AND stock = %s
+        ''', (api_key, stock)))
+    else:
+        _check(db.execute('''
+        INSERT INTO stocks (api_key, name, stock, quantity) VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE quantity = VALUES(quantity)
+        ''', (api_key, name, stock, new_quantity)))
+    _check(db.execute('''
+    UPDATE users SET balance = %s, version = version + 1 WHERE api_key = %s
+    ''', (new_balance, api_key)))
+    db.commit_transaction()
+    _on_trade_committed(api_key, name, team, [(stock, action, quantity, stock_price, balance, new_balance)], new_balance, version + 1)
+
+    verb = "Bought" if action == "buy" else "Sold"
+    return _trade_result(True, f"{verb} {quantity} shares of {stock} successfully", None, name, stock, quantity, new_balance)
+
+
+def execute_trade(db: Any, api_key: str, stock: str, stock_price: float, quantity: int, action: str, charges: float, flat_charge: float = 0.0) -> Optional[Dict[str, Any]]:
+    """
+    Executes a market order atomically: locks the account (and holding) row,
+    checks funds or shares against the locked values, records the trade,
+    upserts the holding on its (api_key, stock) key and updates the balance in
+    one transaction. Deadlocks and lock wait timeouts are retried up to
+    TRADE_MAX_ATTEMPTS times.
+
+    Returns None if the api_key does not exist, otherwise a trade response.
+    Database errors are raised after the transaction is rolled back.
+    """
+    with TRADES_IN_FLIGHT.track_inprogress():
+        result = _with_trade_retry(db, api_key, lambda: _execute_trade_once(
+            db, api_key, stock, stock_price, quantity, action, charges, flat_charge, get_current_time_IST()
+        ))
+    if result is not None:
+        log_creator(api_key=api_key, name=result["name"], log=result["message"], error=not result["success"])
+    return result
+
+
+def _execute_trades_batch_once(db: Any, api_key: str, orders: List[Dict[str, Any]], trade_time: datetime) -> Optional[List[Dict[str, Any]]]:
+    account = _check(db.fetch('''
+    SELECT name, team, balance, version FROM users WHERE api_key = %s FOR UPDATE
+    ''', (api_key,), commit=False))
+    if not account:
+        db.rollback_transaction()
+        return None
+    name, team, balance, version = account[0]
+
+    stocks = sorted({order["stock"] for order in orders})
+    placeholders = ", ".join(["%s"] * len(stocks))
+    holdings = dict(_check(db.fetch(f'''
+    SELECT stock, quantity FROM stocks WHERE api_key = %s AND stock IN ({placeholders}) FOR UPDATE
+    ''', (api_key, *stocks), commit=False)))
+    original = dict(holdings)
+
+    results, trades, fills = [], [], []
+    for order in orders:
+        stock, quantity = order["stock"], order["quantity"]
+        rejection = order.get("rejection")
+        if rejection is None:
+            new_balance, new_quantity, rejection = _price_order(
+                order["action"], order["stock_price"], quantity, order["charges"], order.get("flat_charge", 0.0),
+                balance, holdings.get(stock, 0)
+            )
+        if rejection is not None:
+            results.append(_trade_result(False, *rejection, name, stock, quantity, balance))
+            continue
+        trades.append((api_key, name, stock, order["stock_price"], quantity, order["action"], balance, new_balance, trade_time))
+        fills.append((stock, order["action"], quantity, order["stock_price"], balance, new_balance))
+        verb = "Bought" if order["action"] == "buy" else "Sold"
+        results.append(_trade_result(True, f"{verb} {quantity} shares of {stock} successfully", None, name, stock, quantity, new_balance))
+        balance = new_balance
+        holdings[stock] = new_quantity
+
+    if not trades:
+        db.rollback_transaction()
+        return results
+
+    changed = [stock for stock in stocks if holdings.get(stock, 0) != original.get(stock, 0)]
+    upserts = [(api_key, name, stock, holdings[stock]) for stock in changed if holdings[stock] != 0]
+    emptied = [stock for stock in changed if holdings[stock] == 0]
+
+    _check(db.executemany('''
+    INSERT INTO trades (api_key, name, stock, stock_price, quantity, type, before_balance, after_balance, time) 
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ''', trades))
+    if upserts:
+        _check(db.executemany('''
+        INSERT INTO stocks (api_key, name, stock, quantity) VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE quantity = VALUES(quantity)
+        ''', upserts))
+    if emptied:
+        placeholders = ", ".join(["%s"] * len(emptied))
+        _check(db.execute(f'''
+        DELETE FROM stocks WHERE api_key = %s AND stock IN ({placeholders})
+        ''', (api_key, *emptied)))
+    _check(db.execute('''
+    UPDATE users SET balance = %s, version = version + 1 WHERE api_key = %s
+    ''', (balance, api_key)))
+    db.commit_transaction()
+    _on_trade_committed(api_key, name, team, fills, balance, version + 1)
+    return results
+
+
+def execute_trades_batch(db: Any, api_key: str, orders: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Executes a list of market orders for one account in a single transaction.
+
+    Each order is a dict with action, stock, stock_price, quantity, charges and
+    optionally flat_charge, or a ``rejection`` (message, error) pair for orders
+    the caller already refused. Orders are checked in sequence against the
+    locked balance and holdings, so an early sell can fund a later buy. All
+    accepted orders are written with executemany and one commit. Returns one
+    trade response per order, in order, or None if the api_key does not exist.
+    """
+    if not orders:
+        return []
+    with TRADES_IN_FLIGHT.track_inprogress():
+        results = _with_trade_retry(db, api_key, lambda: _execute_trades_batch_once(db, api_key, orders, get_current_time_IST()))
+    if results is not None:
+        accepted = sum(result["success"] for result in results)
+        log_creator(api_key=api_key, name=results[0]["name"], log=f'Batch executed: {accepted} of {len(results)} orders filled', error=False)
+    return results
+
 if __name__ == "__main__":
     db = Database()
     
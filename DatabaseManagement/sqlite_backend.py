@@ -0,0 +1,179 @@
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from functools import lru_cache
+
+from mysql.connector import errors
+
+# MySQL error numbers the service layer already knows how to handle
+LOCK_WAIT_TIMEOUT = 1205
+DUPLICATE_ENTRY = 1062
+FOREIGN_KEY_FAILURE = 1452
+
+_WRITE = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\s*$", re.IGNORECASE)
+_ON_DUPLICATE = re.compile(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", re.IGNORECASE)
+_VALUES_FN = re.compile(r"VALUES\((\w+)\)", re.IGNORECASE)
+_AUTO_INCREMENT = re.compile(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.IGNORECASE)
+_ENUM = re.compile(r"\bENUM\s*\([^)]*\)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def translate(query: str):
+    """
+    Rewrites a MySQL statement for SQLite. Returns ``(query, locking)``, where
+    ``locking`` says it was a ``SELECT ... FOR UPDATE``; SQLite has no row
+    locks, so those start a write transaction instead.
+    """
+    locking = bool(_FOR_UPDATE.search(query))
+    if locking:
+        query = _FOR_UPDATE.sub("", query)
+    if _ON_DUPLICATE.search(query):
+        # The conflict target may be left out since SQLite 3.35
+        query = _VALUES_FN.sub(r"excluded.\1", _ON_DUPLICATE.sub("ON CONFLICT DO UPDATE SET", query))
+    if query.lstrip().upper().startswith("CREATE TABLE"):
+        query = _ENUM.sub("TEXT", _AUTO_INCREMENT.sub("INTEGER PRIMARY KEY AUTOINCREMENT", query))
+    return query.replace("%s", "?"), locking
+
+
+def _as_mysql_error(e: sqlite3.Error) -> errors.Error:
+    """Maps SQLite errors onto the connector's exception types, so callers handle both backends alike."""
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        errno = DUPLICATE_ENTRY if "UNIQUE" in message else FOREIGN_KEY_FAILURE
+        return errors.IntegrityError(msg=message, errno=errno)
+    if isinstance(e, sqlite3.OperationalError) and ("locked" in message or "busy" in message):
+        return errors.DatabaseError(msg=message, errno=LOCK_WAIT_TIMEOUT)
+    if isinstance(e, sqlite3.OperationalError):
+        return errors.ProgrammingError(msg=message)
+    return errors.DatabaseError(msg=message)
+
+
+class SQLiteCursor:
+    """The subset of the MySQL cursor interface used by ``Database``."""
+    def __init__(self, connection: "SQLiteConnection"):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+
+    def _prepare(self, query: str) -> str:
+        query, locking = translate(query)
+        if (locking or _WRITE.match(query)) and not self._connection.in_transaction:
+            # MySQL opens a transaction implicitly; IMMEDIATE takes the write lock up front
+            self._connection.start_transaction()
+        return query
+
+    def execute(self, query: str, params=()) -> None:
+        try:
+            self._cursor.execute(self._prepare(query), params)
+        except sqlite3.Error as e:
+            raise _as_mysql_error(e) from e
+
+    def executemany(self, query: str, seq_params) -> None:
+        try:
+            self._cursor.executemany(self._prepare(query), seq_params)
+        except sqlite3.Error as e:
+            raise _as_mysql_error(e) from e
+
+    def fetchall(self) -> list:
+        try:
+            return self._cursor.fetchall()
+        except sqlite3.Error as e:
+            raise _as_mysql_error(e) from e
+
+    def fetchmany(self, size: int) -> list:
+        try:
+            return self._cursor.fetchmany(size)
+        except sqlite3.Error as e:
+            raise _as_mysql_error(e) from e
+
+    @property
+    def column_names(self) -> tuple:
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    def close(self) -> None:
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    A SQLite connection behind the subset of the MySQL connection interface
+    that ``Database`` and ``ConnectionPool`` use. Statements run in autocommit
+    mode until a write or locking read starts a transaction, matching how the
+    service layer drives MySQL.
+    """
+    def __init__(self, path: str):
+        # The pool lends a connection to one request at a time, but that
+        # request can move between the threadpool and the DB executor
+        self.raw = sqlite3.connect(path, timeout=float(os.getenv("SQLITE_BUSY_TIMEOUT", "5")), isolation_level=None,
+                                   check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self.raw.execute("PRAGMA journal_mode=WAL")
+        self.raw.execute("PRAGMA synchronous=NORMAL")
+        self.raw.execute("PRAGMA foreign_keys=ON")
+        self._open = True
+
+    def cursor(self, buffered: bool = True) -> SQLiteCursor:
+        return SQLiteCursor(self)
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.raw.in_transaction
+
+    @property
+    def unread_result(self) -> bool:
+        return False
+
+    def consume_results(self) -> None:
+        pass
+
+    def start_transaction(self) -> None:
+        try:
+            self.raw.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            raise _as_mysql_error(e) from e
+
+    def commit(self) -> None:
+        if self.raw.in_transaction:
+            self.raw.execute("COMMIT")
+
+    def rollback(self) -> None:
+        if self.raw.in_transaction:
+            self.raw.execute("ROLLBACK")
+
+    def is_connected(self) -> bool:
+        return self._open
+
+    def ping(self, reconnect: bool = False) -> None:
+        if not self._open:
+            raise errors.InterfaceError(msg="SQLite connection is closed")
+
+    def close(self) -> None:
+        if self._open:
+            self.raw.close()
+            self._open = False
+
+
+def _adapt_datetime(value: datetime) -> str:
+    # Stored like MySQL's DATETIME: second precision, no time zone
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _convert_datetime(value: bytes) -> datetime:
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_converter("DATETIME", _convert_datetime)
+
+
+def connect_sqlite() -> SQLiteConnection:
+    return SQLiteConnection(os.getenv("SQLITE_PATH", "paper_trading.db"))
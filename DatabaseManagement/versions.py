@@ -0,0 +1,52 @@
+import hashlib
+from typing import Any, Optional
+
+# users.version is bumped in the same transaction as every write that changes
+# what an account's read routes return, so it is shared by all workers and
+# only ever moves once the change is visible
+BUMP_VERSION = 'UPDATE users SET version = version + 1 WHERE api_key = %s'
+
+
+def bump_version(db: Any, api_key: str):
+    """Bumps the account's version inside the caller's transaction."""
+    return db.execute(BUMP_VERSION, (api_key,))
+
+
+def account_version(db: Any, api_key: str) -> Optional[int]:
+    """The account's committed version, read by primary key, or None for an unknown key."""
+    result = db.fetch('SELECT version FROM users WHERE api_key = %s', (api_key,))
+    if isinstance(result, Exception):
+        raise result
+    return result[0][0] if result else None
+
+
+def team_version(db: Any, team: str) -> Optional[str]:
+    """
+    The team's committed state as ``"<members>.<sum of member versions>"``,
+    which moves whenever a member's version does or a member joins or
+    leaves. None for a team without members.
+    """
+    result = db.fetch('SELECT COUNT(*), COALESCE(SUM(version), 0) FROM users WHERE team = %s', (team,))
+    if isinstance(result, Exception):
+        raise result
+    members, total = result[0]
+    return f"{members}.{total}" if members else None
+
+
+def etag(version: Any, *scope: str) -> str:
+    """
+    A strong ETag for one representation at ``version``. ``scope`` names it,
+    e.g. the account, path and query string; it is hashed so api keys never
+    appear in headers.
+    """
+    digest = hashlib.blake2b("\0".join(scope).encode(), digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison, which ignores the weak ``W/`` prefix."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class Quote(NamedTuple):
+    symbol: str
+    last: float
+    bid: Optional[float]
+    ask: Optional[float]
+    timestamp: float  # when the tick happened, per its source
+    received_at: float  # when this process saw it
+
+
+class TickRing:
+    """Fixed-size ring buffer of the most recent (timestamp, price) ticks of one symbol."""
+    __slots__ = ("capacity", "prices", "timestamps", "count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.prices = [0.0] * capacity
+        self.timestamps = [0.0] * capacity
+        self.count = 0
+
+    def append(self, timestamp: float, price: float) -> None:
+        slot = self.count % self.capacity
+        self.prices[slot] = price
+        self.timestamps[slot] = timestamp
+        self.count += 1
+
+    def recent(self, n: Optional[int] = None) -> List[Tuple[float, float]]:
+        """Up to ``n`` latest ticks, oldest first."""
+        size = min(self.count, self.capacity)
+        n = size if n is None else min(n, size)
+        start = self.count - n
+        return [(self.timestamps[i % self.capacity], self.prices[i % self.capacity]) for i in range(start, self.count)]
+
+
+class PriceCache:
+    """
+    Latest quote and a ring buffer of recent ticks per symbol.
+
+    Each quote is an immutable tuple replaced in a single dict assignment, so
+    readers on the trade path take no lock and pay one dict lookup. Writers
+    serialize on a lock. Symbols that have never had a feed tick fall back to
+    their last traded price, seeded from the trades table and updated by
+    executed trades. Once a feed covers a symbol, trade prices no longer
+    override its quote.
+    """
+    def __init__(self, ring_size: int = 1024):
+        self.ring_size = ring_size
+        self._quotes: Dict[str, Quote] = {}
+        self._rings: Dict[str, TickRing] = {}
+        self._fed = set()
+        self._write_lock = threading.Lock()
+        self._seeded = False
+        self._seed_lock = threading.Lock()
+
+    def update_tick(self, symbol: str, last: float, bid: Optional[float] = None, ask: Optional[float] = None,
+                    timestamp: Optional[float] = None) -> None:
+        """Records a tick from a price feed."""
+        now = time.time()
+        timestamp = now if timestamp is None else timestamp
+        with self._write_lock:
+            ring = self._rings.get(symbol)
+            if ring is None:
+                ring = self._rings[symbol] = TickRing(self.ring_size)
+            ring.append(timestamp, last)
+            self._quotes[symbol] = Quote(symbol, last, bid, ask, timestamp, now)
+            # Marked only once its quote is visible to lock-free readers
+            self._fed.add(symbol)
+
+    def update(self, symbol: str, price: float) -> None:
+        """Records a last traded price, unless a feed already quotes the symbol."""
+        if symbol in self._fed:
+            return
+        now = time.time()
+        with self._write_lock:
+            if symbol not in self._fed:
+                self._quotes[symbol] = Quote(symbol, float(price), None, None, now, now)
+
+    def quote(self, symbol: str) -> Optional[Quote]:
+        return self._quotes.get(symbol)
+
+    def live_quote(self, symbol: str, max_age: float) -> Optional[Quote]:
+        """The feed quote for a symbol if one arrived within ``max_age`` seconds."""
+        if symbol not in self._fed:
+            return None
+        quote = self._quotes[symbol]
+        return quote if time.time() - quote.received_at <= max_age else None
+
+    def get(self, symbol: str) -> Optional[float]:
+        quote = self._quotes.get(symbol)
+        return quote.last if quote is not None else None
+
+    def recent_ticks(self, symbol: str, n: Optional[int] = None) -> List[Tuple[float, float]]:
+        ring = self._rings.get(symbol)
+        return ring.recent(n) if ring is not None else []
+
+    def prices_for(self, symbols: Iterable[str]) -> np.ndarray:
+        """Last prices for the given (ideally unique) symbols, NaN where none is known."""
+        quotes = self._quotes
+        return np.array([quotes[symbol].last if symbol in quotes else np.nan for symbol in symbols], dtype=np.float64)
+
+    def seed(self, db: Any) -> None:
+        """Loads the latest traded price of every symbol once per process."""
+        if self._seeded:
+            return
+        with self._seed_lock:
+            if self._seeded:
+                return
+            result = db.fetch('''
+            SELECT t.stock, t.stock_price FROM trades t
+            JOIN (SELECT stock, MAX(id) AS id FROM trades GROUP BY stock) latest ON latest.id = t.id
+            ''')
+            if isinstance(result, Exception):
+                raise result
+            now = time.time()
+            with self._write_lock:
+                for stock, price in result:
+                    # Prices seen since startup are newer than the table
+                    if stock not in self._quotes:
+                        self._quotes[stock] = Quote(stock, float(price), None, None, now, now)
+            self._seeded = True
+
+
+def reference_price(quote: Quote, action: str) -> float:
+    """The price an order would fill at: the ask for buys, the bid for sells, else the last price."""
+    side = quote.ask if action == "buy" else quote.bid
+    return side if side is not None else quote.last
+
+
+# off: trust the client's price; validate: reject prices too far from the quote;
+# fill: always execute at the quote
+PRICE_CHECK = os.getenv("PRICE_CHECK", "validate").lower()
+PRICE_TOLERANCE = float(os.getenv("PRICE_TOLERANCE", "0.005"))
+QUOTE_MAX_AGE = float(os.getenv("QUOTE_MAX_AGE", "60"))
+
+
+def resolve_trade_price(cache: PriceCache, stock: str, action: str, client_price: float) -> Tuple[float, Optional[str]]:
+    """
+    Returns ``(price, rejection)`` for an incoming order under PRICE_CHECK.
+    Orders for symbols without a fresh feed quote keep the client's price.
+    """
+    if PRICE_CHECK == "off":
+        return client_price, None
+    quote = cache.live_quote(stock, QUOTE_MAX_AGE)
+    if quote is None:
+        return client_price, None
+    price = reference_price(quote, action)
+    if PRICE_CHECK == "fill":
+        return price, None
+    if abs(client_price - price) > price * PRICE_TOLERANCE:
+        return client_price, f"Price {client_price} is outside {PRICE_TOLERANCE:.2%} of the market price {price}"
+    return client_price, None
+
+
+price_cache = PriceCache()
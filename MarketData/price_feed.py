@@ -0,0 +1,129 @@
+import csv
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Tuple
+
+from MarketData.price_cache import PriceCache, price_cache
+from utils.loggings import log_creator
+
+# publish(symbol, last, bid, ask, timestamp)
+Publish = Callable[[str, float, Optional[float], Optional[float], Optional[float]], None]
+
+
+class PriceSource(ABC):
+    """
+    Where ticks come from. A live feed adapter subclasses this, connects to
+    its vendor in ``run`` and calls ``publish`` for every tick it receives,
+    returning once ``stop`` is set or the stream ends.
+    """
+    @abstractmethod
+    def run(self, publish: Publish, stop: threading.Event) -> None:
+        ...
+
+
+class ReplaySource(PriceSource):
+    """
+    Replays ticks from a CSV or Parquet file with columns symbol, price (or
+    last), and optionally bid, ask and timestamp (unix seconds).
+
+    ``speed`` 0 pushes ticks as fast as possible, for load testing. Otherwise
+    the gaps between timestamps are replayed divided by ``speed``. The file is
+    parsed up front so the replay loop does nothing but publish.
+    """
+    def __init__(self, path: str, speed: float = 0.0, loop: bool = False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.ticks = self._load(path)
+
+    @staticmethod
+    def _load(path: str) -> List[Tuple[str, float, Optional[float], Optional[float], Optional[float]]]:
+        if path.endswith(".parquet"):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError as e:
+                raise RuntimeError("Replaying Parquet files needs pyarrow installed") from e
+            rows = pq.read_table(path).to_pylist()
+        else:
+            with open(path, newline="") as f:
+                rows = list(csv.DictReader(f))
+
+        def number(value):
+            return None if value in (None, "") else float(value)
+
+        return [
+            (row["symbol"], float(row["price"] if "price" in row else row["last"]),
+             number(row.get("bid")), number(row.get("ask")), number(row.get("timestamp")))
+            for row in rows
+        ]
+
+    def run(self, publish: Publish, stop: threading.Event) -> None:
+        while True:
+            if self.speed > 0:
+                self._run_timed(publish, stop)
+            else:
+                for symbol, last, bid, ask, timestamp in self.ticks:
+                    publish(symbol, last, bid, ask, timestamp)
+            if not self.loop or stop.is_set():
+                return
+
+    def _run_timed(self, publish: Publish, stop: threading.Event) -> None:
+        started = time.monotonic()
+        first = None
+        for symbol, last, bid, ask, timestamp in self.ticks:
+            if stop.is_set():
+                return
+            if timestamp is not None:
+                first = timestamp if first is None else first
+                delay = (timestamp - first) / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    stop.wait(delay)
+            publish(symbol, last, bid, ask, timestamp)
+
+
+class PriceFeed:
+    """Runs a PriceSource on a background thread, feeding the price cache and tick subscribers."""
+    def __init__(self, source: PriceSource, cache: PriceCache = price_cache,
+                 subscribers: Optional[List[Callable[[str, float], None]]] = None):
+        self.source = source
+        self.cache = cache
+        self.subscribers = list(subscribers or [])
+        self.ticks = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, symbol: str, last: float, bid: Optional[float] = None, ask: Optional[float] = None,
+                timestamp: Optional[float] = None) -> None:
+        self.cache.update_tick(symbol, last, bid, ask, timestamp)
+        self.ticks += 1
+        for subscriber in self.subscribers:
+            try:
+                subscriber(symbol, last)
+            except Exception as e:
+                log_creator(api_key="unknown", name="price_feed", log=f"Tick subscriber failed for {symbol}: {e}", error=True)
+
+    def run(self) -> None:
+        """Runs the source on the calling thread until it finishes or ``stop`` is called."""
+        self.source.run(self.publish, self._stop)
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="price-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def feed_from_env(subscribers: Optional[List[Callable[[str, float], None]]] = None) -> Optional[PriceFeed]:
+    """Builds the replay feed configured by PRICE_FEED_REPLAY, or None when no feed is configured."""
+    path = os.getenv("PRICE_FEED_REPLAY")
+    if not path:
+        return None
+    source = ReplaySource(path, speed=float(os.getenv("PRICE_FEED_SPEED", "1")),
+                          loop=os.getenv("PRICE_FEED_LOOP", "false").lower() == "true")
+    return PriceFeed(source, subscribers=subscribers)
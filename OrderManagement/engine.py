@@ -0,0 +1,42 @@
+from typing import Any, Dict, List
+
+from DatabaseManagement import service
+from DatabaseManagement.database import get_pool
+from OrderManagement.order_book import Order, OrderBook
+from utils.loggings import log_creator
+
+
+class MatchingEngine:
+    """
+    Evaluates price ticks against the resting order book and executes every
+    triggered order at the tick price through the regular trade path.
+    """
+    def __init__(self, book: OrderBook, buy_charges: float, sell_charges: float, sell_flat_charge: float = 0.0):
+        self.book = book
+        self.buy_charges = buy_charges
+        self.sell_charges = sell_charges
+        self.sell_flat_charge = sell_flat_charge
+
+    def _fill(self, db: Any, order: Order, price: float) -> Dict[str, Any]:
+        buy = order.action == "buy"
+        try:
+            result = service.execute_trade(
+                db, api_key=order.api_key, stock=order.stock, stock_price=price, quantity=order.quantity,
+                action=order.action, charges=self.buy_charges if buy else self.sell_charges,
+                flat_charge=0.0 if buy else self.sell_flat_charge
+            )
+        except Exception as e:
+            result = None
+            log_creator(api_key=order.api_key, name='Unknown', log=f'Order {order.order_id} failed: {e}', error=True)
+        order.status = "filled" if result and result["success"] else "rejected"
+        return {"order": order.to_dict(), "result": result}
+
+    def on_tick(self, stock: str, price: float) -> List[Dict[str, Any]]:
+        triggered = self.book.on_tick(stock, price)
+        if not triggered:
+            return []
+        with get_pool().connection() as db:
+            return [self._fill(db, order, price) for order in triggered]
+
+
+matching_engine = MatchingEngine(OrderBook(), service.BUY_CHARGES, service.SELL_CHARGES, service.DP_CHARGE)
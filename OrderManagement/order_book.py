@@ -0,0 +1,192 @@
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+ORDER_TYPES = ("limit", "stop")
+ACTIONS = ("buy", "sell")
+
+
+@dataclass
+class Order:
+    order_id: int
+    api_key: str
+    stock: str
+    action: str
+    order_type: str
+    price: float
+    quantity: int
+    created_at: float = field(default_factory=time.time)
+    expires_at: Optional[float] = None  # None means good till cancelled
+    status: str = "open"
+
+    def to_dict(self) -> dict:
+        return {
+            "orderId": self.order_id,
+            "stock": self.stock,
+            "action": self.action,
+            "orderType": self.order_type,
+            "price": self.price,
+            "quantity": self.quantity,
+            "createdAt": self.created_at,
+            "expiresAt": self.expires_at,
+            "status": self.status
+        }
+
+
+class SymbolBook:
+    """
+    Resting orders of one symbol in four heaps, each ordered by price then
+    arrival (price-time priority):
+
+    - buy limits, highest price first, trigger when the tick is at or below it
+    - sell limits, lowest price first, trigger when the tick is at or above it
+    - buy stops, lowest trigger first, trigger when the tick is at or above it
+    - sell stops, highest trigger first, trigger when the tick is at or below it
+
+    A tick only looks at the top of each heap, so evaluating it costs O(1)
+    plus O(log n) per triggered order. Cancelled orders are dropped lazily
+    when they reach the top, and the heaps are compacted once dead entries
+    outnumber live ones.
+    """
+    def __init__(self, stock: str):
+        self.stock = stock
+        self.buy_limits: list = []
+        self.sell_limits: list = []
+        self.buy_stops: list = []
+        self.sell_stops: list = []
+        self.live = 0
+        self.dead = 0
+
+    def _heap(self, order: Order):
+        if order.order_type == "limit":
+            return (self.buy_limits, -order.price) if order.action == "buy" else (self.sell_limits, order.price)
+        return (self.buy_stops, order.price) if order.action == "buy" else (self.sell_stops, -order.price)
+
+    def add(self, order: Order, sequence: int) -> None:
+        heap, key = self._heap(order)
+        heapq.heappush(heap, (key, sequence, order))
+        self.live += 1
+
+    def discard(self) -> None:
+        """Accounts for an order that was cancelled while resting."""
+        self.live -= 1
+        self.dead += 1
+        if self.dead > max(self.live, 64):
+            for heap in (self.buy_limits, self.sell_limits, self.buy_stops, self.sell_stops):
+                heap[:] = [entry for entry in heap if entry[2].status == "open"]
+                heapq.heapify(heap)
+            self.dead = 0
+
+    def _drain(self, heap: list, triggered, now: float, out: List[Order], expired: List[Order]) -> None:
+        while heap and triggered(heap[0][0]):
+            order = heapq.heappop(heap)[2]
+            if order.status != "open":
+                self.dead -= 1
+                continue
+            self.live -= 1
+            if order.expires_at is not None and order.expires_at < now:
+                order.status = "expired"
+                expired.append(order)
+                continue
+            order.status = "triggered"
+            out.append(order)
+
+    def on_tick(self, price: float, now: Optional[float] = None, expired: Optional[List[Order]] = None) -> List[Order]:
+        """
+        Pops every order the price triggers. Sells come first so their proceeds
+        can fund buys. Orders found past their expiry are appended to ``expired``.
+        """
+        now = time.time() if now is None else now
+        out: List[Order] = []
+        expired = [] if expired is None else expired
+        self._drain(self.sell_stops, lambda key: -key >= price, now, out, expired)
+        self._drain(self.sell_limits, lambda key: key <= price, now, out, expired)
+        self._drain(self.buy_limits, lambda key: -key >= price, now, out, expired)
+        self._drain(self.buy_stops, lambda key: key <= price, now, out, expired)
+        return out
+
+
+class OrderBook:
+    """All resting orders, one SymbolBook per symbol, each behind its own lock."""
+    def __init__(self):
+        self._books: Dict[str, SymbolBook] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._orders: Dict[int, Order] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _book(self, stock: str):
+        book = self._books.get(stock)
+        if book is None:
+            with self._lock:
+                book = self._books.get(stock)
+                if book is None:
+                    self._locks[stock] = threading.Lock()
+                    book = self._books[stock] = SymbolBook(stock)
+        return book, self._locks[stock]
+
+    def place(self, api_key: str, stock: str, action: str, order_type: str, price: float, quantity: int,
+              expires_at: Optional[float] = None) -> Order:
+        if action not in ACTIONS:
+            raise ValueError("Invalid action")
+        if order_type not in ORDER_TYPES:
+            raise ValueError("Invalid order type")
+        if price <= 0 or quantity <= 0:
+            raise ValueError("Price and quantity must be positive")
+        order_id = next(self._ids)
+        order = Order(order_id, api_key, stock, action, order_type, float(price), int(quantity), expires_at=expires_at)
+        book, lock = self._book(stock)
+        with lock:
+            book.add(order, order_id)
+            self._orders[order_id] = order
+        return order
+
+    def cancel(self, order_id: int, api_key: Optional[str] = None) -> Optional[Order]:
+        order = self._orders.get(order_id)
+        if order is None or (api_key is not None and order.api_key != api_key):
+            return None
+        book, lock = self._book(order.stock)
+        with lock:
+            if order.status != "open":
+                return None
+            order.status = "cancelled"
+            book.discard()
+            del self._orders[order_id]
+        return order
+
+    def _expire(self, order: Order, now: float) -> bool:
+        """Retires a resting order past its expiry, which ticks only notice once the price reaches it. Returns True if it expired."""
+        if order.expires_at is None or order.expires_at >= now:
+            return False
+        book, lock = self._book(order.stock)
+        with lock:
+            if order.status == "open":
+                order.status = "expired"
+                book.discard()
+                self._orders.pop(order.order_id, None)
+        return True
+
+    def open_orders(self, api_key: str, now: Optional[float] = None) -> List[Order]:
+        now = time.time() if now is None else now
+        return [
+            order for order in list(self._orders.values())
+            if order.api_key == api_key and order.status == "open" and not self._expire(order, now)
+        ]
+
+    def depth(self, stock: str) -> int:
+        book = self._books.get(stock)
+        return book.live if book is not None else 0
+
+    def on_tick(self, stock: str, price: float, now: Optional[float] = None) -> List[Order]:
+        book = self._books.get(stock)
+        if book is None:
+            return []
+        expired: List[Order] = []
+        with self._locks[stock]:
+            triggered = book.on_tick(price, now, expired)
+        for order in triggered + expired:
+            self._orders.pop(order.order_id, None)
+        return triggered
@@ -1,3 +1,4 @@
+import os
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -6,15 +7,25 @@ from starlette.types import ASGIApp, Receive, Scope, Send
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings
 import uvicorn
-from routes import dashboard_routes, extension_routes, health_routes
+from routes import admin_routes, dashboard_routes, extension_routes, health_routes, metrics_routes, order_routes
+from DatabaseManagement.database import PoolTimeoutError, get_pool
+from DatabaseManagement.async_service import shutdown_executor
+from DatabaseManagement.migrations import migrate
+from MarketData.price_feed import feed_from_env
+from OrderManagement.engine import matching_engine
+from utils.loggings import LogContextMiddleware, log_creator
+from utils.metrics import MetricsMiddleware
 
 class Settings(BaseSettings):
-    MYSQL_HOST: str
-    MYSQL_USER: str
-    MYSQL_PASSWORD: str
-    MYSQL_DATABASE: str
-    MYSQL_PORT: str
+    DB_BACKEND: str = "mysql"
+    SQLITE_PATH: str = "paper_trading.db"
+    MYSQL_HOST: str = ""
+    MYSQL_USER: str = ""
+    MYSQL_PASSWORD: str = ""
+    MYSQL_DATABASE: str = ""
+    MYSQL_PORT: str = ""
     LOG_KEY: str
+    TOKEN_SIGNING_KEYS: str
 
     class Config:
         env_file = ".env"
@@ -29,11 +40,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(LogContextMiddleware)
+# Added last so it is outermost and times everything below it
+app.add_middleware(MetricsMiddleware)
 
 # Mount the extension routes
 app.include_router(extension_routes.router)
 app.include_router(dashboard_routes.router)
 app.include_router(health_routes.router)
+app.include_router(order_routes.router)
+app.include_router(admin_routes.router)
+app.include_router(metrics_routes.router)
 
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc: HTTPException):
@@ -41,7 +58,43 @@ async def not_found_handler(request: Request, exc: HTTPException):
         status_code=404,
         content={"message": "The requested resource was not found"}
     )
-    
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    return JSONResponse(
+        status_code=503,
+        content={"message": "Server is busy, please retry"}
+    )
+
+@app.on_event("startup")
+def run_migrations():
+    if os.getenv("MIGRATE_ON_STARTUP", "true").lower() != "true":
+        return
+    try:
+        with get_pool().connection() as db:
+            applied = migrate(db)
+    except Exception as e:
+        # Serving against a partially migrated schema is worse than not starting
+        log_creator(api_key="unknown", name="migrations", log=f"Migrations failed: {e}", error=True)
+        raise
+    log_creator(api_key="unknown", name="migrations", log=f"Applied migrations: {applied}", error=False)
+
+@app.on_event("startup")
+def start_price_feed():
+    try:
+        app.state.price_feed = feed_from_env(subscribers=[matching_engine.on_tick])
+        if app.state.price_feed is not None:
+            app.state.price_feed.start()
+    except Exception as e:
+        print(f"Error starting price feed: {e}")
+
+@app.on_event("shutdown")
+def close_pool():
+    feed = getattr(app.state, "price_feed", None)
+    if feed is not None:
+        feed.stop()
+    shutdown_executor()
+    get_pool().close()
 
 
 
@@ -0,0 +1,308 @@
+"""
+HTTP load test reporting throughput and latency percentiles per endpoint.
+
+Seeds ``--users`` accounts with holdings and trade history in a throwaway
+team, then drives a weighted mix of endpoints at ``--concurrency`` for
+``--duration`` seconds. Without ``--url`` the FastAPI app is run in-process
+through httpx's ASGI transport; with it, requests go to a running server
+(e.g. a local uvicorn). Either way seeding writes straight to the database
+configured by the MYSQL_* environment variables, so point them at a
+disposable database. Seeded rows are deleted afterwards unless ``--keep``.
+
+Latency percentiles only cover 2xx responses; everything else is counted
+per endpoint under ``failed``. /trade rejects every order outside market
+hours (9:15 AM to 3:30 PM IST, Monday to Friday), so a mix with trades
+refuses to start then unless ``--allow-closed-market`` is given, and the
+report's ``market_open`` says whether the run saw an open market.
+
+    python -m benchmarks.load_test --users 200 --concurrency 32 --duration 30 \\
+        --mix user=5,portfolio=3,transaction=3,dashboard=1,trade=2,authenticate=1 --output run.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+import httpx
+import numpy as np
+
+ENDPOINTS = ("authenticate", "user", "trade", "portfolio", "transaction", "dashboard")
+DEFAULT_MIX = "authenticate=1,user=5,trade=2,portfolio=3,transaction=3,dashboard=1"
+ORIGIN = {"Origin": "chrome-extension://load-test"}
+SYMBOLS = [f"BENCH{i}" for i in range(20)]
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint {name!r}, expected one of {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def market_open() -> bool:
+    """Whether /trade's trading hours check would accept an order placed now."""
+    from fastapi import HTTPException
+    from routes.extension_routes import TradeRequest, validate_trade_time
+    from utils.IST_Time import get_current_time_IST
+
+    order = TradeRequest(action="buy", stockName=SYMBOLS[0], stockPrice=1.0, quantity=1, balance=0,
+                         date=get_current_time_IST())
+    try:
+        validate_trade_time(order)
+    except HTTPException:
+        return False
+    return True
+
+
+def seed(users: int, holdings: int, trades: int, seed_value: int) -> dict:
+    """Inserts the benchmark accounts, their holdings and trade history. Returns the team and api keys."""
+    from DatabaseManagement.database import Database
+    from DatabaseManagement.migrations import migrate
+    from utils.IST_Time import get_current_time_IST
+
+    rng = random.Random(seed_value)
+    team = f"bench-{uuid.uuid4().hex[:8]}"
+    keys = [f"{team}-{i}" for i in range(users)]
+    now = get_current_time_IST().replace(tzinfo=None)
+    user_rows, stock_rows, trade_rows = [], [], []
+    for index, api_key in enumerate(keys):
+        name = f"Bench User {index}"
+        balance = 1_000_000.0
+        user_rows.append((api_key, name, team, balance, None, None))
+        for stock in rng.sample(SYMBOLS, min(holdings, len(SYMBOLS))):
+            stock_rows.append((api_key, name, stock, rng.randint(1, 500)))
+        for i in range(trades):
+            quantity, price = rng.randint(1, 50), round(rng.uniform(50, 500), 2)
+            action = rng.choice(("buy", "sell"))
+            after = balance - quantity * price if action == "buy" else balance + quantity * price
+            trade_rows.append((api_key, name, rng.choice(SYMBOLS), price, quantity, action, balance, after,
+                               now - timedelta(minutes=trades - i)))
+            balance = after
+
+    db = Database()
+    try:
+        migrate(db)
+        for query, rows in (
+            ('INSERT INTO users (api_key, name, team, balance, token, token_expiry) VALUES (%s, %s, %s, %s, %s, %s)', user_rows),
+            ('INSERT INTO stocks (api_key, name, stock, quantity) VALUES (%s, %s, %s, %s)', stock_rows),
+            ('''INSERT INTO trades (api_key, name, stock, stock_price, quantity, type, before_balance, after_balance, time)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)''', trade_rows),
+        ):
+            for start in range(0, len(rows), 5000):
+                result = db.executemany(query, rows[start:start + 5000])
+                if isinstance(result, Exception):
+                    raise result
+            db.commit_transaction()
+    finally:
+        db.close()
+    return {"team": team, "api_keys": keys, "users": len(user_rows), "holdings": len(stock_rows), "trades": len(trade_rows)}
+
+
+def cleanup(team: str) -> None:
+    from DatabaseManagement.database import Database
+
+    db = Database()
+    try:
+        for table in ("trades", "stocks"):
+            db.execute(f'DELETE FROM {table} WHERE api_key IN (SELECT api_key FROM users WHERE team = %s)', (team,))
+        db.execute('DELETE FROM users WHERE team = %s', (team,))
+        db.commit_transaction()
+    finally:
+        db.close()
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, team: str, api_keys: list, mix: dict, seed_value: int):
+        self.client = client
+        self.team = team
+        self.api_keys = api_keys
+        self.tokens = {}
+        self.names, self.weights = zip(*mix.items())
+        self.rng = random.Random(seed_value)
+        self.latencies = defaultdict(list)  # 2xx responses only
+        self.failed = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    async def _authenticate(self, api_key: str) -> httpx.Response:
+        response = await self.client.post("/authenticate", params={"api_key": api_key}, headers=ORIGIN)
+        if response.status_code == 200:
+            self.tokens[api_key] = response.json()["token"]
+        return response
+
+    def _trade_body(self) -> dict:
+        from utils.IST_Time import get_current_time_IST
+
+        return {
+            "action": self.rng.choice(("buy", "sell")),
+            "stockName": self.rng.choice(SYMBOLS),
+            "stockPrice": round(self.rng.uniform(50, 500), 2),
+            "quantity": self.rng.randint(1, 5),
+            "balance": 0,
+            "date": get_current_time_IST().isoformat()
+        }
+
+    async def _call(self, endpoint: str, api_key: str) -> httpx.Response:
+        token = {"api-key": api_key, "token": self.tokens.get(api_key, "")}
+        if endpoint == "authenticate":
+            return await self._authenticate(api_key)
+        if endpoint == "user":
+            return await self.client.get("/user", headers=token)
+        if endpoint == "trade":
+            return await self.client.post("/trade", json=self._trade_body(), headers={**token, **ORIGIN})
+        if endpoint == "portfolio":
+            return await self.client.get("/api/portfolio", headers={"api-key": api_key})
+        if endpoint == "transaction":
+            return await self.client.get("/api/transaction", headers={"api-key": api_key}, params={"limit": 50})
+        return await self.client.get("/api/dashboard", headers={"team": self.team}, params={"limit": 50})
+
+    async def _worker(self, deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            endpoint = self.rng.choices(self.names, self.weights)[0]
+            api_key = self.rng.choice(self.api_keys)
+            start = time.perf_counter()
+            try:
+                status = (await self._call(endpoint, api_key)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            # Rejections and errors take a different path, so they stay out of the percentiles
+            if isinstance(status, int) and 200 <= status < 300:
+                self.latencies[endpoint].append(elapsed)
+            else:
+                self.failed[endpoint] += 1
+            self.statuses[endpoint][str(status)] += 1
+
+    async def run(self, concurrency: int, duration: float, warmup: float) -> dict:
+        # Tokens for every account up front, so /user and /trade are measured with valid ones
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def login(api_key):
+            async with semaphore:
+                await self._authenticate(api_key)
+        await asyncio.gather(*(login(api_key) for api_key in self.api_keys))
+
+        if warmup > 0:
+            await asyncio.gather(*(self._worker(time.perf_counter() + warmup) for _ in range(concurrency)))
+            self.latencies.clear()
+            self.failed.clear()
+            self.statuses.clear()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(self._worker(start + duration) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint in sorted(self.statuses):
+            samples = self.latencies[endpoint]
+            failed = self.failed[endpoint]
+            endpoints[endpoint] = {
+                "requests": len(samples) + failed,
+                "ok": len(samples),
+                "failed": failed,
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "statuses": dict(self.statuses[endpoint])
+            }
+            if samples:
+                milliseconds = np.asarray(samples) * 1000
+                p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99]).tolist()
+                endpoints[endpoint].update({
+                    "mean_ms": round(float(milliseconds.mean()), 3),
+                    "p50_ms": round(p50, 3),
+                    "p95_ms": round(p95, 3),
+                    "p99_ms": round(p99, 3),
+                    "max_ms": round(float(milliseconds.max()), 3)
+                })
+        ok = sum(len(samples) for samples in self.latencies.values())
+        failed = sum(self.failed.values())
+        return {"elapsed_seconds": round(elapsed, 3), "requests": ok + failed, "ok": ok, "failed": failed,
+                "throughput_rps": round(ok / elapsed, 2), "endpoints": endpoints}
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+async def _drive(args, seeded: dict) -> dict:
+    timeout = httpx.Timeout(60.0)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+            return await LoadTest(client, seeded["team"], seeded["api_keys"], args.mix, args.seed).run(
+                args.concurrency, args.duration, args.warmup)
+
+    from app import app
+    # ASGITransport does not send lifespan events, so run startup and shutdown around the test
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=timeout) as client:
+            return await LoadTest(client, seeded["team"], seeded["api_keys"], args.mix, args.seed).run(
+                args.concurrency, args.duration, args.warmup)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=None, help="base URL of a running server; in-process when omitted")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--holdings", type=int, default=5, help="holdings per user")
+    parser.add_argument("--trades", type=int, default=200, help="trade history rows per user")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before the run")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help="endpoint=weight,...")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    parser.add_argument("--output", default=None, help="also write the JSON report to this file")
+    parser.add_argument("--allow-closed-market", action="store_true",
+                        help="run a mix with trades outside market hours, when every /trade is rejected")
+    args = parser.parse_args(argv)
+
+    trading = "trade" in args.mix
+    open_at_start = market_open()
+    if trading and not open_at_start and not args.allow_closed_market:
+        parser.error("the market is closed, so every /trade would be rejected; run between 9:15 AM and 3:30 PM IST "
+                     "on a weekday, drop trade from --mix, or pass --allow-closed-market")
+
+    seeded = seed(args.users, args.holdings, args.trades, args.seed)
+    print(f"Seeded team {seeded['team']}: {seeded['users']} users, {seeded['holdings']} holdings, "
+          f"{seeded['trades']} trades", file=sys.stderr)
+    try:
+        results = asyncio.run(_drive(args, seeded))
+        open_at_end = market_open()
+    finally:
+        if not args.keep:
+            cleanup(seeded["team"])
+
+    if trading and not (open_at_start and open_at_end):
+        print("Warning: the market was closed for some or all of the run; /trade was rejected then "
+              "and its rejections are counted under failed", file=sys.stderr)
+    report = {
+        "commit": _commit(),
+        "target": args.url or "in-process",
+        "market_open": open_at_start and open_at_end,
+        "config": {"users": args.users, "holdings": args.holdings, "trades": args.trades,
+                   "concurrency": args.concurrency, "duration": args.duration, "mix": args.mix, "seed": args.seed},
+        **results
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measures how many price ticks per second the order book can evaluate.
+
+Each symbol is loaded with ``--depth`` resting limit and stop orders around a
+starting price, then a random walk of ticks is pushed through it. Triggered
+orders are replaced with fresh ones so the book stays at the same depth for
+the whole run. Only matching is measured, fills are not persisted.
+
+    python -m benchmarks.order_book_benchmark --depth 5000 --ticks 200000
+"""
+import argparse
+import json
+import random
+import time
+
+from OrderManagement.order_book import OrderBook
+
+
+def _random_order(book: OrderBook, rng: random.Random, stock: str, price: float) -> None:
+    action = rng.choice(("buy", "sell"))
+    order_type = rng.choice(("limit", "stop"))
+    # Place orders away from the market on the side where they rest
+    offset = rng.uniform(0.001, 0.05) * price
+    below = (action == "buy") == (order_type == "limit")
+    book.place("bench", stock, action, order_type, price - offset if below else price + offset, rng.randint(1, 100))
+
+
+def run(symbols: int, depth: int, ticks: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    book = OrderBook()
+    prices = {f"SYM{i}": 100.0 for i in range(symbols)}
+    for stock, price in prices.items():
+        for _ in range(depth):
+            _random_order(book, rng, stock, price)
+
+    stocks = list(prices)
+    walk = [(rng.choice(stocks), rng.gauss(0, 0.002)) for _ in range(ticks)]
+    triggered = 0
+    matching = 0.0
+    for stock, change in walk:
+        price = prices[stock] = prices[stock] * (1 + change)
+        start = time.perf_counter()
+        fills = book.on_tick(stock, price)
+        matching += time.perf_counter() - start
+        triggered += len(fills)
+        for _ in fills:
+            _random_order(book, rng, stock, price)
+
+    return {
+        "symbols": symbols,
+        "resting_orders_per_symbol": depth,
+        "ticks": ticks,
+        "triggered_orders": triggered,
+        "matching_seconds": round(matching, 4),
+        "ticks_per_second": round(ticks / matching) if matching else None,
+        "mean_tick_microseconds": round(matching / ticks * 1e6, 3)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=5000, help="resting orders per symbol")
+    parser.add_argument("--ticks", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(run(args.symbols, args.depth, args.ticks, args.seed), indent=2))
@@ -0,0 +1,87 @@
+"""
+Measures how fast a replay file can be pushed through the price feed.
+
+A random-walk tick file is written to a temporary CSV (or Parquet with
+``--parquet``), loaded by ReplaySource and replayed at full speed into a fresh
+quote cache. With ``--book`` every tick is also evaluated against an empty
+order book, as the matching engine subscriber would. Quote reads are timed
+separately to show the cost on the trade path.
+
+    python -m benchmarks.price_feed_benchmark --ticks 1000000 --book
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+
+from MarketData.price_cache import PriceCache
+from MarketData.price_feed import PriceFeed, ReplaySource
+from OrderManagement.order_book import OrderBook
+
+
+def _write_ticks(path: str, symbols: int, ticks: int, seed: int, parquet: bool) -> None:
+    rng = random.Random(seed)
+    prices = [100.0] * symbols
+    rows = []
+    now = time.time()
+    for i in range(ticks):
+        index = rng.randrange(symbols)
+        last = prices[index] = prices[index] * (1 + rng.gauss(0, 0.001))
+        rows.append((f"SYM{index}", round(last, 2), round(last - 0.05, 2), round(last + 0.05, 2), now + i * 0.001))
+    header = ["symbol", "price", "bid", "ask", "timestamp"]
+    if parquet:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.table({name: [row[i] for row in rows] for i, name in enumerate(header)}), path)
+    else:
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+
+def run(symbols: int, ticks: int, seed: int, parquet: bool, book: bool) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ticks.parquet" if parquet else "ticks.csv")
+        _write_ticks(path, symbols, ticks, seed, parquet)
+        start = time.perf_counter()
+        source = ReplaySource(path)
+        loading = time.perf_counter() - start
+
+    cache = PriceCache()
+    feed = PriceFeed(source, cache=cache, subscribers=[OrderBook().on_tick] if book else [])
+    start = time.perf_counter()
+    feed.run()
+    replay = time.perf_counter() - start
+
+    names = [f"SYM{i}" for i in range(symbols)]
+    reads = 1000000
+    start = time.perf_counter()
+    for i in range(reads):
+        cache.quote(names[i % symbols])
+    reading = time.perf_counter() - start
+
+    return {
+        "format": "parquet" if parquet else "csv",
+        "symbols": symbols,
+        "ticks": feed.ticks,
+        "order_book_subscriber": book,
+        "load_seconds": round(loading, 4),
+        "replay_seconds": round(replay, 4),
+        "ticks_per_second": round(feed.ticks / replay) if replay else None,
+        "quote_read_nanoseconds": round(reading / reads * 1e9, 1)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--ticks", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--parquet", action="store_true", help="replay from Parquet instead of CSV (needs pyarrow)")
+    parser.add_argument("--book", action="store_true", help="evaluate each tick against an order book too")
+    args = parser.parse_args()
+    print(json.dumps(run(args.symbols, args.ticks, args.seed, args.parquet, args.book), indent=2))
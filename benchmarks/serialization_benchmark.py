@@ -0,0 +1,104 @@
+"""
+Measures how long a transaction response takes to build and encode.
+
+Random trade rows, shaped like the ``_transaction_query`` result tuples, are
+turned into a response body two ways:
+
+- before: per-field dicts validated against ``response_model=List[dict]``
+  by FastAPI's ``serialize_response``, then rendered by ``JSONResponse``
+- after: ``TransactionRow`` dataclasses built from each tuple and
+  encoded directly by ``ORJSONResponse``
+
+Both bodies are checked to decode to the same JSON. The median of
+``--repeat`` runs is reported.
+
+    python -m benchmarks.serialization_benchmark --rows 10000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from Dashboard.dashboard_service import _transaction_row
+
+
+def _rows(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 9, 15)
+    balance = 1_000_000.0
+    rows = []
+    for i in range(count):
+        price, quantity = round(rng.uniform(50, 500), 2), rng.randint(1, 50)
+        action = rng.choice(("buy", "sell"))
+        after = balance - price * quantity if action == "buy" else balance + price * quantity
+        rows.append((i, f"SYM{rng.randrange(50)}", price, quantity, action, balance, after, start + timedelta(seconds=i)))
+        balance = after
+    return rows
+
+
+def _dict_row(row) -> dict:
+    # How the rows were built before the typed models
+    return {
+        "Stock": row[1],
+        "Stock_price": row[2],
+        "Quantity": row[3],
+        "Type": row[4],
+        "before_balance": row[5],
+        "After_balance": row[6],
+        "Time": row[7]
+    }
+
+
+def _before(rows: list, field) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=[_dict_row(row) for row in rows]))
+    return JSONResponse(content).body
+
+
+def _after(rows: list) -> bytes:
+    return ORJSONResponse([_transaction_row(row) for row in rows]).body
+
+
+def _median_ms(run, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def run(count: int, repeat: int, seed: int) -> dict:
+    rows = _rows(count, seed)
+    field = create_response_field(name="Response_get_transaction", type_=List[dict])
+    before, after = _before(rows, field), _after(rows)
+    if json.loads(before) != json.loads(after):
+        raise AssertionError("The two encodings decode to different JSON")
+
+    before_ms = _median_ms(lambda: _before(rows, field), repeat)
+    after_ms = _median_ms(lambda: _after(rows), repeat)
+    return {
+        "rows": count,
+        "repeat": repeat,
+        "before_ms": round(before_ms, 3),
+        "after_ms": round(after_ms, 3),
+        "speedup": round(before_ms / after_ms, 1),
+        "before_bytes": len(before),
+        "after_bytes": len(after)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.repeat, args.seed), indent=2))
@@ -0,0 +1,52 @@
+import hmac
+import os
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from pydantic import BaseModel
+
+from DatabaseManagement.async_service import run_in_db_thread
+from DatabaseManagement.query_stats import query_stats
+from MarketData.price_cache import price_cache
+from OrderManagement.engine import matching_engine
+
+router = APIRouter(prefix="/admin")
+
+
+def validate_admin(admin_key: str):
+    expected = os.getenv("ADMIN_API_KEY")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not hmac.compare_digest(admin_key, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+
+class TickRequest(BaseModel):
+    stockName: str
+    price: float
+
+
+# Push a price tick into the quote cache and through the order book
+@router.post("/tick")
+async def push_tick(tick: TickRequest, admin_key: str = Header(...)):
+    validate_admin(admin_key)
+    price_cache.update_tick(tick.stockName, tick.price)
+    fills = await run_in_db_thread(matching_engine.on_tick, tick.stockName, tick.price)
+    return {"stock": tick.stockName, "price": tick.price, "fills": fills}
+
+
+# Per-statement totals and the most recent slow statements with their plans
+@router.get("/queries")
+async def query_report(admin_key: str = Header(...), limit: int = Query(50, ge=1, le=1000)):
+    validate_admin(admin_key)
+    return {
+        "slow_query_ms": query_stats.slow_ms,
+        "statements": query_stats.summary(limit),
+        "slow": query_stats.slow_queries()
+    }
+
+
+@router.delete("/queries")
+async def reset_query_report(admin_key: str = Header(...)):
+    validate_admin(admin_key)
+    query_stats.reset()
+    return {"message": "Query statistics reset"}
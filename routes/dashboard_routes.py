@@ -1,56 +1,236 @@
-from typing import List
-from fastapi import APIRouter, Request, HTTPException, Header
-from Dashboard.dashboard_service import portfolio, transaction, get_user, dashboard_result
-from utils.loggings import log_creator
-from routes.extension_routes import db
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Request, HTTPException, Header, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from Dashboard.async_dashboard_service import (
+    portfolio, transaction_page, get_user, dashboard_result, dashboard_rank, valued_portfolio, networth_leaderboard,
+    account_pnl, team_pnl, equity_curve, overview, account_version, board_state
+)
+from Dashboard.dashboard_service import decode_cursor, stream_transactions
+from Dashboard.models import LeaderboardRow, PortfolioRow, TransactionRow, UserRow
+from Dashboard.overview import FIELDS
+from utils.loggings import log_creator, set_log_context
+from DatabaseManagement.database import Database, get_db, get_pool
+from DatabaseManagement.versions import etag, etag_matches
 
 router = APIRouter(prefix="/api")
 
 # Dependency to check user
-def validate_user(db, api_key):
-    user_data = get_user(db, api_key)
+async def validate_user(db, api_key):
+    user_data = await get_user(db, api_key)
     if not user_data:
         raise HTTPException(status_code=401, detail="Invalid API key")
+    set_log_context(name=user_data["name"])
     return user_data
 
-@router.get("/portfolio", response_model=List[dict])
-async def get_portfolio(request: Request, api_key: str = Header(...), stock: str = None):
+def _conditional(request: Request, version, key: str) -> Optional[str]:
+    if version is None:
+        return None
+    tag = etag(version, key, request.url.path, request.url.query)
+    if etag_matches(request.headers.get("if-none-match"), tag):
+        raise HTTPException(status_code=304, headers={"ETag": tag, "Cache-Control": "no-cache"})
+    return tag
+
+# A matching If-None-Match is answered with 304 after one primary-key read of
+# users.version (or one aggregate of the team's versions), before any of the
+# route's own queries. The version is read before the data, so a response is
+# never tagged newer than it is. Unknown keys get no tag and fail in the route
+async def account_etag(request: Request, api_key: str = Header(...), db: Database = Depends(get_db)) -> Optional[str]:
+    try:
+        version = await account_version(db, api_key)
+    except Exception as e:
+        print(e)
+        return None
+    return _conditional(request, version, api_key)
+
+async def team_etag(request: Request, team: str = Header(...), db: Database = Depends(get_db)) -> Optional[str]:
+    # The dashboard is rendered from this process' board, which is brought up to the team's committed state first
+    try:
+        state = await board_state(db, team)
+    except Exception as e:
+        print(e)
+        return None
+    return _conditional(request, state, team)
+
+async def portfolio_etag(request: Request, api_key: str = Header(...), valued: bool = False,
+                         db: Database = Depends(get_db)) -> Optional[str]:
+    # Valued rows move with market prices, which the version doesn't track
+    return None if valued else await account_etag(request, api_key, db)
+
+def _encoded(response: Response, content) -> ORJSONResponse:
+    # The rows are already typed, so orjson encodes them directly instead of
+    # response_model validation and jsonable_encoder; response_model is left for the docs
+    encoded = ORJSONResponse(content)
+    encoded.raw_headers.extend(response.headers.raw)
+    return encoded
+
+def _tag(response: Response, etag: Optional[str]) -> None:
+    if etag is not None:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
+@router.get("/portfolio", response_model=List[PortfolioRow])
+async def get_portfolio(request: Request, response: Response, api_key: str = Header(...), stock: str = None,
+                        valued: bool = False, etag: Optional[str] = Depends(portfolio_etag),
+                        db: Database = Depends(get_db)):
     try:
         
-        user_data = validate_user(db, api_key)
-        return portfolio(db, api_key, stock)
+        user_data = await validate_user(db, api_key)
+        _tag(response, etag)
+        if valued:
+            rows = await valued_portfolio(db, api_key)
+            rows = [row for row in rows or [] if stock is None or row["Stock"] == stock] or None
+        else:
+            rows = await portfolio(db, api_key, stock)
+        return rows if rows is None else _encoded(response, rows)
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/transaction", response_model=List[dict])
-async def get_transaction(request: Request, api_key: str = Header(...), 
+def _stream_transactions(api_key, stock, transaction_type, start_date, end_date, cursor):
+    # The request's own connection is returned before the body is streamed,
+    # so the stream borrows one for as long as it runs
+    with get_pool().connection() as db:
+        yield from stream_transactions(db, api_key, stock, transaction_type, start_date, end_date, cursor)
+
+@router.get("/transaction", response_model=List[TransactionRow])
+async def get_transaction(request: Request, response: Response, api_key: str = Header(...), 
                           stock: str = None, transaction_type: str = None, 
-                          start_date: str = None, end_date: str = None):
+                          start_date: str = None, end_date: str = None,
+                          limit: Optional[int] = Query(None, ge=1, le=5000), cursor: Optional[str] = None,
+                          stream: bool = False, etag: Optional[str] = Depends(account_etag), db: Database = Depends(get_db)):
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        
+        user_data = await validate_user(db, api_key)
+        if stream:
+            return StreamingResponse(
+                _stream_transactions(api_key, stock, transaction_type, start_date, end_date, cursor),
+                media_type="application/x-ndjson"
+            )
+        transactions, next_cursor = await transaction_page(db, api_key, stock, transaction_type, start_date, end_date, limit, cursor)
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+        _tag(response, etag)
+        return transactions if transactions is None else _encoded(response, transactions)
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/user", response_model=UserRow)
+async def fetch_user(request: Request, response: Response, api_key: str = Header(...),
+                     etag: Optional[str] = Depends(account_etag), db: Database = Depends(get_db)):
+    try:
+        
+        user_data = await validate_user(db, api_key)
+        _tag(response, etag)
+        return _encoded(response, UserRow(**user_data))
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/dashboard", response_model=List[LeaderboardRow])
+async def get_dashboard(request: Request, response: Response, team: str = Header(...), offset: int = Query(0, ge=0),
+                        limit: Optional[int] = Query(None, ge=1, le=1000), etag: Optional[str] = Depends(team_etag),
+                        db: Database = Depends(get_db)):
+    try:
+        
+        result = await dashboard_result(db, team, offset, limit)
+        if result is None:
+            return result
+        _tag(response, etag)
+        return _encoded(response, result)
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/dashboard/networth", response_model=List[dict])
+async def get_networth_dashboard(request: Request, team: str = Header(...), offset: int = Query(0, ge=0),
+                                 limit: Optional[int] = Query(None, ge=1, le=1000), db: Database = Depends(get_db)):
+    try:
+        
+        return await networth_leaderboard(db, team, offset, limit)
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/dashboard/rank", response_model=dict)
+async def get_dashboard_rank(request: Request, api_key: str = Header(...), db: Database = Depends(get_db)):
     try:
         
-        user_data = validate_user(db, api_key)
-        return transaction(db, api_key, stock, transaction_type, start_date, end_date)
+        rank = await dashboard_rank(db, api_key)
+        if rank is None:
+            raise HTTPException(status_code=401, detail="Invalid API key")
+        return rank
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/user", response_model=dict)
-async def fetch_user(request: Request, api_key: str = Header(...)):
+
+@router.get("/pnl", response_model=dict)
+async def get_pnl(request: Request, api_key: str = Header(...), db: Database = Depends(get_db)):
     try:
         
-        return validate_user(db, api_key)
+        user_data = await validate_user(db, api_key)
+        result = await account_pnl(db, api_key)
+        if result is None:
+            raise HTTPException(status_code=500, detail="Failed to compute P&L")
+        return result
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/dashboard", response_model=List[dict])
-async def get_dashboard(request: Request, team: str = Header(...)):
+@router.get("/pnl/team", response_model=List[dict])
+async def get_team_pnl(request: Request, team: str = Header(...), db: Database = Depends(get_db)):
     try:
         
-        return dashboard_result(db, team)
+        return await team_pnl(db, team)
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.get("/equity_curve", response_model=dict)
+async def get_equity_curve(request: Request, response: Response, api_key: str = Header(...),
+                           resolution: str = Query("raw", pattern="^(raw|minute|hour|day)$"),
+                           max_points: int = Query(500, ge=3, le=5000), etag: Optional[str] = Depends(account_etag),
+                           db: Database = Depends(get_db)):
+    try:
+        
+        user_data = await validate_user(db, api_key)
+        result = await equity_curve(db, api_key, resolution, max_points)
+        if result is not None:
+            _tag(response, etag)
+        return result
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Profile, holdings, recent trades and summary in one round-trip; the profile lookup doubles as authentication
+@router.get("/overview", response_model=dict)
+async def get_overview(request: Request, response: Response, api_key: str = Header(...), fields: str = ",".join(FIELDS),
+                       trades_limit: int = Query(20, ge=1, le=500), etag: Optional[str] = Depends(account_etag),
+                       db: Database = Depends(get_db)):
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested.difference(FIELDS)
+    if unknown or not requested:
+        raise HTTPException(status_code=400, detail=f"fields must be a comma-separated subset of {', '.join(FIELDS)}")
+    try:
+        result = await overview(db, api_key, requested, trades_limit)
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    if "profile" in result:
+        set_log_context(name=result["profile"]["name"])
+    _tag(response, etag)
+    return result
@@ -1,25 +1,24 @@
 from datetime import datetime, timedelta
-from typing import Dict, Union, Optional
+from typing import Dict, List, Union, Optional
 from pytz import timezone
 
-from fastapi import APIRouter, FastAPI, HTTPException, Header, Request
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Header, Request
 from pydantic import BaseModel
-from DatabaseManagement.database import Database
+from DatabaseManagement.database import Database, get_db
 
 from dotenv import load_dotenv
 
 from utils.IST_Time import get_current_time_IST
-from utils.loggings import log_creator
+from utils.loggings import log_creator, set_log_context
 load_dotenv()
 
-from DatabaseManagement.service import (
-    create_stock, create_trade, delete_stock, get_stock, get_user, 
-    update_balance, update_stock, update_user_token
-)
-from utils.util import create_token
+from DatabaseManagement import async_service
+from DatabaseManagement import service
+from DatabaseManagement.service import BUY_CHARGES, DP_CHARGE, SELL_CHARGES
+from MarketData.price_cache import price_cache, resolve_trade_price
+from utils.util import InvalidToken, create_token, verify_token
 
 router = APIRouter()
-db = Database()
 
 chrome_extension_origin = "chrome-extension://"
 
@@ -51,20 +50,16 @@ class TradeResponse(BaseModel):
     qt: int
     balance: float
 
-def validate_token(user_data, token):
-    print(user_data, token)
-    if user_data["token"] != token:
-        raise HTTPException(status_code=401, detail="Invalid token")
+def validate_token(api_key, token):
+    # Tokens are HMAC-signed, so this is a pure CPU check with no database read
+    try:
+        verify_token(api_key, token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e))
 
-    ist_timezone = timezone('Asia/Kolkata')
-    token_expiry = user_data["token_expiry"].replace(tzinfo=ist_timezone)
-    if token_expiry < get_current_time_IST():
-        raise HTTPException(status_code=401, detail="Token expired")
+MAX_BATCH_ORDERS = 100
 
-def handle_trade(user_data, trade: TradeRequest):
-    buy_charges = 0.0011842
-    sell_charges = 0.0011842
-    
+def validate_trade_time(trade: TradeRequest):
     ist_timezone = timezone('Asia/Kolkata')
     trade_date = trade.date.astimezone(ist_timezone)
     # Check if the trade date is within the allowed time window
@@ -72,146 +67,93 @@ def handle_trade(user_data, trade: TradeRequest):
         raise HTTPException(status_code=400, detail="Invalid date and time")
 
     # Check for valid trading hours and days
-    if trade_date.hour < 9 and trade_date.minutes < 15:
+    if (trade_date.hour, trade_date.minute) < (9, 15) or (trade_date.hour, trade_date.minute) > (15, 30):
         raise HTTPException(status_code=400, detail="Trade time must be between 9:15 AM to 3:30 PM")
     
-    if trade_date.hour > 15 and trade_date.minutes > 30:
-        raise HTTPException(status_code=400, detail="Trade time must be between 9:15 AM to 3:30 PM")
-    print(trade_date.weekday())
-    
     if trade_date.weekday() >= 5:  # 0=Monday, 4=Friday, 5=Saturday
         raise HTTPException(status_code=400, detail="Trades can only be executed from Monday to Friday")
+
+def handle_trade(db: Database, api_key: str, trade: TradeRequest):
+    validate_trade_time(trade)
     
     if trade.action == "buy":
-        return handle_buy(user_data, trade, buy_charges)
+        return handle_buy(db, api_key, trade, BUY_CHARGES)
     elif trade.action == "sell":
-        return handle_sell(user_data, trade, sell_charges)
+        return handle_sell(db, api_key, trade, SELL_CHARGES)
     else:
-        return {
-            "success": False,
-            "message": "Invalid action",
-            "error": "Invalid action",
-            "name": user_data["name"],
-            "stock": trade.stockName,
-            "qt": trade.quantity,
-            "balance": user_data["balance"]
-        }
-
-def handle_buy(user_data, trade: TradeRequest, charges: float):
-    cost = trade.quantity * trade.stockPrice * (1 + charges)
-    print(trade)
-    
-    if user_data["balance"] < cost:
-        return {
-            "success": False,
-            "message": "Insufficient balance",
-            "error": "Not enough funds",
-            "name": user_data["name"],
+        return _rejected(db, api_key, trade, "Invalid action")
+
+def _rejected(db: Database, api_key: str, trade: TradeRequest, message: str):
+    user_data = service.get_user(db, api_key)
+    if not user_data:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    return {
+        "success": False,
+        "message": message,
+        "error": message,
+        "name": user_data["name"],
+        "stock": trade.stockName,
+        "qt": trade.quantity,
+        "balance": user_data["balance"]
+    }
+
+def handle_trade_batch(db: Database, api_key: str, trades: List[TradeRequest]):
+    orders = []
+    for trade in trades:
+        price, rejection = resolve_trade_price(price_cache, trade.stockName, trade.action, trade.stockPrice)
+        order = {
+            "action": trade.action,
             "stock": trade.stockName,
-            "qt": trade.quantity,
-            "balance": user_data["balance"]
+            "stock_price": price,
+            "quantity": trade.quantity,
+            "charges": BUY_CHARGES if trade.action == "buy" else SELL_CHARGES,
+            "flat_charge": DP_CHARGE if trade.action == "sell" else 0.0
         }
-
-    old_stock = get_stock(db, user_data["api_key"], trade.stockName)
-    new_balance = user_data["balance"] - cost
-
-    db.start_transaction()
-    try:
-        create_trade_result = create_trade(
-            db, api_key=user_data["api_key"], name=user_data["name"], stock=trade.stockName, 
-            stock_price=trade.stockPrice, quantity=trade.quantity, type=trade.action, 
-            before_balance=user_data["balance"], after_balance=new_balance, time=get_current_time_IST()
-        )
-        if not create_trade_result["success"]:
-            raise Exception(create_trade_result["message"])
-
-        if old_stock:
-            new_quantity = old_stock["quantity"] + trade.quantity
-            update_stock_result = update_stock(db, user_data["api_key"], trade.stockName, new_quantity)
-            
-            if not update_stock_result["success"]:
-                raise Exception(update_stock_result["message"])
+        if trade.action not in ("buy", "sell"):
+            order["rejection"] = ("Invalid action", "Invalid action")
         else:
-            create_stock_result = create_stock(db, user_data["api_key"], user_data["name"], trade.stockName, trade.quantity)
-            if not create_stock_result["success"]:
-                raise Exception(create_stock_result["message"])
-
-        update_balance_result = update_balance(db, user_data["api_key"], new_balance)
-        if not update_balance_result["success"]:
-            raise Exception(update_balance_result["message"])
-
-        db.commit_transaction()
-        return {
-            "success": True,
-            "message": f"Bought {trade.quantity} shares of {trade.stockName} successfully",
-            "error": None,
-            "name": user_data["name"],
-            "stock": trade.stockName,
-            "qt": trade.quantity,
-            "balance": new_balance
-        }
+            try:
+                validate_trade_time(trade)
+            except HTTPException as e:
+                order["rejection"] = (e.detail, e.detail)
+        if rejection and "rejection" not in order:
+            order["rejection"] = (rejection, rejection)
+        orders.append(order)
+    try:
+        results = service.execute_trades_batch(db, api_key, orders)
     except Exception as e:
-        db.rollback_transaction()
-        print(e)
+        log_creator(api_key=api_key, name='Unknown', log=f'Batch failed: {e}', error=True)
         raise HTTPException(status_code=500, detail=str(e))
-
-def handle_sell(user_data, trade: TradeRequest, charges: float):
-    old_stock = get_stock(db, user_data["api_key"], trade.stockName)
-    dp_charge = 15
-    if not old_stock or old_stock["quantity"] < trade.quantity:
-        return {
-            "success": False,
-            "message": "Insufficient stock",
-            "error": "Not enough shares",
-            "name": user_data["name"],
-            "stock": trade.stockName,
-            "qt": trade.quantity,
-            "balance": user_data["balance"]
-        }
-
-    sell = trade.quantity * trade.stockPrice * (1 - charges) - dp_charge
-    new_balance = user_data["balance"] + sell
-
-    db.start_transaction()
+    if results is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    return results
+
+def _execute(db: Database, api_key: str, trade: TradeRequest, charges: float, flat_charge: float = 0.0):
+    # Check the client's price against the feed quote, or replace it, per PRICE_CHECK
+    price, rejection = resolve_trade_price(price_cache, trade.stockName, trade.action, trade.stockPrice)
+    if rejection:
+        return _rejected(db, api_key, trade, rejection)
     try:
-        create_trade_result = create_trade(
-            db, api_key=user_data["api_key"], name=user_data["name"], stock=trade.stockName, 
-            stock_price=trade.stockPrice, quantity=trade.quantity, type=trade.action, 
-            before_balance=user_data["balance"], after_balance=new_balance, time=get_current_time_IST()
+        result = service.execute_trade(
+            db, api_key=api_key, stock=trade.stockName, stock_price=price,
+            quantity=trade.quantity, action=trade.action, charges=charges, flat_charge=flat_charge
         )
-        if not create_trade_result["success"]:
-            raise Exception(create_trade_result["message"])
-
-        new_quantity = old_stock["quantity"] - trade.quantity
-        if new_quantity == 0:
-            update_stock_result = delete_stock(db, user_data["api_key"], trade.stockName)
-        else:
-            update_stock_result = update_stock(db, user_data["api_key"], trade.stockName, new_quantity)
-
-        if not update_stock_result["success"]:
-            raise Exception(update_stock_result["message"])
-
-        update_balance_result = update_balance(db, user_data["api_key"], new_balance)
-        if not update_balance_result["success"]:
-            raise Exception(update_balance_result["message"])
-
-        db.commit_transaction()
-        return {
-            "success": True,
-            "message": f"Sold {trade.quantity} shares of {trade.stockName} successfully",
-            "error": None,
-            "name": user_data["name"],
-            "stock": trade.stockName,
-            "qt": trade.quantity,
-            "balance": new_balance
-        }
     except Exception as e:
-        db.rollback_transaction()
+        print(e)
         raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    return result
+
+def handle_buy(db: Database, api_key: str, trade: TradeRequest, charges: float):
+    return _execute(db, api_key, trade, charges)
+
+def handle_sell(db: Database, api_key: str, trade: TradeRequest, charges: float):
+    return _execute(db, api_key, trade, charges, flat_charge=DP_CHARGE)
 
 # Authentication endpoint
 @router.post("/authenticate", response_model=AuthResponse)
-async def authenticate(request:Request, api_key: str):
+async def authenticate(request:Request, api_key: str, db: Database = Depends(get_db)):
     if chrome_extension_origin not in request.headers.get("Origin"):
         print(request.headers.get("Origin"))
         raise HTTPException(status_code=500, detail="Invalid origin")
@@ -220,16 +162,18 @@ async def authenticate(request:Request, api_key: str):
     #     raise HTTPException(status_code=500, detail="Invalid origin")
     print(request.headers.get("Origin"))
     try:
-        user_data = get_user(db, api_key)
+        user_data = await async_service.get_user(db, api_key)
         if not user_data:
             raise HTTPException(status_code=401, detail="Invalid API key")
+        set_log_context(name=user_data["name"])
         
         # log_creator(api_key=api_key, name='Unknown', log='User data fetched', error=False)
         expiration_time = get_current_time_IST() + timedelta(hours=7)
         token = create_token(api_key, expiration_time)
-        update_result = update_user_token(db, api_key, token, expiration_time)
+        update_result = await async_service.update_user_token(db, api_key, token, expiration_time)
         if not update_result["success"]:
             raise HTTPException(status_code=500, detail=update_result["message"])
+        await async_service.commit_transaction(db)
         
         return {"token": token, "expiresAt": int(expiration_time.timestamp())}
     except Exception as e:
@@ -237,14 +181,15 @@ async def authenticate(request:Request, api_key: str):
 
 # Get user data endpoint
 @router.get("/user", response_model=UserData)
-async def get_user_data(request:Request, api_key: str = Header(...), token: str = Header(...)):
+async def get_user_data(request:Request, api_key: str = Header(...), token: str = Header(...), db: Database = Depends(get_db)):
     print(api_key, token)
     try:
-        user_data = get_user(db, api_key)
+        validate_token(api_key, token)
+
+        user_data = await async_service.get_user(db, api_key)
         if not user_data:
             raise HTTPException(status_code=401, detail="Invalid API key")
-        
-        validate_token(user_data, token)
+        set_log_context(name=user_data["name"])
         
         return {"name": user_data["name"], "balance": user_data["balance"]}
     except Exception as e:
@@ -257,22 +202,43 @@ async def execute_trade(
     request:Request, 
     trade: TradeRequest,
     api_key: str = Header(...),
-    token: str = Header(...)
+    token: str = Header(...),
+    db: Database = Depends(get_db)
 ):
     if chrome_extension_origin not in request.headers.get("Origin"):
         print(request.headers.get("Origin"))
         raise HTTPException(status_code=500, detail="Invalid origin")
     print(trade, api_key, token)
     try:
-        user_data = get_user(db, api_key)
-        if not user_data:
-            raise HTTPException(status_code=401, detail="Invalid API key")
-
-        validate_token(user_data, token)
+        validate_token(api_key, token)
         
-        response = handle_trade(user_data, trade)
+        response = await async_service.run_in_db_thread(handle_trade, db, api_key, trade)
         return response
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
-     
+
+# Execute a batch of trades in one transaction
+@router.post("/trade/batch", response_model=List[TradeResponse])
+async def execute_trade_batch(
+    request:Request, 
+    trades: List[TradeRequest],
+    api_key: str = Header(...),
+    token: str = Header(...),
+    db: Database = Depends(get_db)
+):
+    if chrome_extension_origin not in request.headers.get("Origin"):
+        print(request.headers.get("Origin"))
+        raise HTTPException(status_code=500, detail="Invalid origin")
+    if len(trades) > MAX_BATCH_ORDERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ORDERS} orders per batch")
+    try:
+        validate_token(api_key, token)
+        
+        return await async_service.run_in_db_thread(handle_trade_batch, db, api_key, trades)
+    except HTTPException:
+        # A bad token or unknown api_key keeps its 401
+        raise
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=str(e))
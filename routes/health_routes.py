@@ -1,6 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from Dashboard.dashboard_service import get_user
-from routes.extension_routes import db
+from DatabaseManagement.cache import user_cache
+from DatabaseManagement.database import Database, get_db, get_pool
+from utils.loggings import new_relic_handler
 
 router = APIRouter(prefix="/health")
 
@@ -10,18 +12,30 @@ def ping():
 
 @router.get("/dbconnect")
 def connect():
-    db.connect()
-    return {"status": "ok"}
+    return {"status": "ok", "pool": get_pool().open()}
 
 @router.get("/dbclose")
 def close():
-    db.close()
+    get_pool().close()
     return {"status": "ok"}
 
+@router.get("/dbpool")
+def pool_status():
+    pool = get_pool()
+    return {"size": pool.size, "idle": pool.idle, "in_use": pool.in_use, "max_size": pool.max_size}
+
+@router.get("/cache")
+def cache_status():
+    return {"users": user_cache.stats()}
+
+@router.get("/logs")
+def log_status():
+    return {"shipper": new_relic_handler.shipper.stats()}
+
 @router.get("/dbhealth")
-def db_health():
+def db_health(db: Database = Depends(get_db)):
     try:
         data = get_user(db, "49127765")
         return {"status": "Database connected", "data": data}
     except Exception as e:
-        return {"status": "Database connection failed", "error": str(e)}   
\ No newline at end of file
+        return {"status": "Database connection failed", "error": str(e)}   
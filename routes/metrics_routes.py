@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+
+from utils.metrics import render
+
+router = APIRouter()
+
+# Prometheus scrape endpoint
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
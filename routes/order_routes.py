@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel
+
+from OrderManagement.engine import matching_engine
+from routes.extension_routes import validate_token
+
+router = APIRouter(prefix="/orders")
+
+
+class OrderRequest(BaseModel):
+    action: str
+    stockName: str
+    orderType: str
+    price: float
+    quantity: int
+    goodTill: Optional[datetime] = None
+
+
+# Place a resting limit or stop order
+@router.post("", response_model=dict)
+async def place_order(order: OrderRequest, api_key: str = Header(...), token: str = Header(...)):
+    validate_token(api_key, token)
+    try:
+        placed = matching_engine.book.place(
+            api_key, order.stockName, order.action, order.orderType, order.price, order.quantity,
+            expires_at=order.goodTill.timestamp() if order.goodTill else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return placed.to_dict()
+
+
+@router.get("", response_model=List[dict])
+async def list_orders(api_key: str = Header(...), token: str = Header(...)):
+    validate_token(api_key, token)
+    return [order.to_dict() for order in matching_engine.book.open_orders(api_key)]
+
+
+@router.delete("/{order_id}", response_model=dict)
+async def cancel_order(order_id: int, api_key: str = Header(...), token: str = Header(...)):
+    validate_token(api_key, token)
+    order = matching_engine.book.cancel(order_id, api_key)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found or no longer open")
+    return order.to_dict()
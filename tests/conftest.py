@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+# The app reads its settings at import time, so the SQLite backend is
+# configured before any of its modules are imported
+_DB_DIR = tempfile.mkdtemp(prefix="paper-trading-tests-")
+os.environ.update({
+    "DB_BACKEND": "sqlite",
+    "SQLITE_PATH": os.path.join(_DB_DIR, "test.db"),
+    "LOG_KEY": "test",
+    "LOG_URL": "http://127.0.0.1:9/",
+    "TOKEN_SIGNING_KEYS": "test:secret",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+
+from DatabaseManagement.database import Database
+from DatabaseManagement.migrations import migrate
+from DatabaseManagement.service import create_user
+from utils.IST_Time import get_current_time_IST
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app import app
+
+    # Entering the client runs the startup hooks, which migrate the schema
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    db = Database()
+    migrate(db)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def make_user(db):
+    """Creates an account in its own team and returns its api key."""
+    created = []
+
+    def make(name="Test User", team=None, balance=100000.0):
+        api_key = f"key-{len(created)}-{os.urandom(4).hex()}"
+        result = create_user(db, name=name, team=team or f"team-{api_key}", balance=balance, api_key=api_key,
+                             token=None, token_expiry=get_current_time_IST())
+        assert result["success"], result
+        db.commit_transaction()
+        created.append(api_key)
+        return api_key
+    return make
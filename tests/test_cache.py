@@ -0,0 +1,101 @@
+from datetime import datetime
+
+from DatabaseManagement.cache import TTLCache, user_cache
+from DatabaseManagement.database import Database
+from DatabaseManagement.service import execute_trade, get_user, update_user_token
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set("a", 1)
+    clock.now = 10
+    assert cache.get("a") == 1
+    clock.now = 10.5
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1
+    assert (stats["hits"], stats["misses"]) == (3, 1) and stats["hit_rate"] == 0.75
+
+
+def test_update_keeps_expiry():
+    clock = Clock()
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set("a", {"balance": 1.0, "name": "x"})
+    clock.now = 5
+    assert cache.update("a", balance=2.0)
+    assert not cache.update("b", balance=2.0)
+    assert cache.get("a") == {"balance": 2.0, "name": "x"}
+    clock.now = 11
+    assert cache.get("a") is None
+
+
+def test_fill_after_write_is_refused():
+    cache = TTLCache()
+    for write in (lambda: cache.invalidate("a"), lambda: cache.update("a", balance=2.0), cache.clear):
+        fill = cache.begin_fill("a")
+        write()
+        assert not cache.set("a", {"balance": 1.0}, fill)
+        assert cache.get("a") is None
+
+
+def test_fill_token_is_single_use():
+    cache = TTLCache()
+    first = cache.begin_fill("a")
+    second = cache.begin_fill("a")
+    assert not cache.set("a", 1, first)
+    assert cache.set("a", 2, second)
+    assert not cache.set("a", 3, second)
+    assert cache.get("a") == 2
+
+
+def test_stale_read_is_not_cached(db, make_user, monkeypatch):
+    api_key = make_user(balance=100.0)
+    user_cache.invalidate(api_key)
+    fetch = db.fetch
+
+    def racing_fetch(query, params=()):
+        # The row is read, then another request commits a trade before it is cached
+        rows = fetch(query, params)
+        other = Database()
+        try:
+            execute_trade(other, api_key, "X", 10.0, 1, "buy", 0.0)
+        finally:
+            other.close()
+        return rows
+
+    monkeypatch.setattr(db, "fetch", racing_fetch)
+    assert get_user(db, api_key)["balance"] == 100.0
+    monkeypatch.undo()
+    assert user_cache.get(api_key) is None
+    assert get_user(db, api_key)["balance"] == 90.0
+
+
+def test_cache_entry_is_dropped_on_commit(db, make_user):
+    api_key = make_user(balance=100.0)
+    assert get_user(db, api_key)["token"] is None
+    update_user_token(db, api_key, "t", datetime(2030, 1, 1))
+    # Invalidated once the write is visible, so readers never re-cache the old row
+    assert user_cache.get(api_key) is not None
+    db.commit_transaction()
+    assert user_cache.get(api_key) is None
+    assert get_user(db, api_key)["token"] == "t"
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from Dashboard.equity_curve import equity_curve, lttb
+
+
+def test_short_series_kept_whole():
+    x = np.arange(10, dtype=float)
+    assert lttb(x, x, 10).tolist() == list(range(10))
+    assert lttb(x, x, 50).tolist() == list(range(10))
+
+
+def test_threshold_below_three_keeps_everything():
+    x = np.arange(10, dtype=float)
+    assert lttb(x, x, 2).tolist() == list(range(10))
+
+
+def test_keeps_endpoints_and_count():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    picked = lttb(x, y, 100)
+    assert len(picked) == 100
+    assert picked[0] == 0 and picked[-1] == 999
+    assert np.all(np.diff(picked) > 0)
+
+
+def test_keeps_spikes():
+    x = np.arange(500, dtype=float)
+    y = np.zeros(500)
+    y[123], y[377] = 100.0, -100.0
+    picked = lttb(x, y, 20)
+    assert 123 in picked and 377 in picked
+
+
+def test_net_worth_marks_holdings_at_the_last_trade_price(db, make_user):
+    api_key = make_user(balance=1000.0)
+    start = datetime(2026, 1, 5, 10, 0)
+    trades = [
+        ("A", "buy", 5, 100.0, 1000.0, 500.0, start),
+        ("B", "buy", 2, 50.0, 500.0, 400.0, start + timedelta(minutes=1)),
+        ("A", "sell", 2, 120.0, 400.0, 640.0, start + timedelta(hours=2)),
+    ]
+    assert db.executemany('''
+    INSERT INTO trades (api_key, name, stock, type, quantity, stock_price, before_balance, after_balance, time)
+    VALUES (%s, 'Test User', %s, %s, %s, %s, %s, %s, %s)
+    ''', [(api_key, *trade) for trade in trades]) is True
+    db.commit_transaction()
+
+    raw = equity_curve(db, api_key)
+    assert raw["total_points"] == 3
+    assert [point["Net_worth"] for point in raw["points"]] == [1000.0, 1000.0, 640.0 + 3 * 120.0 + 2 * 50.0]
+    assert [point["Balance"] for point in raw["points"]] == [500.0, 400.0, 640.0]
+
+    # The two trades in the first hour collapse to the last one
+    hourly = equity_curve(db, api_key, resolution="hour")
+    assert [point["Time"] for point in hourly["points"]] == ["2026-01-05T10:00:00", "2026-01-05T12:00:00"]
+    assert [point["Balance"] for point in hourly["points"]] == [400.0, 640.0]
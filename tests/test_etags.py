@@ -0,0 +1,106 @@
+from DatabaseManagement.service import execute_trade
+from DatabaseManagement.versions import etag, etag_matches
+
+
+def test_etag_matching():
+    tag = etag(3, "key", "/api/user", "")
+    assert tag.startswith('"3-') and "key" not in tag
+    assert etag_matches(tag, tag)
+    assert etag_matches(f'"other", W/{tag}', tag)
+    assert etag_matches("*", tag)
+    assert not etag_matches(None, tag)
+    assert not etag_matches(etag(4, "key", "/api/user", ""), tag)
+    assert etag(3, "key", "/api/user", "") != etag(3, "key", "/api/portfolio", "")
+
+
+def test_user_not_modified_until_a_trade(client, db, make_user):
+    api_key = make_user()
+    headers = {"api-key": api_key}
+    first = client.get("/api/user", headers=headers)
+    assert first.status_code == 200
+    tag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    cached = client.get("/api/user", headers={**headers, "If-None-Match": tag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == tag
+    assert cached.content == b""
+
+    assert execute_trade(db, api_key, "X", 100.0, 1, "buy", 0.0)["success"]
+    changed = client.get("/api/user", headers={**headers, "If-None-Match": tag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != tag
+    assert changed.json()["balance"] == 100000.0 - 100.0
+
+
+def _holder(db, make_user):
+    api_key = make_user()
+    assert execute_trade(db, api_key, "X", 100.0, 1, "buy", 0.0)["success"]
+    return api_key
+
+
+def test_tags_differ_per_route_and_query(client, db, make_user):
+    headers = {"api-key": _holder(db, make_user)}
+    user = client.get("/api/user", headers=headers).headers["ETag"]
+    portfolio = client.get("/api/portfolio", headers=headers).headers["ETag"]
+    filtered = client.get("/api/portfolio", headers=headers, params={"stock": "X"}).headers["ETag"]
+    assert len({user, portfolio, filtered}) == 3
+    assert client.get("/api/portfolio", headers={**headers, "If-None-Match": user}).status_code != 304
+
+
+def test_valued_portfolio_is_not_tagged(client, db, make_user):
+    response = client.get("/api/portfolio", headers={"api-key": _holder(db, make_user)}, params={"valued": "true"})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+
+def test_unknown_key_gets_no_tag(client):
+    response = client.get("/api/user", headers={"api-key": "no-such-key", "If-None-Match": "*"})
+    assert response.status_code not in (200, 304)
+    assert "ETag" not in response.headers
+
+
+def test_dashboard_follows_team_trades(client, db, make_user):
+    team = "etag-team"
+    api_key = make_user(team=team)
+    make_user(name="Other", team=team)
+    headers = {"team": team}
+    first = client.get("/api/dashboard", headers=headers)
+    assert first.status_code == 200
+    tag = first.headers["ETag"]
+    assert client.get("/api/dashboard", headers={**headers, "If-None-Match": tag}).status_code == 304
+
+    assert execute_trade(db, api_key, "X", 100.0, 1, "buy", 0.0)["success"]
+    changed = client.get("/api/dashboard", headers={**headers, "If-None-Match": tag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != tag
+
+
+def test_dashboard_tag_survives_reloads_and_other_workers(client, db, make_user):
+    from Dashboard.leaderboard import LeaderboardRegistry, leaderboards
+
+    team = "etag-reload-team"
+    make_user(team=team)
+    headers = {"team": team}
+    tag = client.get("/api/dashboard", headers=headers).headers["ETag"]
+
+    # A TTL reload with nothing changed keeps the tag
+    leaderboards._boards[team].loaded_at -= leaderboards.ttl + 1
+    assert client.get("/api/dashboard", headers={**headers, "If-None-Match": tag}).status_code == 304
+    # So does a board loaded by another worker
+    assert LeaderboardRegistry().get(db, team).state == leaderboards.get(db, team).state
+
+
+def test_dashboard_sees_writes_from_other_workers(client, db, make_user):
+    team = "etag-worker-team"
+    api_key = make_user(team=team)
+    headers = {"team": team}
+    tag = client.get("/api/dashboard", headers=headers).headers["ETag"]
+
+    # Committed elsewhere, so this process gets no event for it
+    db.execute('UPDATE users SET balance = %s, version = version + 1 WHERE api_key = %s', (5.0, api_key))
+    db.commit_transaction()
+    changed = client.get("/api/dashboard", headers={**headers, "If-None-Match": tag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != tag
+    assert changed.json()[0]["Balance"] == 5.0
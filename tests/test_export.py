@@ -0,0 +1,118 @@
+import os
+from datetime import date, datetime
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet", exc_type=ImportError)
+
+from DatabaseManagement.database import Database
+from DatabaseManagement.export import TRADES_SCHEMA, PartitionedWriter, export_trades, run_export
+from DatabaseManagement.migrations import migrate
+from DatabaseManagement.sqlite_backend import SQLiteConnection
+
+
+@pytest.fixture
+def fresh(tmp_path):
+    db = Database(SQLiteConnection(str(tmp_path / "export.db")))
+    migrate(db)
+    db.execute_final("INSERT INTO users (api_key, name, team, balance) VALUES ('k1', 'One', 'alpha', 1000)")
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _trade(db, trade_id, day=datetime(2024, 1, 2, 10)):
+    db.execute_final('''
+    INSERT INTO trades (id, api_key, name, stock, stock_price, quantity, type, before_balance, after_balance, time)
+    VALUES (%s, 'k1', 'One', 'X', 10, 1, 'buy', 1000, 990, %s)
+    ''', (trade_id, day))
+
+
+def _exported_ids(out_dir):
+    ids = []
+    for directory, _, files in os.walk(os.path.join(out_dir, "trades")):
+        for name in files:
+            if name.startswith("part-"):
+                ids += pq.read_table(os.path.join(directory, name)).column("id").to_pylist()
+    return sorted(ids)
+
+
+def test_late_commits_are_picked_up(fresh, tmp_path):
+    out = str(tmp_path / "out")
+    # Id 3 is handed out but its transaction has not committed yet
+    for trade_id in (1, 2, 4):
+        _trade(fresh, trade_id)
+    first = export_trades(fresh, out, run_id="r1")
+    assert (first["rows"], first["last_id"], first["gaps"]) == (3, 4, [3])
+
+    _trade(fresh, 3)
+    _trade(fresh, 5)
+    second = export_trades(fresh, out, since_id=4, run_id="r2", gaps=first["gaps"])
+    assert (second["rows"], second["last_id"], second["gaps"]) == (2, 5, [])
+    assert _exported_ids(out) == [1, 2, 3, 4, 5]
+
+    third = export_trades(fresh, out, since_id=5, run_id="r3", gaps=second["gaps"])
+    assert third["rows"] == 0 and third["last_id"] == 5
+    assert _exported_ids(out) == [1, 2, 3, 4, 5]
+
+
+def test_old_gaps_are_given_up(fresh, tmp_path):
+    out = str(tmp_path / "out")
+    _trade(fresh, 1)
+    _trade(fresh, 10)
+    # Only the two ids below 10 are watched; 2-7 are taken for rolled back trades
+    first = export_trades(fresh, out, run_id="r1", overlap=2)
+    assert first["gaps"] == [8, 9]
+    _trade(fresh, 20)
+    second = export_trades(fresh, out, since_id=10, run_id="r2", gaps=first["gaps"], overlap=2)
+    assert second["gaps"] == [18, 19]
+    assert _exported_ids(out) == [1, 10, 20]
+
+
+def test_state_carries_gaps_between_runs(fresh, tmp_path):
+    out = str(tmp_path / "out")
+    _trade(fresh, 1)
+    _trade(fresh, 3)
+    run_export(fresh, out, tables=["trades"])
+    _trade(fresh, 2)
+    summary = run_export(fresh, out, tables=["trades"])
+    assert summary["trades"]["rows"] == 1
+    assert _exported_ids(out) == [1, 2, 3]
+
+
+def test_bounded_writers_split_partitions(tmp_path):
+    root = str(tmp_path / "trades")
+    writer = PartitionedWriter(root, TRADES_SCHEMA, "run", max_open=2)
+    day = datetime(2024, 1, 2)
+
+    def rows(team, trade_id):
+        return {(team, day.date()): [(trade_id, "k", "n", "X", 1.0, 1, "buy", 1.0, 1.0, day)]}
+
+    # Writing to c evicts a, so a's next rows go to a second part file
+    for team, trade_id in [("a", 1), ("b", 2), ("c", 3), ("a", 4), (None, 5)]:
+        writer.write(rows(team, trade_id))
+        assert len(writer._writers) <= 2
+    assert not any(name.startswith("part-") for _, _, files in os.walk(root) for name in files)
+    writer.commit()
+
+    files = {os.path.relpath(os.path.join(directory, name), root)
+             for directory, _, names in os.walk(root) for name in names}
+    assert files == {
+        "team=a/date=2024-01-02/part-run.parquet",
+        "team=a/date=2024-01-02/part-run-1.parquet",
+        "team=b/date=2024-01-02/part-run.parquet",
+        "team=c/date=2024-01-02/part-run.parquet",
+        "team=__HIVE_DEFAULT_PARTITION__/date=2024-01-02/part-run.parquet",
+    }
+    assert writer.rows == 5
+    assert _exported_ids(str(tmp_path)) == [1, 2, 3, 4, 5]
+
+
+def test_aborted_run_leaves_no_files(tmp_path):
+    root = str(tmp_path / "trades")
+    writer = PartitionedWriter(root, TRADES_SCHEMA, "run", max_open=1)
+    for team in ("a", "b"):
+        writer.write({(team, date(2024, 1, 2)): [(1, "k", "n", "X", 1.0, 1, "buy", 1.0, 1.0, datetime(2024, 1, 2))]})
+    writer.abort()
+    assert [name for _, _, files in os.walk(root) for name in files] == []
@@ -0,0 +1,161 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from prometheus_client import REGISTRY
+
+from utils.logger_api import LogShipper
+
+
+class StandIn:
+    """A local stand-in for the log API that records each batch it receives."""
+    def __init__(self):
+        self.batches = []
+        self.headers = []
+        self.status = 202
+        self.release = threading.Event()
+        self.release.set()
+        self.received = threading.Condition()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with stand_in.received:
+                    stand_in.headers.append(dict(self.headers))
+                    stand_in.batches.append(json.loads(gzip.decompress(body))[0]["logs"])
+                    stand_in.received.notify_all()
+                stand_in.release.wait(5)
+                self.send_response(stand_in.status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/log/v1"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def wait_for(self, batches: int) -> None:
+        with self.received:
+            assert self.received.wait_for(lambda: len(self.batches) >= batches, timeout=5)
+
+    def messages(self) -> list:
+        return [entry["message"] for batch in self.batches for entry in batch]
+
+
+@pytest.fixture
+def stand_in():
+    stand_in = StandIn()
+    yield stand_in
+    stand_in.release.set()
+    stand_in.server.shutdown()
+    stand_in.server.server_close()
+
+
+@pytest.fixture
+def make_shipper(stand_in):
+    shippers = []
+
+    def make(**options):
+        shipper = LogShipper("test-key", stand_in.url, **{"max_latency": 0.2, "timeout": 5.0, **options})
+        shippers.append(shipper)
+        return shipper
+    yield make
+    for shipper in shippers:
+        shipper.close()
+
+
+def _entry(number: int) -> dict:
+    return {"timestamp": number, "message": f"entry {number}", "attributes": {}}
+
+
+def test_batches_are_gzipped_and_capped(stand_in, make_shipper):
+    shipper = make_shipper(batch_size=3)
+    for number in range(7):
+        assert shipper.submit(_entry(number))
+    assert shipper.flush(timeout=5)
+    assert [len(batch) for batch in stand_in.batches] == [3, 3, 1]
+    assert stand_in.messages() == [f"entry {number}" for number in range(7)]
+    assert stand_in.headers[0]["Content-Encoding"] == "gzip"
+    assert stand_in.headers[0]["Api-Key"] == "test-key"
+    assert shipper.stats() == {"queued": 7, "shipped": 7, "dropped": 0, "failed": 0, "pending": 0}
+
+
+def test_flush_waits_for_the_batch_in_flight(stand_in, make_shipper):
+    shipper = make_shipper(batch_size=10, max_latency=0.05)
+    stand_in.release.clear()
+    shipper.submit(_entry(1))
+    stand_in.wait_for(1)
+    # Taken off the queue but not answered yet, so it still counts as pending
+    assert not shipper.flush(timeout=0.1)
+    stand_in.release.set()
+    assert shipper.flush(timeout=5)
+    assert shipper.stats()["shipped"] == 1
+
+
+@pytest.mark.parametrize("policy, kept", [("drop_newest", [0, 1, 2]), ("drop_oldest", [0, 2, 3])])
+def test_full_queue_drops_by_policy(stand_in, make_shipper, policy, kept):
+    shipper = make_shipper(batch_size=1, max_queue=2, sample_rate=1.0, overflow_policy=policy)
+    stand_in.release.clear()
+    shipper.submit(_entry(0))
+    # The worker holds entry 0 in a request, so the queue fills up behind it
+    stand_in.wait_for(1)
+    assert shipper.submit(_entry(1)) and shipper.submit(_entry(2))
+    assert shipper.submit(_entry(3)) is (policy == "drop_oldest")
+    stand_in.release.set()
+    assert shipper.flush(timeout=5)
+    assert stand_in.messages() == [f"entry {number}" for number in kept]
+    assert shipper.stats()["dropped"] == 1
+    assert shipper.stats()["shipped"] == 3
+
+
+def test_sampling_keeps_errors(stand_in, make_shipper):
+    shipper = make_shipper(batch_size=1, max_queue=4, sample_threshold=0.5, sample_rate=0.0)
+    stand_in.release.clear()
+    shipper.submit(_entry(0))
+    stand_in.wait_for(1)
+    assert shipper.submit(_entry(1)) and shipper.submit(_entry(2))
+    # Half full: routine entries are sampled away, errors still get in
+    assert not shipper.submit(_entry(3))
+    assert shipper.submit(_entry(4), important=True)
+    stand_in.release.set()
+    assert shipper.flush(timeout=5)
+    assert stand_in.messages() == ["entry 0", "entry 1", "entry 2", "entry 4"]
+
+
+@pytest.mark.parametrize("status, attempts", [(500, 2), (400, 1)])
+def test_failures_are_counted(stand_in, make_shipper, status, attempts):
+    stand_in.status = status
+    shipper = make_shipper(batch_size=2)
+    shipper.submit(_entry(1))
+    shipper.submit(_entry(2))
+    assert shipper.flush(timeout=5)
+    assert len(stand_in.batches) == attempts
+    assert shipper.stats()["failed"] == 2 and shipper.stats()["shipped"] == 0
+
+
+def test_counters_are_exported(stand_in, make_shipper):
+    def shipped():
+        return REGISTRY.get_sample_value("log_records_total", {"outcome": "shipped"}) or 0.0
+
+    before = shipped()
+    shipper = make_shipper()
+    shipper.submit(_entry(1))
+    assert shipper.flush(timeout=5)
+    assert shipped() == before + 1
+
+
+def test_closed_shipper_drops(make_shipper):
+    shipper = make_shipper()
+    shipper.close()
+    assert not shipper.submit(_entry(1))
+    assert shipper.stats()["dropped"] == 1
+
+
+def test_health_reports_the_app_shipper(client):
+    stats = client.get("/health/logs").json()["shipper"]
+    assert set(stats) == {"queued", "shipped", "dropped", "failed", "pending"}
@@ -0,0 +1,62 @@
+import pytest
+
+from DatabaseManagement import migrations
+from DatabaseManagement.database import Database
+from DatabaseManagement.migrations import MIGRATIONS, applied_versions, migrate, status
+from DatabaseManagement.sqlite_backend import SQLiteConnection
+
+LATEST = MIGRATIONS[-1].version
+
+
+@pytest.fixture
+def fresh(tmp_path):
+    db = Database(SQLiteConnection(str(tmp_path / "fresh.db")))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def test_migrations_apply_once(fresh):
+    assert applied_versions(fresh) == []
+    assert migrate(fresh) == [m.version for m in MIGRATIONS]
+    assert migrate(fresh) == []
+    assert applied_versions(fresh) == [m.version for m in MIGRATIONS]
+    assert all(row["applied"] for row in status(fresh))
+    assert fresh.column_exists("users", "version")
+    assert fresh.index_exists("stocks", "api_key_stock_unique")
+    assert fresh.index_exists("trades", "api_key_time_id")
+
+
+def test_migrate_stops_at_target(fresh):
+    assert migrate(fresh, target=2) == [1, 2]
+    assert [row["applied"] for row in status(fresh)] == [m.version <= 2 for m in MIGRATIONS]
+    assert migrate(fresh) == list(range(3, LATEST + 1))
+
+
+def test_steps_are_safe_to_rerun(fresh):
+    # A step that ran but was not recorded (e.g. a crash before the insert) is applied again cleanly
+    migrate(fresh)
+    for migration in MIGRATIONS:
+        migration.apply(fresh)
+    assert migrate(fresh) == []
+
+
+def test_failed_step_is_not_recorded(fresh, monkeypatch):
+    def broken(db):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS + [migrations.Migration(LATEST + 1, "Broken", broken)])
+    with pytest.raises(RuntimeError, match="boom"):
+        migrate(fresh)
+    assert applied_versions(fresh) == [m.version for m in MIGRATIONS]
+
+
+def test_cli_status(fresh, monkeypatch, capsys):
+    migrate(fresh, target=1)
+    monkeypatch.setattr(migrations, "Database", lambda: fresh)
+    monkeypatch.setattr(fresh, "close", lambda: None)
+    migrations.main(["status"])
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == len(MIGRATIONS)
+    assert "applied" in lines[0] and all("pending" in line for line in lines[1:])
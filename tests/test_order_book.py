@@ -0,0 +1,78 @@
+import pytest
+
+from OrderManagement.order_book import OrderBook
+
+
+def test_rejects_invalid_orders():
+    book = OrderBook()
+    with pytest.raises(ValueError):
+        book.place("a", "ACME", "hold", "limit", 10, 1)
+    with pytest.raises(ValueError):
+        book.place("a", "ACME", "buy", "market", 10, 1)
+    with pytest.raises(ValueError):
+        book.place("a", "ACME", "buy", "limit", 0, 1)
+
+
+def test_limit_and_stop_triggers():
+    book = OrderBook()
+    buy_limit = book.place("a", "ACME", "buy", "limit", 100, 1)
+    sell_limit = book.place("a", "ACME", "sell", "limit", 120, 1)
+    buy_stop = book.place("a", "ACME", "buy", "stop", 130, 1)
+    sell_stop = book.place("a", "ACME", "sell", "stop", 90, 1)
+
+    assert book.on_tick("ACME", 110) == []
+    assert book.on_tick("ACME", 100) == [buy_limit]
+    assert book.on_tick("ACME", 125) == [sell_limit]
+    assert book.on_tick("ACME", 130) == [buy_stop]
+    assert book.on_tick("ACME", 85) == [sell_stop]
+    assert book.depth("ACME") == 0
+    assert buy_limit.status == "triggered"
+
+
+def test_price_time_priority_and_sells_first():
+    book = OrderBook()
+    first = book.place("a", "ACME", "buy", "limit", 100, 1)
+    better = book.place("b", "ACME", "buy", "limit", 105, 1)
+    second = book.place("c", "ACME", "buy", "limit", 100, 1)
+    sell = book.place("d", "ACME", "sell", "stop", 100, 1)
+    assert book.on_tick("ACME", 99) == [sell, better, first, second]
+
+
+def test_cancel():
+    book = OrderBook()
+    order = book.place("a", "ACME", "buy", "limit", 100, 1)
+    assert book.cancel(order.order_id, "someone else") is None
+    assert book.cancel(order.order_id, "a") is order
+    assert order.status == "cancelled"
+    assert book.cancel(order.order_id, "a") is None
+    assert book.on_tick("ACME", 90) == []
+    assert book.open_orders("a") == []
+
+
+def test_expired_orders_are_not_triggered_or_listed():
+    book = OrderBook()
+    expiring = book.place("a", "ACME", "buy", "limit", 100, 1, expires_at=1000.0)
+    lasting = book.place("a", "ACME", "buy", "limit", 90, 1)
+    assert book.open_orders("a", now=999.0) == [expiring, lasting]
+    assert book.open_orders("a", now=1001.0) == [lasting]
+    assert expiring.status == "expired"
+    assert book.depth("ACME") == 1
+    assert book.on_tick("ACME", 80, now=1001.0) == [lasting]
+
+
+def test_expiry_noticed_by_tick():
+    book = OrderBook()
+    order = book.place("a", "ACME", "sell", "limit", 100, 1, expires_at=1000.0)
+    assert book.on_tick("ACME", 110, now=1001.0) == []
+    assert order.status == "expired"
+    assert book.depth("ACME") == 0
+
+
+def test_orders_expiring_during_a_tick_are_forgotten():
+    book = OrderBook()
+    book.place("a", "ACME", "buy", "limit", 100, 1, expires_at=1000.0)
+    book.place("a", "ACME", "sell", "stop", 110, 1, expires_at=1000.0)
+    assert book.on_tick("ACME", 100, now=1001.0) == []
+    assert book.on_tick("ACME", 110, now=1001.0) == []
+    assert book._orders == {}
+    assert book.depth("ACME") == 0
@@ -0,0 +1,133 @@
+import random
+
+import pytest
+
+from Dashboard.pnl import AccountPnl, Position, fifo_batch, pnl_ledgers, rebuild_account, rebuild_accounts, team_pnl
+from DatabaseManagement.service import execute_trade
+
+
+def _history(rng, api_keys=("a", "b"), stocks=("X", "Y"), count=200):
+    """Random trades as (id, api_key, stock, action, quantity, price, before, after), with brokerage."""
+    held, rows, balance = {}, [], 1_000_000.0
+    for trade_id in range(1, count + 1):
+        api_key, stock = rng.choice(api_keys), rng.choice(stocks)
+        price, fee = round(rng.uniform(10, 200), 2), round(rng.uniform(0, 5), 2)
+        if held.get((api_key, stock), 0) and rng.random() < 0.4:
+            action, quantity = "sell", rng.randint(1, held[(api_key, stock)])
+            after = balance + quantity * price - fee
+            held[(api_key, stock)] -= quantity
+        else:
+            action, quantity = "buy", rng.randint(1, 20)
+            after = balance - quantity * price - fee
+            held[(api_key, stock)] = held.get((api_key, stock), 0) + quantity
+        rows.append((trade_id, api_key, stock, action, quantity, price, balance, after))
+        balance = after
+    return rows
+
+
+def _replay(rows):
+    positions = {}
+    for _, api_key, stock, action, quantity, price, before, after in rows:
+        positions.setdefault((api_key, stock), Position()).apply(action, quantity, price, before, after)
+    return positions
+
+
+def test_fifo_simple_lots():
+    # Buy 10 @ 100 and 10 @ 110, then sell 15 @ 120 with no brokerage
+    batch = fifo_batch([1, 2, 3], ["a"] * 3, ["X"] * 3, ["buy", "buy", "sell"], [10, 10, 15], [100, 110, 120],
+                       [10000, 9000, 7900], [9000, 7900, 9700])
+    assert batch["realized"].tolist() == pytest.approx([15 * 120 - (10 * 100 + 5 * 110)])
+    assert batch["open_qty"].tolist() == [5]
+    assert batch["open_cost"].tolist() == pytest.approx([5 * 110])
+    assert batch["lot_qty"].tolist() == [5]
+    assert batch["lot_cost"].tolist() == pytest.approx([110])
+    assert batch["sells"].tolist() == [1] and batch["wins"].tolist() == [1]
+
+
+def test_fifo_batch_matches_per_trade_replay():
+    rows = _history(random.Random(3))
+    # Out of id order on purpose; the batch sorts by id itself
+    shuffled = rows[::-1]
+    batch = fifo_batch(*zip(*shuffled))
+    expected = _replay(rows)
+    assert len(batch["api_key"]) == len(expected)
+    for group, key in enumerate(zip(batch["api_key"].tolist(), batch["stock"].tolist())):
+        position = expected[key]
+        assert batch["realized"][group] == pytest.approx(position.realized)
+        assert batch["fees"][group] == pytest.approx(position.fees)
+        assert batch["sells"][group] == position.sells
+        assert batch["wins"][group] == position.wins
+        assert batch["open_qty"][group] == pytest.approx(position.quantity)
+        assert batch["open_cost"][group] == pytest.approx(position.cost)
+        lots = [(q, c) for g, q, c in zip(batch["lot_group"], batch["lot_qty"], batch["lot_cost"]) if g == group]
+        assert lots == pytest.approx([tuple(lot) for lot in position.lots])
+
+
+def test_fifo_sell_without_buys_has_no_cost_basis():
+    batch = fifo_batch([1], ["a"], ["X"], ["sell"], [5], [100], [0], [500])
+    assert batch["realized"].tolist() == [500]
+    assert batch["open_qty"].tolist() == [0]
+
+
+def test_account_skips_fills_it_already_counted():
+    account = AccountPnl("a", {}, version=3)
+    fill = [("X", "buy", 10, 100.0, 10000.0, 9000.0)]
+    assert account.apply(fill, 3) is False
+    assert account.apply(fill, 4) is True
+    assert account.apply(fill, 4) is False
+    assert account.avg_costs() == {"X": pytest.approx(100.0)}
+
+
+def test_ledger_follows_committed_trades(db, make_user):
+    api_key = make_user(balance=100000.0)
+    cached = pnl_ledgers.get(db, api_key)
+    for stock, price, quantity, action in (("X", 100.0, 10, "buy"), ("X", 110.0, 5, "buy"), ("X", 120.0, 12, "sell")):
+        result = execute_trade(db, api_key, stock, price, quantity, action, 0.001)
+        assert result["success"], result
+
+    # The trade path published its fills, so the cached lots are current without a rebuild
+    assert pnl_ledgers.get(db, api_key) is cached
+    rebuilt = rebuild_account(db, api_key)
+    assert cached.version == rebuilt.version == 3
+    assert cached.summary()["total"] == pytest.approx(rebuilt.summary()["total"])
+    assert cached.avg_costs() == {"X": pytest.approx(110.0 * 1.001)}
+
+    # A fill delivered again at a version already counted changes nothing
+    pnl_ledgers.record(api_key, [("X", "buy", 100, 1.0, 0.0, -100.0)], rebuilt.version)
+    assert cached.avg_costs() == {"X": pytest.approx(110.0 * 1.001)}
+
+
+def test_rebuild_accounts_in_one_pass(db, make_user):
+    first, second, idle = make_user(), make_user(), make_user()
+    for api_key, stock in ((first, "X"), (second, "Y"), (first, "Y")):
+        assert execute_trade(db, api_key, stock, 100.0, 2, "buy", 0.0)["success"]
+    rebuilt = rebuild_accounts(db, [first, second, idle])
+    assert {api_key: account.version for api_key, account in rebuilt.items()} == {first: 2, second: 1, idle: 0}
+    assert sorted(rebuilt[first].positions) == ["X", "Y"]
+    assert rebuilt[first].summary() == rebuild_account(db, first).summary()
+    assert rebuilt[idle].positions == {}
+
+
+def test_team_pnl_served_from_ledgers(db, make_user, monkeypatch):
+    team = "pnl-team"
+    winner, loser = make_user(name="Winner", team=team), make_user(name="Loser", team=team)
+    make_user(name="Idle", team=team)
+    for api_key, sell_price in ((winner, 120.0), (loser, 90.0)):
+        assert execute_trade(db, api_key, "X", 100.0, 10, "buy", 0.0)["success"]
+        assert execute_trade(db, api_key, "X", sell_price, 5, "sell", 0.0)["success"]
+
+    rows = team_pnl(db, team)
+    assert [row["Name"] for row in rows][0] == "Winner" and [row["Name"] for row in rows][-1] == "Loser"
+    by_name = {row["Name"]: row for row in rows}
+    assert by_name["Winner"]["Realized_pnl"] == pytest.approx(100.0)
+    assert by_name["Loser"]["Realized_pnl"] == pytest.approx(-50.0)
+    assert by_name["Idle"]["Closed_trades"] == 0
+    for name, api_key in (("Winner", winner), ("Loser", loser)):
+        assert by_name[name]["Total_pnl"] == pytest.approx(pnl_ledgers.get(db, api_key).summary()["total"]["Total_pnl"])
+
+    # With every member's ledger cached, no trades are read again
+    queries = []
+    fetch = db.fetch
+    monkeypatch.setattr(db, "fetch", lambda query, *args, **kwargs: queries.append(query) or fetch(query, *args, **kwargs))
+    assert team_pnl(db, team) == rows
+    assert not any("trades" in query for query in queries)
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from DatabaseManagement.database import ConnectionPool, Database, PoolTimeoutError, connect_db
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.in_transaction = False
+        self.rolled_back = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise ConnectionError("server has gone away")
+
+    def is_connected(self):
+        return not self.closed
+
+    def rollback(self):
+        self.rolled_back += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def opened():
+    connections = []
+
+    def connect():
+        connections.append(FakeConnection())
+        return connections[-1]
+    return connections, connect
+
+
+def test_open_and_reuse(opened):
+    connections, connect = opened
+    pool = ConnectionPool(min_size=2, max_size=4, timeout=0.1, ping_interval=60, connect=connect)
+    assert pool.open()["success"]
+    assert (pool.size, pool.idle, pool.in_use) == (2, 2, 0)
+    first = pool.acquire()
+    pool.release(first)
+    # Most recently returned first, so the warm connection is reused
+    assert pool.acquire() is first
+    assert len(connections) == 2
+
+
+def test_waits_then_times_out(opened):
+    _, connect = opened
+    pool = ConnectionPool(min_size=0, max_size=2, timeout=0.1, ping_interval=60, connect=connect)
+    held = [pool.acquire(), pool.acquire()]
+    start = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert time.monotonic() - start >= 0.1
+    pool.release(held.pop())
+    assert pool.acquire() is not None
+    assert pool.size == 2
+
+
+def test_dead_idle_connection_is_replaced(opened):
+    connections, connect = opened
+    pool = ConnectionPool(min_size=1, max_size=2, timeout=0.1, ping_interval=0, connect=connect)
+    pool.open()
+    connections[0].alive = False
+    replacement = pool.acquire()
+    assert replacement is connections[1]
+    assert connections[0].closed
+    assert pool.size == 1
+
+
+def test_release_rolls_back_and_close_discards(opened):
+    connections, connect = opened
+    pool = ConnectionPool(min_size=1, max_size=2, timeout=0.1, ping_interval=60, connect=connect)
+    connection = pool.acquire()
+    connection.in_transaction = True
+    pool.release(connection)
+    assert connection.rolled_back == 1
+    borrowed = pool.acquire()
+    pool.close()
+    assert pool.size == 1
+    # Returned after close, so it is closed rather than pooled
+    pool.release(borrowed)
+    assert borrowed.closed and pool.size == 0
+
+
+def test_uncommitted_work_does_not_leak_to_the_next_borrower(make_user):
+    pool = ConnectionPool(min_size=1, max_size=1, timeout=1, connect=connect_db)
+    api_key = make_user(balance=100.0)
+    try:
+        with pool.connection() as db:
+            assert isinstance(db, Database)
+            db.execute('UPDATE users SET balance = %s WHERE api_key = %s', (1.0, api_key))
+        with pool.connection() as db:
+            assert db.fetch('SELECT balance FROM users WHERE api_key = %s', (api_key,)) == [(100.0,)]
+    finally:
+        pool.close()
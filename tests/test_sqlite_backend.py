@@ -0,0 +1,46 @@
+from DatabaseManagement.sqlite_backend import translate
+
+
+def test_placeholders():
+    assert translate("SELECT * FROM users WHERE api_key = %s AND team = %s") == \
+        ("SELECT * FROM users WHERE api_key = ? AND team = ?", False)
+
+
+def test_for_update_starts_a_write_transaction():
+    query, locking = translate("SELECT balance FROM users WHERE api_key = %s FOR UPDATE")
+    assert locking
+    assert query == "SELECT balance FROM users WHERE api_key = ?"
+
+
+def test_on_duplicate_key_update():
+    query, locking = translate(
+        "INSERT INTO stocks (api_key, name, stock, quantity) VALUES (%s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity), name = VALUES(name)"
+    )
+    assert not locking
+    assert query == (
+        "INSERT INTO stocks (api_key, name, stock, quantity) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT DO UPDATE SET quantity = quantity + excluded.quantity, name = excluded.name"
+    )
+
+
+def test_values_left_alone_without_upsert():
+    query, _ = translate("INSERT INTO trades (stock, quantity) VALUES (%s, %s)")
+    assert query == "INSERT INTO trades (stock, quantity) VALUES (?, ?)"
+
+
+def test_create_table():
+    query, _ = translate("CREATE TABLE t (id INT AUTO_INCREMENT PRIMARY KEY, type ENUM('buy', 'sell'))")
+    assert query == "CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT)"
+
+
+def test_upsert_runs_on_sqlite(db, make_user):
+    api_key = make_user()
+    query = '''
+    INSERT INTO stocks (api_key, name, stock, quantity) VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)
+    '''
+    assert db.execute(query, (api_key, "Test User", "ACME", 5)) is True
+    assert db.execute(query, (api_key, "Test User", "ACME", 3)) is True
+    db.commit_transaction()
+    assert db.fetch('SELECT quantity FROM stocks WHERE api_key = %s', (api_key,)) == [(8,)]
@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import utils.util as util
+from utils.util import InvalidToken, create_token, verify_token
+
+EXPIRY = datetime(2030, 1, 1, tzinfo=timezone.utc)
+NOW = EXPIRY.timestamp() - 60
+
+
+def test_token_round_trip():
+    token = create_token("123", EXPIRY)
+    assert token.startswith("test.")
+    assert verify_token("123", token, now=NOW) == int(EXPIRY.timestamp())
+
+
+def test_expired_token_is_rejected():
+    token = create_token("123", EXPIRY)
+    assert verify_token("123", token, now=EXPIRY.timestamp())
+    with pytest.raises(InvalidToken, match="expired"):
+        verify_token("123", token, now=EXPIRY.timestamp() + 1)
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda token: token[:-1] + ("A" if token[-1] != "A" else "B"),
+    lambda token: token.replace(f".{int(EXPIRY.timestamp())}.", f".{int(EXPIRY.timestamp()) + 3600}."),
+    lambda token: "other" + token[len("test"):],
+    lambda token: token.rsplit(".", 1)[0] + ".é",
+    lambda token: token.rsplit(".", 1)[0],
+    lambda token: "",
+])
+def test_forged_tokens_are_rejected(tamper):
+    with pytest.raises(InvalidToken, match="Invalid"):
+        verify_token("123", tamper(create_token("123", EXPIRY)), now=NOW)
+
+
+def test_token_is_bound_to_its_api_key():
+    with pytest.raises(InvalidToken):
+        verify_token("456", create_token("123", EXPIRY), now=NOW)
+
+
+def test_rotated_keys_verify_until_removed(monkeypatch):
+    old = create_token("123", EXPIRY)
+    monkeypatch.setenv("TOKEN_SIGNING_KEYS", "test:secret,next:secret2")
+    monkeypatch.setenv("TOKEN_ACTIVE_KEY_ID", "next")
+    monkeypatch.setattr(util, "ACTIVE_KEY_ID", "next")
+    monkeypatch.setattr(util, "SIGNING_KEYS", util._load_signing_keys()[1])
+    new = create_token("123", EXPIRY)
+    assert new.startswith("next.")
+    assert verify_token("123", old, now=NOW) == verify_token("123", new, now=NOW)
+
+    monkeypatch.setattr(util, "SIGNING_KEYS", {"next": b"secret2"})
+    verify_token("123", new, now=NOW)
+    with pytest.raises(InvalidToken):
+        verify_token("123", old, now=NOW)
+
+
+@pytest.mark.parametrize("keys, active", [("", None), ("test", None), ("a.b:secret", None), ("test:secret", "missing")])
+def test_bad_key_configuration_is_refused(monkeypatch, keys, active):
+    monkeypatch.setenv("TOKEN_SIGNING_KEYS", keys)
+    if active is None:
+        monkeypatch.delenv("TOKEN_ACTIVE_KEY_ID", raising=False)
+    else:
+        monkeypatch.setenv("TOKEN_ACTIVE_KEY_ID", active)
+    with pytest.raises(ValueError):
+        util._load_signing_keys()
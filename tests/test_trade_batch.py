@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+import pytest
+
+import routes.extension_routes as extension_routes
+from DatabaseManagement.database import Database
+from DatabaseManagement.service import execute_trades_batch, get_stock
+from utils.IST_Time import get_current_time_IST
+from utils.util import create_token
+
+ORIGIN = {"Origin": "chrome-extension://tests"}
+
+
+def _order(action, stock, price, quantity, **extra):
+    return {"action": action, "stock": stock, "stock_price": price, "quantity": quantity, "charges": 0.0, **extra}
+
+
+@pytest.fixture
+def commits(monkeypatch):
+    counted = []
+    commit = Database.commit_transaction
+
+    def counting(self, *args, **kwargs):
+        counted.append(self)
+        return commit(self, *args, **kwargs)
+    monkeypatch.setattr(Database, "commit_transaction", counting)
+    return counted
+
+
+def test_orders_checked_in_sequence(db, make_user, commits):
+    api_key = make_user(balance=10000.0)
+    commits.clear()
+    results = execute_trades_batch(db, api_key, [
+        _order("buy", "X", 100.0, 50),
+        # Funded by the buy above only through the sell after it
+        _order("buy", "Y", 100.0, 60),
+        _order("sell", "X", 110.0, 20),
+        _order("buy", "Y", 100.0, 40),
+        _order("sell", "Z", 10.0, 1),
+        _order("buy", "Y", 1.0, 1, rejection=("Invalid date and time", "Invalid date and time")),
+    ])
+    assert [result["success"] for result in results] == [True, False, True, True, False, False]
+    assert results[1]["message"] == "Insufficient balance"
+    assert results[4]["message"] == "Insufficient stock"
+    assert results[5]["message"] == "Invalid date and time"
+    assert [result["balance"] for result in results] == [5000.0, 5000.0, 7200.0, 3200.0, 3200.0, 3200.0]
+    assert len(commits) == 1
+
+    assert db.fetch('SELECT balance, version FROM users WHERE api_key = %s', (api_key,)) == [(3200.0, 1)]
+    assert get_stock(db, api_key, "X")["quantity"] == 30
+    assert get_stock(db, api_key, "Y")["quantity"] == 40
+    trades = db.fetch('SELECT stock, type, quantity, before_balance, after_balance FROM trades WHERE api_key = %s ORDER BY id',
+                      (api_key,))
+    assert trades == [("X", "buy", 50, 10000.0, 5000.0), ("X", "sell", 20, 5000.0, 7200.0), ("Y", "buy", 40, 7200.0, 3200.0)]
+
+
+def test_selling_out_removes_the_holding(db, make_user):
+    api_key = make_user(balance=1000.0)
+    results = execute_trades_batch(db, api_key, [_order("buy", "X", 10.0, 5), _order("sell", "X", 10.0, 5)])
+    assert all(result["success"] for result in results)
+    assert get_stock(db, api_key, "X") is None
+
+
+def test_all_rejected_commits_nothing(db, make_user, commits):
+    api_key = make_user(balance=100.0)
+    commits.clear()
+    results = execute_trades_batch(db, api_key, [_order("buy", "X", 100.0, 5), _order("sell", "X", 100.0, 1)])
+    assert not any(result["success"] for result in results)
+    assert commits == []
+    assert db.fetch('SELECT COUNT(*) FROM trades WHERE api_key = %s', (api_key,)) == [(0,)]
+
+
+def test_unknown_account():
+    db = Database()
+    try:
+        assert execute_trades_batch(db, "no-such-key", [_order("buy", "X", 1.0, 1)]) is None
+    finally:
+        db.close()
+
+
+def _token(api_key):
+    return create_token(api_key, get_current_time_IST() + timedelta(hours=1))
+
+
+def _body(action, stock, price, quantity):
+    return {"action": action, "stockName": stock, "stockPrice": price, "quantity": quantity, "balance": 0,
+            "date": get_current_time_IST().isoformat()}
+
+
+def test_batch_route(client, make_user, monkeypatch):
+    # Outside market hours every order would be refused by the trading hours check
+    monkeypatch.setattr(extension_routes, "validate_trade_time", lambda trade: None)
+    api_key = make_user(balance=1000.0)
+    response = client.post("/trade/batch", headers={"api-key": api_key, "token": _token(api_key), **ORIGIN},
+                           json=[_body("buy", "X", 10.0, 5), _body("sell", "X", 10.0, 10), _body("hold", "X", 10.0, 1)])
+    assert response.status_code == 200
+    assert [(order["success"], order["message"]) for order in response.json()] == [
+        (True, "Bought 5 shares of X successfully"), (False, "Insufficient stock"), (False, "Invalid action")
+    ]
+
+
+def test_batch_route_keeps_401s(client, make_user):
+    api_key = make_user()
+    bad_token = client.post("/trade/batch", headers={"api-key": api_key, "token": "forged", **ORIGIN},
+                            json=[_body("buy", "X", 10.0, 1)])
+    assert bad_token.status_code == 401
+    unknown = client.post("/trade/batch", headers={"api-key": "no-such-key", "token": _token("no-such-key"), **ORIGIN},
+                          json=[_body("buy", "X", 10.0, 1)])
+    assert unknown.status_code == 401
+    assert unknown.json()["detail"] == "Invalid API key"
@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+from mysql.connector import errors
+
+import DatabaseManagement.service as service
+from DatabaseManagement.database import Database
+from DatabaseManagement.service import execute_trade, get_stock
+
+
+class Rollbacks:
+    def __init__(self):
+        self.count = 0
+
+    def rollback_transaction(self):
+        self.count += 1
+
+
+def _attempts(*outcomes):
+    calls = []
+
+    def attempt():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return attempt, calls
+
+
+def test_lock_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(service.time, "sleep", lambda seconds: None)
+    db = Rollbacks()
+    attempt, calls = _attempts(errors.DatabaseError(msg="deadlock", errno=1213),
+                               errors.DatabaseError(msg="lock wait", errno=1205), "done")
+    assert service._with_trade_retry(db, "a", attempt) == "done"
+    assert len(calls) == 3 and db.count == 2
+
+
+def test_other_errors_are_not_retried(monkeypatch):
+    db = Rollbacks()
+    attempt, calls = _attempts(errors.IntegrityError(msg="duplicate", errno=1062), "done")
+    with pytest.raises(errors.IntegrityError):
+        service._with_trade_retry(db, "a", attempt)
+    assert len(calls) == 1 and db.count == 1
+
+
+def test_retries_give_up(monkeypatch):
+    monkeypatch.setattr(service.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(service, "TRADE_MAX_ATTEMPTS", 2)
+    db = Rollbacks()
+    attempt, calls = _attempts(*[errors.DatabaseError(msg="deadlock", errno=1213)] * 3)
+    with pytest.raises(errors.DatabaseError):
+        service._with_trade_retry(db, "a", attempt)
+    assert len(calls) == 2
+
+
+def test_concurrent_orders_never_overspend(make_user):
+    # 8 workers race 40 buys of 10.00 for a balance that covers 15 of them
+    api_key = make_user(balance=150.0)
+    results, failures = [], []
+
+    def trade():
+        db = Database()
+        try:
+            for _ in range(5):
+                results.append(execute_trade(db, api_key, "X", 10.0, 1, "buy", 0.0))
+        except Exception as e:
+            failures.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=trade) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    filled = sum(result["success"] for result in results)
+    assert filled == 15
+    assert all(result["message"] == "Insufficient balance" for result in results if not result["success"])
+    db = Database()
+    try:
+        assert db.fetch('SELECT balance, version FROM users WHERE api_key = %s', (api_key,)) == [(0.0, 15)]
+        assert get_stock(db, api_key, "X")["quantity"] == 15
+        assert db.fetch('SELECT COUNT(*) FROM trades WHERE api_key = %s', (api_key,)) == [(15,)]
+    finally:
+        db.close()
+
+
+def test_selling_out_removes_the_holding(db, make_user):
+    api_key = make_user(balance=100.0)
+    assert execute_trade(db, api_key, "X", 10.0, 3, "buy", 0.0)["success"]
+    rejected = execute_trade(db, api_key, "X", 10.0, 4, "sell", 0.0)
+    assert not rejected["success"] and rejected["message"] == "Insufficient stock"
+    assert execute_trade(db, api_key, "X", 10.0, 3, "sell", 0.0)["success"]
+    assert get_stock(db, api_key, "X") is None
+    assert execute_trade(db, "no-such-key", "X", 10.0, 1, "buy", 0.0) is None
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import orjson
+import pytest
+
+from Dashboard.dashboard_service import decode_cursor, encode_cursor, transaction_page
+from DatabaseManagement.service import execute_trade
+
+
+def test_cursor_round_trip():
+    time = datetime(2024, 3, 1, 9, 15, 30, 250000)
+    assert decode_cursor(encode_cursor(time, 42)) == (time, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", "bm9waXBl", encode_cursor(datetime(2024, 1, 1), 1)[:-4] + "AAAA"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def _trader(db, make_user, trades=5):
+    api_key = make_user()
+    # Trades in the same second share a time, so pages are split on the id tie-break
+    for quantity in range(1, trades + 1):
+        assert execute_trade(db, api_key, "X", 10.0, quantity, "buy", 0.0)["success"]
+    return api_key
+
+
+def test_pages_cover_every_trade_once(db, make_user):
+    api_key = _trader(db, make_user)
+    everything, cursor = transaction_page(db, api_key)
+    assert cursor is None
+    assert [row.Quantity for row in everything] == [5, 4, 3, 2, 1]
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = transaction_page(db, api_key, limit=2, cursor=cursor)
+        pages.append(page)
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [row for page in pages for row in page] == everything
+
+
+def test_exact_last_page_has_no_cursor(db, make_user):
+    api_key = _trader(db, make_user, trades=4)
+    page, cursor = transaction_page(db, api_key, limit=2)
+    page, cursor = transaction_page(db, api_key, limit=2, cursor=cursor)
+    assert len(page) == 2 and cursor is None
+
+
+def test_route_follows_next_cursor(client, db, make_user):
+    headers = {"api-key": _trader(db, make_user)}
+    quantities, params = [], {"limit": 2}
+    while True:
+        response = client.get("/api/transaction", headers=headers, params=params)
+        assert response.status_code == 200
+        quantities += [row["Quantity"] for row in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert quantities == [5, 4, 3, 2, 1]
+
+    cursor = client.get("/api/transaction", headers=headers, params={"limit": 3}).headers["X-Next-Cursor"]
+    streamed = client.get("/api/transaction", headers=headers, params={"stream": True, "cursor": cursor})
+    assert [orjson.loads(line)["Quantity"] for line in streamed.content.splitlines()] == [2, 1]
+
+
+def test_route_rejects_bad_cursor(client, db, make_user):
+    response = client.get("/api/transaction", headers={"api-key": _trader(db, make_user, 1)}, params={"cursor": "bogus"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from Dashboard.pnl import pnl_ledgers
+from Dashboard.valuation import networth_leaderboard, valued_portfolio, value_positions
+from DatabaseManagement.service import execute_trade
+from MarketData.price_cache import price_cache
+
+
+def test_value_positions():
+    price_cache.update("VAL-A", 20.0)
+    valued = value_positions(["a", "a", "b"], ["VAL-A", "VAL-UNPRICED", "VAL-A"], [10, 5, 1], [15.0, 8.0, np.nan])
+    assert valued["price"].tolist() == [20.0, 8.0, 20.0]
+    assert valued["priced"].tolist() == [True, False, True]
+    assert valued["market_value"].tolist() == [200.0, 40.0, 20.0]
+    assert valued["unrealized_pnl"].tolist() == [50.0, 0.0, 0.0]
+    assert valued["owners"].tolist() == ["a", "b"]
+    assert valued["holdings_value"].tolist() == [240.0, 20.0]
+    assert valued["weight"].tolist() == pytest.approx([200 / 240, 40 / 240, 1.0])
+
+
+def test_cost_basis_comes_from_the_cached_ledgers(db, make_user, monkeypatch):
+    team = "valuation-team"
+    rich, poor = make_user(name="Rich", team=team), make_user(name="Poor", team=team, balance=1000.0)
+    assert execute_trade(db, rich, "VAL-X", 100.0, 10, "buy", 0.0)["success"]
+    assert execute_trade(db, rich, "VAL-X", 130.0, 4, "buy", 0.0)["success"]
+    assert execute_trade(db, rich, "VAL-X", 150.0, 10, "sell", 0.0)["success"]
+
+    rows = valued_portfolio(db, rich)
+    assert [(row["Stock"], row["Quantity"], row["Avg_cost"]) for row in rows] == [("VAL-X", 4, pytest.approx(130.0))]
+    assert pnl_ledgers.get(db, rich).avg_costs() == {"VAL-X": pytest.approx(130.0)}
+
+    board = networth_leaderboard(db, team)
+    assert [row["Name"] for row in board] == ["Rich", "Poor"]
+    assert board[0]["Holdings_value"] == pytest.approx(4 * 150.0)
+
+    # Every ledger is cached now, so neither route reads the trades table again
+    queries = []
+    fetch = db.fetch
+    monkeypatch.setattr(db, "fetch", lambda query, *args, **kwargs: queries.append(query) or fetch(query, *args, **kwargs))
+    assert networth_leaderboard(db, team) == board
+    assert valued_portfolio(db, rich) == rows
+    assert not any("trades" in query for query in queries)
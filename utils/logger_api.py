@@ -1,46 +1,217 @@
-import requests
+import atexit
+import gzip
 import json
+import queue
+import random
+import threading
 import time
 import logging
 
-class NewRelicHandler(logging.Handler):
+import requests
+
+from utils.metrics import LOG_RECORDS
+
+
+class LogShipper:
     """
-    Custom logging handler to send logs to New Relic.
+    Ships log entries to New Relic from a background thread.
+
+    Entries are put on a bounded in-memory queue and a worker thread sends them
+    in batches of up to ``batch_size`` entries, or whatever has arrived within
+    ``max_latency`` seconds of the first entry of a batch. Payloads are gzipped
+    and sent over one keep-alive session.
+
+    Once the queue is more than ``sample_threshold`` full, non-error entries are
+    only admitted with probability ``sample_rate``. When it is completely full
+    the ``overflow_policy`` decides what is lost: ``"drop_newest"`` rejects the
+    incoming entry, ``"drop_oldest"`` evicts the oldest queued one.
+
+    The queued, shipped, dropped and failed counts are kept per shipper for
+    ``stats()`` and also exported as the ``log_records_total`` metric.
     """
-    def __init__(self, api_key, url='https://log-api.newrelic.com/log/v1'):
-        super().__init__()
+    def __init__(self, api_key, url='https://log-api.newrelic.com/log/v1', max_queue=10000,
+                 batch_size=500, max_latency=2.0, overflow_policy="drop_newest",
+                 sample_threshold=0.8, sample_rate=0.1, timeout=10.0):
+        if overflow_policy not in ("drop_newest", "drop_oldest"):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
         self.api_key = api_key
         self.url = url
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.overflow_policy = overflow_policy
+        self.sample_level = int(max_queue * sample_threshold)
+        self.sample_rate = sample_rate
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+            'Api-Key': api_key or '',
+            'Accept': '*/*'
+        })
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._counter_lock = threading.Lock()
+        self._counters = {"queued": 0, "shipped": 0, "dropped": 0, "failed": 0}
+        self._metrics = {counter: LOG_RECORDS.labels(counter) for counter in self._counters}
+        # Entries submitted but not yet shipped or failed; flush() waits for zero
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+        self._worker.start()
 
-    def emit(self, record):
-        log_entry = self.format(record)
-        timestamp = int(time.time())
+    def _count(self, counter, amount=1):
+        with self._counter_lock:
+            self._counters[counter] += amount
+        self._metrics[counter].inc(amount)
+
+    def _settled(self, count: int) -> None:
+        with self._pending_lock:
+            self._pending -= count
+            if self._pending == 0:
+                self._idle.set()
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            stats = dict(self._counters)
+        stats["pending"] = self._queue.qsize()
+        return stats
+
+    def submit(self, entry: dict, important: bool = False) -> bool:
+        """Queues one log entry without blocking. Returns False if it was dropped."""
+        if self._closed:
+            self._count("dropped")
+            return False
+        if not important and self._queue.qsize() >= self.sample_level and random.random() >= self.sample_rate:
+            self._count("dropped")
+            return False
+        with self._pending_lock:
+            self._pending += 1
+            self._idle.clear()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            if self.overflow_policy == "drop_newest":
+                self._count("dropped")
+                self._settled(1)
+                return False
+            try:
+                self._queue.get_nowait()
+                self._count("dropped")
+                self._settled(1)
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                self._count("dropped")
+                self._settled(1)
+                return False
+        self._count("queued")
+        return True
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is None
+            entries = [entry for entry in batch if entry is not None]
+            if entries:
+                try:
+                    self._ship(entries)
+                finally:
+                    self._settled(len(entries))
+            if stop:
+                return
+
+    def _ship(self, entries: list) -> None:
         payload = [
             {
                 "common": {
                     "attributes": {
-                        "logtype": record.log_type,
-                        "service": "paper_trading_app",
-                        "hostname": record.name,
-                        "api_key": record.api_key
+                        "service": "paper_trading_app"
                     }
                 },
-                "logs": [
-                    {
-                        "timestamp": timestamp,
-                        "message": log_entry
-                    }
-                ]
+                "logs": entries
             }
         ]
-        headers = {
-            'Content-Type': 'application/json',
-            'Api-Key': self.api_key,
-            'Accept': '*/*'
-        }
+        body = gzip.compress(json.dumps(payload).encode("utf-8"))
+        for attempt in range(2):
+            try:
+                response = self.session.post(self.url, data=body, timeout=self.timeout)
+                if response.status_code == 202:
+                    self._count("shipped", len(entries))
+                    return
+                if response.status_code < 500:
+                    break
+            except requests.RequestException:
+                pass
+        self._count("failed", len(entries))
+
+    def flush(self, timeout: float = None) -> bool:
+        """Waits until everything queued so far has been shipped or failed."""
+        return self._idle.wait(timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        # The sentinel ends the batch being collected and stops the worker
         try:
-            response = requests.post(self.url, headers=headers, data=json.dumps(payload))
-            if response.status_code != 202:
-                self.handleError(record)
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._worker.join(timeout)
+        self.session.close()
+
+
+class NewRelicHandler(logging.Handler):
+    """
+    Custom logging handler to send logs to New Relic.
+
+    ``emit`` only formats the record and hands it to a ``LogShipper``; the HTTP
+    requests happen in the shipper's background thread.
+    """
+    def __init__(self, api_key, url='https://log-api.newrelic.com/log/v1', **shipper_options):
+        super().__init__()
+        self.api_key = api_key
+        self.url = url
+        self.shipper = LogShipper(api_key, url, **shipper_options)
+        atexit.register(self.close)
+
+    def emit(self, record):
+        try:
+            entry = {
+                "timestamp": int(record.created * 1000),
+                "message": self.format(record),
+                "attributes": {
+                    "logtype": record.log_type,
+                    "hostname": record.name,
+                    "api_key": record.api_key,
+                    "request_id": record.request_id
+                }
+            }
+            self.shipper.submit(entry, important=record.levelno >= logging.ERROR)
         except Exception:
             self.handleError(record)
+
+    def flush(self):
+        self.shipper.flush(timeout=5.0)
+
+    def close(self):
+        self.shipper.close()
+        super().close()
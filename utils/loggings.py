@@ -1,5 +1,9 @@
 import logging
+import uuid
+from contextvars import ContextVar, Token
 from logging.handlers import RotatingFileHandler
+from typing import NamedTuple, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from utils.logger_api import NewRelicHandler
 from utils.IST_Time import get_current_time_IST
 from dotenv import load_dotenv
@@ -7,25 +11,88 @@ import os
 load_dotenv()
 
 
-class ContextFilter(logging.Filter):
+class LogContext(NamedTuple):
+    api_key: str = 'unknown'
+    name: str = 'unknown'
+    log_type: Optional[str] = None
+    request_id: str = 'unknown'
+
+
+_DEFAULT_CONTEXT = LogContext()
+_log_context: ContextVar[LogContext] = ContextVar("log_context", default=_DEFAULT_CONTEXT)
+
+
+def get_log_context() -> LogContext:
+    return _log_context.get()
+
+
+def set_log_context(**fields) -> Token:
     """
-    Custom logging filter to add api_key and log_type to log records.
+    Updates the logging context of the current request (or task). Fields that
+    are not given keep their current value. Returns a token for ``reset_log_context``.
     """
-    def __init__(self, api_key=None, log_type=None, name=None):
-        super().__init__()
-        self.api_key = api_key
-        self.log_type = log_type
-        self.name = name
+    return _log_context.set(_log_context.get()._replace(**fields))
+
+
+def reset_log_context(token: Token) -> None:
+    _log_context.reset(token)
 
+
+class ContextFilter(logging.Filter):
+    """
+    Handler filter that fills api_key, log_type, name and request_id on each
+    record from the values passed to ``log_creator`` or, failing that, from the
+    current logging context. It is installed once and never mutated, so
+    concurrent requests cannot see each other's values.
+    """
     def filter(self, record):
-        record.api_key = self.api_key if self.api_key else 'unknown'
-        record.log_type = self.log_type if self.log_type else 'unknown'
-        record.name = self.name if self.name else 'unknown'
+        context = _log_context.get()
+        record.api_key = getattr(record, 'api_key', None) or context.api_key
+        record.log_type = getattr(record, 'log_type', None) or context.log_type or record.levelname
+        record.name = getattr(record, 'user_name', None) or context.name
+        record.request_id = context.request_id
         return True
 
+
+class LogContextMiddleware:
+    """
+    ASGI middleware that sets the logging context once per request from the
+    ``api-key`` and ``x-request-id`` headers, and echoes the request id back.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        api_key = None
+        request_id = None
+        for key, value in scope["headers"]:
+            if key == b"api-key":
+                api_key = value.decode("latin-1")
+            elif key == b"x-request-id":
+                request_id = value.decode("latin-1")
+        request_id = request_id or uuid.uuid4().hex
+        raw_request_id = request_id.encode("latin-1")
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", raw_request_id)]
+            await send(message)
+
+        token = _log_context.set(LogContext(api_key=api_key or 'unknown', request_id=request_id))
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            _log_context.reset(token)
+
+
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO"))
 
 # Define a custom log format
 log_format_file = '%(asctime)s - %(message)s'
@@ -40,24 +107,30 @@ log_format_file = '%(asctime)s - %(message)s'
 
 # Add NewRelicHandler to the logger
 api_key = os.getenv("LOG_KEY")  # Replace with your New Relic API key
-new_relic_handler = NewRelicHandler(api_key)
+new_relic_handler = NewRelicHandler(
+    api_key,
+    url=os.getenv("LOG_URL", "https://log-api.newrelic.com/log/v1"),
+    max_queue=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("LOG_BATCH_SIZE", "500")),
+    max_latency=float(os.getenv("LOG_MAX_LATENCY", "2.0")),
+    overflow_policy=os.getenv("LOG_OVERFLOW_POLICY", "drop_newest"),
+)
 new_relic_handler.setLevel(logging.INFO)
 new_relic_handler.setFormatter(logging.Formatter(log_format_file))
+new_relic_handler.addFilter(ContextFilter())
 
 logger.addHandler(new_relic_handler)
 
 def log_creator(api_key, name, log, error=False):
-    if error:
-        log_type = "ERROR"
-    else:
-        log_type = "INFO"
-    context_filter = ContextFilter(api_key=api_key, log_type=log_type, name=name)
-    logger.addFilter(context_filter)
-    if error:
-        logging.error(log)
-    else:
-        logging.info(log)
-    logger.removeFilter(context_filter)
+    level = logging.ERROR if error else logging.INFO
+    # Skip building the record at all when nothing would handle it
+    if not logger.isEnabledFor(level):
+        return
+    logger.log(level, log, extra={
+        "api_key": api_key if api_key and api_key != 'unknown' else None,
+        "user_name": name if name and name != 'Unknown' else None,
+        "log_type": "ERROR" if error else "INFO",
+    })
 
 
 if __name__ == "__main__":
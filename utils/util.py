@@ -1,11 +1,76 @@
+import base64
+import hashlib
+import hmac
+import os
+import time
 from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class InvalidToken(Exception):
+    """Raised when a session token is malformed, forged or expired."""
+
+
+def _load_signing_keys() -> Tuple[str, Dict[str, bytes]]:
+    """
+    Reads TOKEN_SIGNING_KEYS as ``kid:secret`` pairs separated by commas. New
+    tokens are signed with TOKEN_ACTIVE_KEY_ID (the first key by default); any
+    listed key still verifies, so a key can be rotated out gradually.
+    """
+    raw = os.getenv("TOKEN_SIGNING_KEYS", "")
+    keys = {}
+    for pair in filter(None, (item.strip() for item in raw.split(","))):
+        kid, _, secret = pair.partition(":")
+        if not kid or not secret or "." in kid:
+            raise ValueError(f"Malformed TOKEN_SIGNING_KEYS entry for key id {kid!r}")
+        keys[kid] = secret.encode("utf-8")
+    if not keys:
+        # A per-process random key would break tokens across workers and restarts
+        raise ValueError("TOKEN_SIGNING_KEYS is not set")
+    active = os.getenv("TOKEN_ACTIVE_KEY_ID") or next(iter(keys))
+    if active not in keys:
+        raise ValueError(f"TOKEN_ACTIVE_KEY_ID {active!r} is not in TOKEN_SIGNING_KEYS")
+    return active, keys
+
+
+ACTIVE_KEY_ID, SIGNING_KEYS = _load_signing_keys()
+
+
+def _sign(key: bytes, kid: str, api_key: str, expiry: int) -> str:
+    message = f"{kid}\n{api_key}\n{expiry}".encode("utf-8")
+    digest = hmac.new(key, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
 
 def create_token(api_key: str, expiration_time: datetime) -> str:
-    
-    expiration_time = expiration_time.strftime("%Y-%m-%d %H:%M:%S")
-    secret_key = abs(hash(api_key + str(expiration_time)))
-    
-    return str(secret_key)
+    """Issues ``<kid>.<expiry>.<signature>``, an HMAC-SHA256 over the key id, api_key and expiry."""
+    expiry = int(expiration_time.timestamp())
+    signature = _sign(SIGNING_KEYS[ACTIVE_KEY_ID], ACTIVE_KEY_ID, api_key, expiry)
+    return f"{ACTIVE_KEY_ID}.{expiry}.{signature}"
+
+
+def verify_token(api_key: str, token: str, now: Optional[float] = None) -> int:
+    """
+    Checks a token issued by ``create_token`` for this api_key without touching
+    the database. Returns its expiry as a unix timestamp, raises InvalidToken.
+    """
+    parts = token.split(".") if token else []
+    if len(parts) != 3 or not parts[1].isdigit():
+        raise InvalidToken("Invalid token")
+    kid, expiry, signature = parts
+    key = SIGNING_KEYS.get(kid)
+    # Compared as bytes: compare_digest rejects str arguments with non-ASCII characters
+    expected = _sign(key, kid, api_key, int(expiry)).encode("ascii") if key is not None else b""
+    if key is None or not hmac.compare_digest(signature.encode("utf-8"), expected):
+        raise InvalidToken("Invalid token")
+    if int(expiry) < (time.time() if now is None else now):
+        raise InvalidToken("Token expired")
+    return int(expiry)
+
 
 def create_api_key(name: str) -> str:
     
@@ -15,4 +80,4 @@ def create_api_key(name: str) -> str:
     return str(api_key)
 
 if __name__ == "__main__":
-    print(create_api_key("John Doe"))
\ No newline at end of file
+    print(create_api_key("John Doe"))